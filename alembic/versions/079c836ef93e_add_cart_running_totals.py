@@ -0,0 +1,51 @@
+"""Add running totals to carts
+
+Revision ID: 079c836ef93e
+Revises: 28fa1f843953
+Create Date: 2026-10-18 15:21:40.318254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '079c836ef93e'
+down_revision: Union[str, Sequence[str], None] = '28fa1f843953'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('carts', sa.Column('subtotal', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False))
+    op.add_column('carts', sa.Column('tax_amount', sa.Numeric(precision=14, scale=6), server_default='0', nullable=False))
+    op.add_column('carts', sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the existing lines
+    op.execute("""
+        UPDATE carts SET
+            subtotal = totals.subtotal,
+            tax_amount = totals.tax_amount,
+            item_count = totals.item_count
+        FROM (
+            SELECT cart_items.cart_id,
+                   sum(cart_items.quantity * cart_items.price_at_addition) AS subtotal,
+                   sum(cart_items.quantity * cart_items.price_at_addition
+                       * coalesce(products.tax_rate, 0)) AS tax_amount,
+                   count(cart_items.id) AS item_count
+            FROM cart_items
+            JOIN products ON products.id = cart_items.product_id
+            GROUP BY cart_items.cart_id
+        ) AS totals
+        WHERE carts.id = totals.cart_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('carts', 'item_count')
+    op.drop_column('carts', 'tax_amount')
+    op.drop_column('carts', 'subtotal')
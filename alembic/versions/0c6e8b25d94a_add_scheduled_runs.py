@@ -0,0 +1,33 @@
+"""Add scheduled_runs
+
+Revision ID: 0c6e8b25d94a
+Revises: f2a9c4e17b3d
+Create Date: 2026-10-18 23:31:48.905217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c6e8b25d94a'
+down_revision: Union[str, Sequence[str], None] = 'f2a9c4e17b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('scheduled_runs',
+    sa.Column('job', sa.String(length=100), nullable=False),
+    sa.Column('slot', sa.DateTime(), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('job', 'slot')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('scheduled_runs')
@@ -0,0 +1,42 @@
+"""Add product search indexes
+
+Revision ID: 1f11fec706cc
+Revises: 5d120dbf2889
+Create Date: 2026-10-18 09:12:41.308214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f11fec706cc'
+down_revision: Union[str, Sequence[str], None] = '5d120dbf2889'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_products_name_trgm', 'products', ['name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_products_description_trgm', 'products', ['description'], unique=False,
+        postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_products_barcode_pattern', 'products', ['barcode'], unique=False,
+        postgresql_ops={'barcode': 'varchar_pattern_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_barcode_pattern', table_name='products')
+    op.drop_index('ix_products_description_trgm', table_name='products')
+    op.drop_index('ix_products_name_trgm', table_name='products')
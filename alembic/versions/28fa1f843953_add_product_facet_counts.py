@@ -0,0 +1,96 @@
+"""Add product facet counts
+
+Revision ID: 28fa1f843953
+Revises: c4f18341a6be
+Create Date: 2026-10-18 14:03:27.551846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '28fa1f843953'
+down_revision: Union[str, Sequence[str], None] = 'c4f18341a6be'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Fold a set of (category, status, age_restriction, n) rows into the counts
+APPLY_DELTA = """
+        INSERT INTO product_facet_counts (facet, value, count)
+        SELECT f.facet, f.value, sum(f.n)
+        FROM ({source}) AS r
+        CROSS JOIN LATERAL (VALUES
+            ('category', r.category::text, r.n),
+            ('status', r.status::text, r.n),
+            ('age_restriction', r.age_restriction::text, r.n)
+        ) AS f(facet, value, n)
+        WHERE f.value IS NOT NULL
+        GROUP BY f.facet, f.value
+        HAVING sum(f.n) <> 0
+        ORDER BY f.facet, f.value
+        ON CONFLICT (facet, value)
+        DO UPDATE SET count = product_facet_counts.count + EXCLUDED.count;
+"""
+
+NEW_ROWS = "SELECT category, status, age_restriction, 1 AS n FROM new_rows"
+OLD_ROWS = "SELECT category, status, age_restriction, -1 AS n FROM old_rows"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_facet_counts',
+    sa.Column('facet', sa.String(length=30), nullable=False),
+    sa.Column('value', sa.String(length=30), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('facet', 'value')
+    )
+
+    # Statement-level triggers with transition tables: a bulk import touches
+    # each counter once per statement instead of once per row
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION products_refresh_facet_counts() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            {APPLY_DELTA.format(source=NEW_ROWS)}
+        ELSIF TG_OP = 'DELETE' THEN
+            {APPLY_DELTA.format(source=OLD_ROWS)}
+        ELSE
+            {APPLY_DELTA.format(source=NEW_ROWS + " UNION ALL " + OLD_ROWS)}
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+    CREATE TRIGGER products_facet_counts_insert
+    AFTER INSERT ON products REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION products_refresh_facet_counts();
+    """)
+    op.execute("""
+    CREATE TRIGGER products_facet_counts_update
+    AFTER UPDATE ON products REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION products_refresh_facet_counts();
+    """)
+    op.execute("""
+    CREATE TRIGGER products_facet_counts_delete
+    AFTER DELETE ON products REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION products_refresh_facet_counts();
+    """)
+
+    # Backfill from the existing catalog
+    op.execute(APPLY_DELTA.format(
+        source="SELECT category, status, age_restriction, 1 AS n FROM products"
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS products_facet_counts_delete ON products")
+    op.execute("DROP TRIGGER IF EXISTS products_facet_counts_update ON products")
+    op.execute("DROP TRIGGER IF EXISTS products_facet_counts_insert ON products")
+    op.execute("DROP FUNCTION IF EXISTS products_refresh_facet_counts()")
+    op.drop_table('product_facet_counts')
@@ -0,0 +1,46 @@
+"""Add inventory reservations
+
+Revision ID: 3b428d152453
+Revises: 74dc9b959eaa
+Create Date: 2026-10-18 16:40:52.117306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b428d152453'
+down_revision: Union[str, Sequence[str], None] = '74dc9b959eaa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('inventory_reservations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cart_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.CheckConstraint('quantity > 0', name='positive_reservation'),
+    sa.ForeignKeyConstraint(['cart_id'], ['carts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cart_id', 'product_id', name='unique_cart_reservation')
+    )
+    op.create_index(op.f('ix_inventory_reservations_id'), 'inventory_reservations', ['id'], unique=False)
+    op.create_index(op.f('ix_inventory_reservations_expires_at'), 'inventory_reservations', ['expires_at'], unique=False)
+    op.create_index('ix_inventory_reservations_product_expires', 'inventory_reservations', ['product_id', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventory_reservations_product_expires', table_name='inventory_reservations')
+    op.drop_index(op.f('ix_inventory_reservations_expires_at'), table_name='inventory_reservations')
+    op.drop_index(op.f('ix_inventory_reservations_id'), table_name='inventory_reservations')
+    op.drop_table('inventory_reservations')
@@ -0,0 +1,36 @@
+"""Unique payments processor_reference
+
+Revision ID: 5a7e3c90b2d8
+Revises: 9e52c0d7a1f4
+Create Date: 2026-10-18 19:52:06.481173
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a7e3c90b2d8'
+down_revision: Union[str, Sequence[str], None] = '9e52c0d7a1f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Older payments all carried the same placeholder reference; keep it on
+    # the first one only so the unique index can be built
+    op.execute(
+        "UPDATE payments SET processor_reference = NULL "
+        "WHERE processor_reference IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM payments WHERE processor_reference IS NOT NULL "
+        "GROUP BY processor_reference)"
+    )
+    op.create_index('ix_payments_processor_reference', 'payments', ['processor_reference'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payments_processor_reference', table_name='payments')
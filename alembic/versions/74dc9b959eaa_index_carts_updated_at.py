@@ -0,0 +1,28 @@
+"""Index carts.updated_at for the idle cart reaper
+
+Revision ID: 74dc9b959eaa
+Revises: 079c836ef93e
+Create Date: 2026-10-18 16:02:11.604893
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '74dc9b959eaa'
+down_revision: Union[str, Sequence[str], None] = '079c836ef93e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_carts_updated_at'), 'carts', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_carts_updated_at'), table_name='carts')
@@ -0,0 +1,47 @@
+"""Add payment_webhook_events
+
+Revision ID: 7b2e5f9c1a84
+Revises: 0c6e8b25d94a
+Create Date: 2026-10-19 00:42:17.360518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e5f9c1a84'
+down_revision: Union[str, Sequence[str], None] = '0c6e8b25d94a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('payment_webhook_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('reference', sa.String(length=100), nullable=False),
+    sa.Column('approved', sa.Boolean(), nullable=False),
+    sa.Column('message', sa.String(length=255), nullable=True),
+    sa.Column('status', sa.Enum('RECEIVED', 'APPLIED', 'STALE', 'DEAD_LETTER', name='webhookeventstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('reference')
+    )
+    op.create_index(op.f('ix_payment_webhook_events_id'), 'payment_webhook_events', ['id'], unique=False)
+    op.create_index(op.f('ix_payment_webhook_events_status'), 'payment_webhook_events', ['status'], unique=False)
+    op.create_index(op.f('ix_payment_webhook_events_processed_at'), 'payment_webhook_events', ['processed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_payment_webhook_events_processed_at'), table_name='payment_webhook_events')
+    op.drop_index(op.f('ix_payment_webhook_events_status'), table_name='payment_webhook_events')
+    op.drop_index(op.f('ix_payment_webhook_events_id'), table_name='payment_webhook_events')
+    op.drop_table('payment_webhook_events')
+    sa.Enum(name='webhookeventstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,36 @@
+"""Add cart_items tax_rate_at_addition
+
+Revision ID: b71f0d3a6c25
+Revises: e5c2a8d91f37
+Create Date: 2026-10-18 22:14:37.602518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71f0d3a6c25'
+down_revision: Union[str, Sequence[str], None] = 'e5c2a8d91f37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'cart_items',
+        sa.Column('tax_rate_at_addition', sa.Numeric(5, 4), nullable=False, server_default='0')
+    )
+    # Existing lines take the rate their running totals were built with
+    op.execute(
+        "UPDATE cart_items SET tax_rate_at_addition = COALESCE(("
+        "SELECT products.tax_rate FROM products WHERE products.id = cart_items.product_id), 0)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('cart_items', 'tax_rate_at_addition')
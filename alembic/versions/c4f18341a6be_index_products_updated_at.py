@@ -0,0 +1,28 @@
+"""Index products.updated_at for catalog sync
+
+Revision ID: c4f18341a6be
+Revises: 1f11fec706cc
+Create Date: 2026-10-18 11:47:05.912370
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f18341a6be'
+down_revision: Union[str, Sequence[str], None] = '1f11fec706cc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_products_updated_at'), 'products', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_products_updated_at'), table_name='products')
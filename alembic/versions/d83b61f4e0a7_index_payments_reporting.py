@@ -0,0 +1,32 @@
+"""Index payments for reporting
+
+Revision ID: d83b61f4e0a7
+Revises: 5a7e3c90b2d8
+Create Date: 2026-10-18 20:37:44.905312
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd83b61f4e0a7'
+down_revision: Union[str, Sequence[str], None] = '5a7e3c90b2d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_payments_transaction_id'), 'payments', ['transaction_id'], unique=False)
+    op.create_index('ix_payments_status_processed_at', 'payments', ['status', 'processed_at', 'id'], unique=False)
+    op.create_index('ix_payments_method_processed_at', 'payments', ['method', 'processed_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payments_method_processed_at', table_name='payments')
+    op.drop_index('ix_payments_status_processed_at', table_name='payments')
+    op.drop_index(op.f('ix_payments_transaction_id'), table_name='payments')
@@ -0,0 +1,50 @@
+"""Add catalog version counter and product tombstones
+
+Revision ID: e5c2a8d91f37
+Revises: d83b61f4e0a7
+Create Date: 2026-10-18 21:14:52.630418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c2a8d91f37'
+down_revision: Union[str, Sequence[str], None] = 'd83b61f4e0a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('product_tombstones',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('catalog_version', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_index(op.f('ix_product_tombstones_catalog_version'), 'product_tombstones', ['catalog_version'], unique=False)
+    op.add_column('products', sa.Column('catalog_version', sa.BigInteger(), server_default='0', nullable=False))
+    op.create_index(op.f('ix_products_catalog_version'), 'products', ['catalog_version'], unique=False)
+
+    # Existing rows all belong to version 1; terminals holding a timestamp
+    # version from before are told to re-snapshot
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (1, 1)")
+    op.execute("UPDATE products SET catalog_version = 1")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_products_catalog_version'), table_name='products')
+    op.drop_column('products', 'catalog_version')
+    op.drop_index(op.f('ix_product_tombstones_catalog_version'), table_name='product_tombstones')
+    op.drop_table('product_tombstones')
+    op.drop_table('catalog_version')
@@ -0,0 +1,33 @@
+"""Add payment status PROCESSING
+
+Revision ID: f2a9c4e17b3d
+Revises: b71f0d3a6c25
+Create Date: 2026-10-18 23:05:12.481906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a9c4e17b3d'
+down_revision: Union[str, Sequence[str], None] = 'b71f0d3a6c25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # A new enum label cannot be used in the transaction that adds it
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE paymentstatus ADD VALUE IF NOT EXISTS 'PROCESSING' AFTER 'PENDING'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Postgres cannot drop an enum label; it stays defined but unused
+    op.execute("UPDATE payments SET status = 'PENDING' WHERE status = 'PROCESSING'")
+    op.execute("UPDATE transactions SET payment_status = 'PENDING' WHERE payment_status = 'PROCESSING'")
@@ -5,6 +5,17 @@ from .core.config import settings
 from .api import init_app as init_api
 from .utils.middleware import request_middleware
 from .db.session import session_manager
+from .db.cache import product_cache
+from .db.cart_store import cart_store
+from .utils.http_cache import response_cache
+from .services.cache_relay import cache_relay
+from .services.cart_events import cart_events
+from .services.cart_reaper import cart_reaper
+from .services.idempotency import idempotency_store
+from .services.payment_gateway import payment_gateway
+from .services.payment_webhooks import payment_webhooks
+from .services.payment_queue import payment_queue
+from .services.reconciliation import payment_reconciler
 
 def create_application() -> FastAPI:
     # Initialize logging first
@@ -34,7 +45,17 @@ def create_application() -> FastAPI:
         return {
             "app": settings.APP_NAME,
             "version": settings.APP_VERSION,
-            "debug": settings.DEBUG
+            "debug": settings.DEBUG,
+            "product_cache": product_cache.stats(),
+            "response_cache": response_cache.stats(),
+            "cache_relay": cache_relay.stats(),
+            "cart_store": cart_store.stats() if cart_store else None,
+            "cart_events": cart_events.stats(),
+            "cart_reaper": cart_reaper.stats(),
+            "idempotency": idempotency_store.stats(),
+            "payments": payment_queue.stats(),
+            "payment_webhooks": payment_webhooks.stats(),
+            "reconciliation": payment_reconciler.stats()
         }
 
     
@@ -57,9 +78,32 @@ def create_application() -> FastAPI:
     @app.on_event("startup")
     async def startup():
         session_manager.init(settings.DATABASE_URL)
+        if cart_store:
+            cart_store.start(session_manager.get_db_no_ctx)
+        # Cache invalidations need the bridge whenever there are other workers
+        if settings.CART_EVENTS_NOTIFY or settings.WORKERS > 1:
+            await cart_events.start(session_manager.engine, relay_events=settings.CART_EVENTS_NOTIFY)
+        cache_relay.start(settings.WORKERS)
+        if settings.CART_REAPER_ENABLED:
+            cart_reaper.start(session_manager.get_db_no_ctx)
+        await payment_gateway.start()
+        if settings.PAYMENT_QUEUE_ENABLED:
+            await payment_queue.start(session_manager.get_db_no_ctx)
+        payment_webhooks.start(session_manager.get_db_no_ctx)
+        if settings.RECONCILIATION_ENABLED:
+            payment_reconciler.start(session_manager.get_db_no_ctx)
         
     @app.on_event("shutdown")
     async def shutdown():
+        await payment_reconciler.stop()
+        await payment_webhooks.stop()
+        await payment_queue.stop()
+        await payment_gateway.close()
+        await cart_reaper.stop()
+        await cache_relay.stop()
+        await cart_events.stop()
+        if cart_store:
+            await cart_store.stop()
         await session_manager.close()
     
     return app
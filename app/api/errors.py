@@ -4,7 +4,10 @@ from app.services.exceptions import (
     InsufficientStockError,
     AgeVerificationError,
     PaymentProcessingError,
-    CartValidationError
+    CartValidationError,
+    IdempotencyKeyError,
+    WebhookSignatureError,
+    WebhookBacklogError
 )
 
 def handle_service_error(exc: ServiceException):
@@ -34,6 +37,21 @@ def handle_service_error(exc: ServiceException):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(exc)
         )
+    elif isinstance(exc, IdempotencyKeyError):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(exc)
+        )
+    elif isinstance(exc, WebhookSignatureError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(exc)
+        )
+    elif isinstance(exc, WebhookBacklogError):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc)
+        )
     else:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
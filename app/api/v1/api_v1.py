@@ -4,7 +4,8 @@ from app.api.v1.endpoints import (
     products,
     payment,
     transactions,
-    auth
+    auth,
+    webhooks
 )
 
 router = APIRouter()
@@ -14,3 +15,4 @@ router.include_router(cart.router, prefix="/cart", tags=["cart"])
 router.include_router(payment.router, prefix="/payment", tags=["payment"])
 router.include_router(transactions.router, prefix="/transactions", tags=["transactions"])
 router.include_router(auth.router, prefix="/auth", tags=["auth"])
+router.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
@@ -1,4 +1,4 @@
-from fastapi import Depends, Header, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Response, status
 from typing import Optional, AsyncGenerator
 from datetime import date
 from app.db.session import get_db as db_session_get_db
@@ -8,10 +8,15 @@ from app.services import (
     PaymentService,
     InventoryService,
     ReceiptService,
-    AgeVerificationService
+    AgeVerificationService,
+    ProductImportService,
+    CatalogService,
+    CheckoutService
 )
 from app.services.exceptions import ServiceException
 from app.api.errors import handle_service_error
+from app.core.security import get_current_user
+from app.models.db_models import User, UserRole
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async for session in db_session_get_db():
@@ -32,6 +37,23 @@ async def get_receipt_service(db: AsyncSession = Depends(get_db)):
 async def get_age_verification_service(db: AsyncSession = Depends(get_db)):
     return AgeVerificationService(db_session=db)
 
+async def get_import_service(db: AsyncSession = Depends(get_db)):
+    return ProductImportService(db_session=db)
+
+async def get_catalog_service(db: AsyncSession = Depends(get_db)):
+    return CatalogService(db_session=db)
+
+async def get_checkout_service(db: AsyncSession = Depends(get_db)):
+    return CheckoutService(db_session=db)
+
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role != UserRole.ADMIN.value and not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
+
 async def get_session_id(
     x_session_id: Optional[str] = Header(None, alias="X-Session-ID")
 ) -> str:
@@ -47,6 +69,12 @@ async def get_user_id(
 ) -> Optional[int]:
     return x_user_id
 
+def set_next_cursor(response: Response, items) -> None:
+    """Expose the keyset cursor of a paginated listing as X-Next-Cursor"""
+    next_cursor = getattr(items, "next_cursor", None)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
 async def get_birth_date(
     x_birth_date: Optional[str] = Header(None, alias="X-Birth-Date")
 ) -> Optional[date]:
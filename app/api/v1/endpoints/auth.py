@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.services import CartService
 from app.api.v1.dependencies import get_cart_service, get_session_id
 from app.db.session import get_db
-from app.models.schemas import Token, UserCreate, UserInDB
+from app.models.schemas import CartInDB, Token, UserCreate, UserInDB
 from app.db.repositories import user_repo
 from app.core.config import settings
 from datetime import timedelta
@@ -50,7 +50,7 @@ async def login_for_access_token(
 async def read_users_me(current_user: UserInDB = Depends(get_current_user)):
     return current_user
 
-@router.post("/merge-cart")
+@router.post("/merge-cart", response_model=CartInDB)
 async def merge_guest_cart_with_user(
     cart_service: CartService = Depends(get_cart_service),
     session_id: str = Depends(get_session_id),
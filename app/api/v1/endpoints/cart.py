@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, Header, HTTPException, status
-from typing import Optional
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+from typing import Optional, List
 from datetime import date
-from app.models.schemas import CartInDB, CartItemCreate, CartItemUpdate
+from app.core.config import settings
+from app.models.schemas import CartInDB, CartItemCreate, CartItemUpdate, CartBatchResult
 from app.services import CartService, AgeVerificationService
 from app.api.v1.dependencies import (
     get_cart_service,
@@ -10,6 +13,7 @@ from app.api.v1.dependencies import (
     get_user_id,
     get_birth_date
 )
+from app.services.cart_events import cart_events
 from app.services.exceptions import ServiceException
 from app.api.errors import handle_service_error
 
@@ -34,9 +38,20 @@ async def add_cart_item(
     user_id: Optional[int] = Depends(get_user_id)
 ):
     try:
-        cart = await cart_service.get_or_create_cart(user_id=user_id, session_id=session_id)
-        await cart_service.add_item_to_cart(cart.id, item)
-        return await cart_service.get_or_create_cart(user_id=user_id, session_id=session_id)
+        return await cart_service.add_item(item, user_id=user_id, session_id=session_id)
+    except ServiceException as exc:
+        handle_service_error(exc)
+
+@router.post("/items/batch", response_model=CartBatchResult)
+async def add_cart_items(
+    items: List[CartItemCreate],
+    cart_service: CartService = Depends(get_cart_service),
+    session_id: str = Depends(get_session_id),
+    user_id: Optional[int] = Depends(get_user_id)
+):
+    """Add a burst of scans at once; lines without enough stock are reported, not added"""
+    try:
+        return await cart_service.add_items(items, user_id=user_id, session_id=session_id)
     except ServiceException as exc:
         handle_service_error(exc)
 
@@ -99,8 +114,68 @@ async def get_cart_totals(
     session_id: str = Depends(get_session_id),
     user_id: Optional[int] = Depends(get_user_id)
 ):
+    try:
+        return await cart_service.get_cart_totals(user_id=user_id, session_id=session_id)
+    except ServiceException as exc:
+        handle_service_error(exc)
+
+@router.post("/events-token")
+async def get_cart_events_token(
+    cart_service: CartService = Depends(get_cart_service),
+    session_id: str = Depends(get_session_id),
+    user_id: Optional[int] = Depends(get_user_id)
+):
+    """Signed, short-lived token for opening /cart/ws on the owner's cart"""
     try:
         cart = await cart_service.get_or_create_cart(user_id=user_id, session_id=session_id)
-        return await cart_service.calculate_cart_totals(cart.id)
+        return {
+            "cart_id": cart.id,
+            "token": cart_service.events_token(cart),
+            "expires_in": settings.CART_EVENTS_TOKEN_TTL_SECONDS
+        }
     except ServiceException as exc:
         handle_service_error(exc)
+
+@router.websocket("/ws")
+async def cart_updates(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+    cart_service: CartService = Depends(get_cart_service)
+):
+    """Push cart changes and totals for a cart as they happen.
+
+    Connect with ?token= from POST /cart/events-token; a handshake whose
+    token is missing, forged or expired, or whose cart has since closed or
+    changed hands, is refused. Clients should fetch GET /cart/ once after
+    connecting; every message after that is a delta with the cart's new
+    totals.
+    """
+    cart_id = await cart_service.authorize_events(token) if token else None
+    if cart_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    async with cart_events.subscribe(cart_id) as queue:
+        # Watch the socket too, so a silent cart does not hide a disconnect
+        closed = asyncio.ensure_future(websocket.receive())
+        try:
+            while True:
+                next_event = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    {closed, next_event}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_event in done:
+                    await websocket.send_json(jsonable_encoder(next_event.result()))
+                else:
+                    next_event.cancel()
+
+                if closed in done:
+                    if closed.result()["type"] == "websocket.disconnect":
+                        break
+                    # Client messages carry nothing; keep listening
+                    closed = asyncio.ensure_future(websocket.receive())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            closed.cancel()
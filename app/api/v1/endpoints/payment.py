@@ -1,56 +1,75 @@
-from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.schemas import PaymentCreate
-from app.services import PaymentService, CartService
+from app.models.db_models import PaymentMethod
+from app.services import PaymentService, CheckoutService
 from app.api.v1.dependencies import (
+    get_db,
     get_payment_service,
-    get_cart_service,
+    get_checkout_service,
     get_session_id,
     get_user_id
 )
 from typing import Optional
 from app.services.exceptions import ServiceException
+from app.services.idempotency import idempotent_response
 from app.api.errors import handle_service_error
 
 router = APIRouter()
 
 @router.post("/checkout")
 async def process_checkout(
+    request: Request,
     payment_data: PaymentCreate,
-    payment_service: PaymentService = Depends(get_payment_service),
-    cart_service: CartService = Depends(get_cart_service),
+    checkout_service: CheckoutService = Depends(get_checkout_service),
     session_id: str = Depends(get_session_id),
-    user_id: Optional[int] = Depends(get_user_id)
+    user_id: Optional[int] = Depends(get_user_id),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_db)
+):
+    async def run(before_commit):
+        try:
+            return await checkout_service.checkout(
+                payment_method=PaymentMethod(payment_data.method),
+                payment_details=payment_data.dict(),
+                user_id=user_id,
+                session_id=session_id,
+                before_commit=before_commit
+            )
+        except ServiceException as exc:
+            handle_service_error(exc)
+
+    try:
+        return await idempotent_response(request, db, key=idempotency_key, run=run)
+    except ServiceException as exc:
+        handle_service_error(exc)
+
+@router.get("/{payment_id}/status")
+async def get_payment_status(
+    payment_id: int,
+    payment_service: PaymentService = Depends(get_payment_service)
 ):
     try:
-        cart = await cart_service.get_or_create_cart(user_id=user_id, session_id=session_id)
-        cart_totals = await cart_service.calculate_cart_totals(cart.id)
-        
-        # Create transaction
-        transaction = await cart_service.convert_cart_to_transaction(cart.id)
-        
-        # Process payment
-        payment = await payment_service.process_payment(
-            transaction_id=transaction.id,
-            payment_method=payment_data.method,
-            amount=cart_totals["total"],
-            payment_details=payment_data.dict()
-        )
-        
-        return {
-            "transaction": transaction,
-            "payment": payment,
-            "receipt_number": payment.receipt_number
-        }
+        return await payment_service.get_payment_status(payment_id)
     except ServiceException as exc:
         handle_service_error(exc)
 
 @router.post("/refund/{payment_id}")
 async def process_refund(
+    request: Request,
     payment_id: int,
     amount: Optional[float] = None,
-    payment_service: PaymentService = Depends(get_payment_service)
+    payment_service: PaymentService = Depends(get_payment_service),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_db)
 ):
+    async def run(before_commit):
+        try:
+            return await payment_service.refund_payment(payment_id, amount, before_commit=before_commit)
+        except ServiceException as exc:
+            handle_service_error(exc)
+
     try:
-        return await payment_service.refund_payment(payment_id, amount)
+        return await idempotent_response(request, db, key=idempotency_key, run=run)
     except ServiceException as exc:
         handle_service_error(exc)
@@ -1,53 +1,214 @@
-from fastapi import APIRouter, Depends, Header, HTTPException, status
+import gzip
+import io
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Request, Response, UploadFile, status
+from fastapi.responses import JSONResponse
 from typing import Optional, List
-from app.models.schemas import ProductInDB, ProductCreate, ProductUpdate
-from app.services import InventoryService
-from app.api.v1.dependencies import get_inventory_service
+from app.models.schemas import (
+    CatalogFacets,
+    ProductInDB,
+    ProductWithStock,
+    InventoryInDB,
+    ProductCreate,
+    ProductUpdate,
+    ProductImportReport,
+    ProductLookupRequest,
+    ProductLookupResponse
+)
+from app.services import InventoryService, ProductImportService, CatalogService
+from app.services.import_service import SUPPORTED_FORMATS
+from app.api.v1.dependencies import (
+    get_inventory_service,
+    get_import_service,
+    get_catalog_service,
+    get_current_admin
+)
+from app.utils.http_cache import accepts_gzip, etag_matches, cached_json_response
+from app.db.pagination import InvalidCursorError, Page
 from app.services.exceptions import ServiceException
 from app.api.errors import handle_service_error
 
 router = APIRouter()
 
-@router.get("/", response_model=List[ProductInDB])
+@router.get("/", response_model=List[ProductWithStock])
 async def list_products(
+    request: Request,
     category: Optional[str] = None,
     search: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    include: Optional[str] = None,
     inventory_service: InventoryService = Depends(get_inventory_service)
 ):
-    try:
+    include_inventory = "inventory" in (include or "").split(",")
+    if search and cursor:
+        # Search results are ordered by relevance, which has no stable keyset
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor cannot be combined with search; page search results with skip"
+        )
+
+    async def load():
         if search:
-            return await inventory_service.search_products(search, skip=skip, limit=limit)
+            products = await inventory_service.search_products(
+                search, skip=skip, limit=limit, include_inventory=include_inventory
+            )
         elif category:
-            return await inventory_service.get_products_by_category(category, skip=skip, limit=limit)
+            products = await inventory_service.get_products_by_category(
+                category, skip=skip, limit=limit, cursor=cursor,
+                include_inventory=include_inventory
+            )
         else:
-            return await inventory_service.get_active_products(skip=skip, limit=limit)
+            products = await inventory_service.get_active_products(
+                skip=skip, limit=limit, cursor=cursor,
+                include_inventory=include_inventory
+            )
+        return Page(
+            [ProductWithStock.from_product(p, include_inventory) for p in products],
+            next_cursor=getattr(products, "next_cursor", None)
+        )
+
+    try:
+        return await cached_json_response(
+            request,
+            schema=List[ProductWithStock],
+            tags=["catalog", "inventory"] if include_inventory else ["catalog"],
+            load=load,
+            headers=lambda page: {"X-Next-Cursor": page.next_cursor} if page.next_cursor else {}
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    except ServiceException as exc:
+        handle_service_error(exc)
+
+@router.get("/snapshot")
+async def get_catalog_snapshot(
+    catalog_service: CatalogService = Depends(get_catalog_service),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """Full active catalog for terminals that resolve scans locally"""
+    version = await catalog_service.get_version()
+    headers = {
+        "ETag": f'"catalog-{version}"',
+        "X-Catalog-Version": str(version),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    snapshot = await catalog_service.get_snapshot(version)
+    if accepts_gzip(accept_encoding):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+    return Response(
+        content=gzip.decompress(snapshot.body),
+        media_type="application/json",
+        headers=headers
+    )
+
+@router.get("/changes")
+async def get_catalog_changes(
+    since: int,
+    catalog_service: CatalogService = Depends(get_catalog_service),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Products changed after catalog version `since`"""
+    version = await catalog_service.get_version()
+    headers = {
+        "ETag": f'"catalog-{since}-{version}"',
+        "X-Catalog-Version": str(version),
+        "Cache-Control": "no-cache"
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    changes = await catalog_service.get_changes(since, version)
+    return JSONResponse(content=changes, headers=headers)
+
+@router.get("/facets", response_model=CatalogFacets)
+async def get_catalog_facets(
+    request: Request,
+    catalog_service: CatalogService = Depends(get_catalog_service)
+):
+    """Product counts per category, status and age restriction"""
+    return await cached_json_response(
+        request,
+        schema=CatalogFacets,
+        tags=["catalog"],
+        load=catalog_service.get_facets
+    )
+
+@router.post("/lookup", response_model=ProductLookupResponse)
+async def lookup_products(
+    lookup: ProductLookupRequest,
+    inventory_service: InventoryService = Depends(get_inventory_service)
+):
+    """Resolve a batch of scanned barcodes and/or ids in one round trip"""
+    try:
+        return await inventory_service.lookup_products(lookup.barcodes, lookup.ids)
     except ServiceException as exc:
         handle_service_error(exc)
 
+@router.post("/import", response_model=ProductImportReport)
+async def import_products(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    import_service: ProductImportService = Depends(get_import_service),
+    admin=Depends(get_current_admin)
+):
+    fmt = format or (file.filename or "").rsplit(".", 1)[-1].lower()
+    if fmt == "jsonl":
+        fmt = "ndjson"
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format. Use one of: {', '.join(SUPPORTED_FORMATS)}"
+        )
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return await import_service.import_stream(stream, fmt=fmt, batch_size=batch_size)
+    finally:
+        stream.detach()
+
 @router.get("/{product_id}", response_model=ProductInDB)
 async def get_product(
     product_id: int,
+    request: Request,
     inventory_service: InventoryService = Depends(get_inventory_service)
 ):
     try:
-        product = await inventory_service.get_product(product_id)
-        if not product:
+        response = await cached_json_response(
+            request,
+            schema=ProductInDB,
+            tags=[f"product:{product_id}"],
+            load=lambda: inventory_service.get_product(product_id),
+            etag=lambda product: f'"product-{product.id}-{product.catalog_version}"'
+        )
+        if response is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-        return product
+        return response
     except ServiceException as exc:
         handle_service_error(exc)
 
-@router.get("/{product_id}/inventory")
+@router.get("/{product_id}/inventory", response_model=InventoryInDB)
 async def get_product_inventory(
     product_id: int,
+    request: Request,
     inventory_service: InventoryService = Depends(get_inventory_service)
 ):
     try:
-        inventory = await inventory_service.get_product_inventory(product_id)
-        if not inventory:
+        response = await cached_json_response(
+            request,
+            schema=InventoryInDB,
+            tags=["inventory", f"product:{product_id}"],
+            load=lambda: inventory_service.get_product_inventory(product_id)
+        )
+        if response is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Inventory not found")
-        return inventory
+        return response
     except ServiceException as exc:
         handle_service_error(exc)
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, Header, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from typing import List, Optional
 from app.models.schemas import TransactionInDB
 from app.services import CartService
-from app.api.v1.dependencies import get_cart_service, get_user_id
+from app.api.v1.dependencies import get_cart_service, get_user_id, set_next_cursor
+from app.db.pagination import InvalidCursorError
 from app.services.exceptions import ServiceException
 from app.api.errors import handle_service_error
 
@@ -10,13 +11,21 @@ router = APIRouter()
 
 @router.get("/", response_model=List[TransactionInDB])
 async def list_transactions(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     cart_service: CartService = Depends(get_cart_service),
     user_id: int = Depends(get_user_id)
 ):
     try:
-        return await cart_service.get_user_transactions(user_id, skip=skip, limit=limit)
+        transactions = await cart_service.get_user_transactions(
+            user_id, skip=skip, limit=limit, cursor=cursor
+        )
+        set_next_cursor(response, transactions)
+        return transactions
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     except ServiceException as exc:
         handle_service_error(exc)
 
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Header, Request
+from typing import Optional
+from app.services.exceptions import ServiceException
+from app.services.payment_webhooks import payment_webhooks
+from app.api.errors import handle_service_error
+
+router = APIRouter()
+
+@router.post("/paystack")
+async def receive_paystack_webhook(
+    request: Request,
+    x_paystack_signature: Optional[str] = Header(None)
+):
+    """Acknowledge a Paystack event once verified and stored; it is applied
+    to the payment shortly after"""
+    body = await request.body()
+    try:
+        queued = await payment_webhooks.receive(body, x_paystack_signature)
+    except ServiceException as exc:
+        handle_service_error(exc)
+    return {"status": "queued" if queued else "ignored"}
@@ -10,6 +10,8 @@ class Settings(BaseSettings):
     APP_VERSION: str = "1.0.0"
     API_V1_STR: str = "/api/v1"
     DEBUG: bool = False
+    # Server processes; each has its own caches and background tasks
+    WORKERS: int = 4
     
     # Database
     DATABASE_URL: str 
@@ -26,6 +28,115 @@ class Settings(BaseSettings):
     PAYSTACK_SECRET_KEY: Optional[str] = None
     PAYSTACK_PUBLIC_KEY: Optional[str] = None
     PAYSTACK_BASE_URL: Optional[str] = None
+    # Shared HTTP client: pooled keep-alive connections, per-call timeouts,
+    # jittered retries and a circuit breaker
+    PAYSTACK_TIMEOUT_SECONDS: float = 10.0
+    PAYSTACK_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    PAYSTACK_MAX_CONNECTIONS: int = 50
+    PAYSTACK_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    PAYSTACK_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    PAYSTACK_MAX_RETRIES: int = 2
+    PAYSTACK_RETRY_BACKOFF_SECONDS: float = 0.2
+    PAYSTACK_BREAKER_THRESHOLD: int = 5
+    PAYSTACK_BREAKER_RESET_SECONDS: float = 30.0
+    # Paystack requires a customer email; kiosk guests have none
+    PAYSTACK_DEFAULT_EMAIL: str = "checkout@selfcheckout.local"
+
+    # Caching: caches are per worker; writes invalidate them on every worker
+    # over the Postgres LISTEN/NOTIFY bridge. With WORKERS > 1 and no bridge
+    # (a database other than Postgres) both caches are disabled at startup.
+    PRODUCT_CACHE_ENABLED: bool = True
+    PRODUCT_CACHE_MAX_SIZE: int = 50000
+    PRODUCT_CACHE_TTL_SECONDS: int = 300
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    RESPONSE_CACHE_TTL_SECONDS: int = 30
+    HTTP_CACHE_MAX_AGE_SECONDS: int = 5
+
+    # Catalog import
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_REPORTED_ERRORS: int = 1000
+
+    # Catalog sync
+    CATALOG_SNAPSHOT_TTL_SECONDS: int = 3600
+    CATALOG_DELTA_MAX_ROWS: int = 10000
+
+    # Cart store: "database" keeps carts in Postgres only, "memory" or
+    # "redis" hold active carts in front of it and flush them write-behind;
+    # their stock holds are written with each flush, so other carts see
+    # them up to CART_STORE_FLUSH_INTERVAL_SECONDS late
+    CART_STORE_BACKEND: str = "database"
+    CART_STORE_REDIS_URL: str = "redis://localhost:6379/0"
+    CART_STORE_TTL_SECONDS: int = 4 * 60 * 60
+    CART_STORE_FLUSH_INTERVAL_SECONDS: float = 1.0
+    CART_STORE_FLUSH_BATCH_SIZE: int = 500
+
+    # Stock reservations held by cart lines
+    RESERVATION_TTL_MINUTES: int = 30
+
+    # Idle cart reaper
+    CART_REAPER_ENABLED: bool = True
+    CART_IDLE_TTL_MINUTES: int = 120
+    CART_REAPER_INTERVAL_SECONDS: int = 300
+    CART_REAPER_BATCH_SIZE: int = 1000
+
+    # Idempotency-Key support for payment endpoints; an in-flight key older
+    # than IDEMPOTENCY_LOCK_TIMEOUT_SECONDS is taken to be abandoned
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0
+    IDEMPOTENCY_LOCK_TIMEOUT_SECONDS: int = 300
+
+    # Payment processing: checkout queues the charge for a pool of workers
+    # when PAYMENT_QUEUE_ENABLED, otherwise it charges inline.
+    # PAYMENT_GATEWAY is "simulator" or "paystack"
+    PAYMENT_GATEWAY: str = "simulator"
+    PAYMENT_QUEUE_ENABLED: bool = True
+    PAYMENT_WORKERS: int = 8
+    PAYMENT_QUEUE_SIZE: int = 10000
+    PAYMENT_MAX_ATTEMPTS: int = 3
+    PAYMENT_RETRY_DELAY_SECONDS: float = 2.0
+    PAYMENT_SIMULATOR_LATENCY_MS: float = 0.0
+    PAYMENT_SIMULATOR_JITTER_MS: float = 0.0
+    PAYMENT_SIMULATOR_FAILURE_RATE: float = 0.0
+
+    # Payment webhooks: verified events are buffered and applied in batches
+    # of up to PAYMENT_WEBHOOK_BATCH_SIZE at least every
+    # PAYMENT_WEBHOOK_FLUSH_SECONDS; redeliveries within
+    # PAYMENT_WEBHOOK_DEDUP_SECONDS are dropped without touching the database.
+    # When a batch fails its events are applied one by one; an event that
+    # keeps failing is retried with backoff from PAYMENT_WEBHOOK_RETRY_SECONDS
+    # and dead-lettered after PAYMENT_WEBHOOK_MAX_ATTEMPTS. Every event is
+    # stored in payment_webhook_events before it is acknowledged; applied
+    # ones are purged by the cart reaper after PAYMENT_WEBHOOK_RETENTION_DAYS
+    PAYMENT_WEBHOOK_QUEUE_SIZE: int = 10000
+    PAYMENT_WEBHOOK_BATCH_SIZE: int = 200
+    PAYMENT_WEBHOOK_FLUSH_SECONDS: float = 0.05
+    PAYMENT_WEBHOOK_DEDUP_SIZE: int = 50000
+    PAYMENT_WEBHOOK_DEDUP_SECONDS: int = 3600
+    PAYMENT_WEBHOOK_MAX_ATTEMPTS: int = 5
+    PAYMENT_WEBHOOK_RETRY_SECONDS: float = 1.0
+    PAYMENT_WEBHOOK_RETENTION_DAYS: int = 7
+
+    # Payment reconciliation: compares payments with transactions every
+    # RECONCILIATION_INTERVAL_SECONDS, on the wall clock from
+    # RECONCILIATION_START_HOUR (UTC), ignoring rows younger than
+    # RECONCILIATION_GRACE_MINUTES that may still be settling. The first
+    # worker to claim a scheduled pass in scheduled_runs runs it
+    RECONCILIATION_ENABLED: bool = True
+    RECONCILIATION_INTERVAL_SECONDS: int = 86400
+    RECONCILIATION_START_HOUR: int = 2
+    RECONCILIATION_GRACE_MINUTES: int = 60
+    RECONCILIATION_BATCH_SIZE: int = 1000
+    RECONCILIATION_SAMPLE_SIZE: int = 100
+
+    # Cart events: CART_EVENTS_NOTIFY relays pushes between workers through
+    # Postgres LISTEN/NOTIFY; cache invalidations use it regardless
+    CART_EVENTS_NOTIFY: bool = False
+    CART_EVENTS_CHANNEL: str = "cart_events"
+    CART_EVENTS_QUEUE_SIZE: int = 100
+    # Lifetime of the signed token a display opens the cart socket with
+    CART_EVENTS_TOKEN_TTL_SECONDS: int = 60
 
     # CORS
     CORS_ORIGINS: list[str] = ["*"]
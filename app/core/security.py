@@ -55,6 +55,14 @@ def decode_access_token(token: str):
         )
 
 
+def decode_token(token: str) -> Optional[dict]:
+    """Claims of a token signed here, or None if it is forged or expired"""
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+
+
 async def authenticate_user(email: str, password: str, db: AsyncSession):
     from app.db.repositories import user_repo
     
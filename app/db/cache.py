@@ -0,0 +1,105 @@
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from app.core.config import settings
+from app.models.db_models import Product
+from app.utils.cache import TTLCache
+
+
+class ProductCache:
+    """In-process read-through cache of product rows keyed by id and barcode.
+
+    Rows are stored as plain column snapshots rather than ORM instances so a
+    cached product never leaks from the session that loaded it into another.
+    Invalidations reach other workers through `on_invalidate` and the cache
+    invalidation relay; a multi-worker deployment without the relay runs
+    with the cache disabled.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, enabled: bool = True):
+        self.enabled = enabled
+        self._by_id = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._barcode_ids = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._columns = [attr.key for attr in inspect(Product).column_attrs]
+        self.hits = 0
+        self.misses = 0
+        self.on_invalidate: Optional[Callable[[int], None]] = None
+
+    def get_by_id(self, product_id: int) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+
+        values = self._by_id.get(product_id)
+        self._count(values)
+        return values
+
+    def get_by_barcode(self, barcode: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+
+        values = None
+        product_id = self._barcode_ids.get(barcode)
+        if product_id is not None:
+            values = self._by_id.get(product_id)
+            # The barcode may have moved to another row since it was indexed
+            if values is not None and values["barcode"] != barcode:
+                values = None
+        self._count(values)
+        return values
+
+    def put(self, product: Optional[Product]) -> None:
+        if not self.enabled or product is None:
+            return
+
+        values = {key: getattr(product, key) for key in self._columns}
+        self._by_id.set(product.id, values)
+        self._barcode_ids.set(product.barcode, product.id)
+
+    def invalidate(self, product_id: int, relay: bool = True) -> None:
+        if relay and self.on_invalidate is not None:
+            self.on_invalidate(product_id)
+        values = self._by_id.pop(product_id)
+        if values is not None:
+            self._barcode_ids.pop(values["barcode"])
+
+    def clear(self) -> None:
+        self._by_id.clear()
+        self._barcode_ids.clear()
+
+    def detached(self, values: Dict[str, Any]) -> Product:
+        """Rebuild a cached snapshot as a detached instance. It is kept out of
+        every session: merged in, it would sit in the identity map and stand
+        in for the row in later queries, so prices read there could come
+        from the cache."""
+        product = Product.__mapper__.class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(product, key, value)
+        make_transient_to_detached(product)
+        return product
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._by_id),
+            "maxsize": self._by_id.maxsize,
+            "ttl_seconds": self._by_id.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self._by_id.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def _count(self, values: Optional[Dict[str, Any]]) -> None:
+        if values is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+
+product_cache = ProductCache(
+    maxsize=settings.PRODUCT_CACHE_MAX_SIZE,
+    ttl=settings.PRODUCT_CACHE_TTL_SECONDS,
+    enabled=settings.PRODUCT_CACHE_ENABLED
+)
@@ -0,0 +1,535 @@
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from sqlalchemy import delete, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.db_models import Cart, CartItem
+from .repositories import cart_repo, product_repo, reservation_repo
+from .repositories.base import upsert_insert
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StoredCartItem:
+    product_id: int
+    quantity: int
+    price_at_addition: Decimal
+    added_at: datetime
+    id: Optional[int] = None  # None until the line has been flushed
+    is_age_verified: bool = False
+    tax_rate: Decimal = Decimal(0)  # Product's rate when scanned, for running totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "product_id": self.product_id,
+            "quantity": self.quantity,
+            "price_at_addition": str(self.price_at_addition),
+            "added_at": self.added_at.isoformat(),
+            "is_age_verified": self.is_age_verified,
+            "tax_rate": str(self.tax_rate)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StoredCartItem":
+        return cls(
+            id=data.get("id"),
+            product_id=data["product_id"],
+            quantity=data["quantity"],
+            price_at_addition=Decimal(data["price_at_addition"]),
+            added_at=datetime.fromisoformat(data["added_at"]),
+            is_age_verified=data.get("is_age_verified", False),
+            tax_rate=Decimal(data.get("tax_rate", 0))
+        )
+
+
+@dataclass
+class StoredCart:
+    """Active cart held in the cart store; shaped like Cart for CartInDB"""
+    id: int
+    user_id: Optional[int]
+    session_id: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    lines: Dict[int, StoredCartItem] = field(default_factory=dict)
+
+    @property
+    def items(self) -> List[StoredCartItem]:
+        return list(self.lines.values())
+
+    @property
+    def subtotal(self) -> Decimal:
+        return sum((item.quantity * item.price_at_addition for item in self.lines.values()), Decimal(0))
+
+    @property
+    def tax_amount(self) -> Decimal:
+        return sum(
+            (item.quantity * item.price_at_addition * item.tax_rate for item in self.lines.values()),
+            Decimal(0)
+        )
+
+    @property
+    def item_count(self) -> int:
+        return len(self.lines)
+
+    @classmethod
+    def from_cart(cls, cart: Cart) -> "StoredCart":
+        return cls(
+            id=cart.id,
+            user_id=cart.user_id,
+            session_id=cart.session_id,
+            created_at=cart.created_at,
+            updated_at=cart.updated_at,
+            lines={
+                item.product_id: StoredCartItem(
+                    id=item.id,
+                    product_id=item.product_id,
+                    quantity=item.quantity,
+                    price_at_addition=item.price_at_addition,
+                    added_at=item.added_at,
+                    is_age_verified=bool(item.is_age_verified),
+                    tax_rate=item.tax_rate_at_addition or Decimal(0)
+                )
+                for item in cart.items
+            }
+        )
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "id": self.id,
+            "user_id": self.user_id,
+            "session_id": self.session_id,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+            "items": [item.to_dict() for item in self.lines.values()]
+        }, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, raw: str) -> "StoredCart":
+        data = json.loads(raw)
+        items = [StoredCartItem.from_dict(item) for item in data["items"]]
+        return cls(
+            id=data["id"],
+            user_id=data["user_id"],
+            session_id=data["session_id"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+            updated_at=datetime.fromisoformat(data["updated_at"]),
+            lines={item.product_id: item for item in items}
+        )
+
+
+class CartStoreBackend(ABC):
+    """Key/value storage for serialized carts plus the set of dirty keys.
+
+    Implementations must be safe to share between requests; a shared backend
+    such as Redis also lets several workers see the same carts.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    async def update(
+        self,
+        key: str,
+        mutate: Callable[[Optional[str]], Optional[str]],
+        ttl: int
+    ) -> Optional[str]:
+        """Atomically replace a value with `mutate(current)`, unless that is
+        None, against writers in every worker; returns the value now stored.
+        `mutate` may be called more than once."""
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def mark_dirty(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def pop_dirty(self, count: int) -> List[str]:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBackend(CartStoreBackend):
+    """Process-local backend; carts only survive as long as the worker.
+
+    Single-worker only: another worker would not see the carts scanned here,
+    so `create_cart_store` refuses it when WORKERS > 1.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, str] = {}
+        self._expires: Dict[str, float] = {}
+        self._dirty: Dict[str, None] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= asyncio.get_running_loop().time():
+            # Never drop a cart that still has unflushed changes
+            if key not in self._dirty:
+                await self.delete(key)
+                return None
+        return self._values.get(key)
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        self._values[key] = value
+        self._expires[key] = asyncio.get_running_loop().time() + ttl
+
+    async def update(
+        self,
+        key: str,
+        mutate: Callable[[Optional[str]], Optional[str]],
+        ttl: int
+    ) -> Optional[str]:
+        # Nothing here yields to the event loop, so no other write interleaves
+        current = await self.get(key)
+        value = mutate(current)
+        if value is None:
+            return current
+        await self.set(key, value, ttl)
+        return value
+
+    async def delete(self, key: str) -> None:
+        self._values.pop(key, None)
+        self._expires.pop(key, None)
+        self._dirty.pop(key, None)
+
+    async def mark_dirty(self, key: str) -> None:
+        self._dirty[key] = None
+
+    async def pop_dirty(self, count: int) -> List[str]:
+        keys = list(self._dirty)[:count]
+        for key in keys:
+            del self._dirty[key]
+        return keys
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class RedisBackend(CartStoreBackend):
+    """Backend shared between workers; requires the optional `redis` package"""
+
+    DIRTY_KEY = "carts:dirty"
+
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as aioredis
+            from redis.exceptions import WatchError
+        except ImportError:
+            raise RuntimeError("CART_STORE_BACKEND=redis requires the 'redis' package")
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._watch_error = WatchError
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(f"cart:{key}")
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self._redis.set(f"cart:{key}", value, ex=ttl)
+
+    async def update(
+        self,
+        key: str,
+        mutate: Callable[[Optional[str]], Optional[str]],
+        ttl: int
+    ) -> Optional[str]:
+        """Optimistic WATCH/MULTI transaction, retried whenever another
+        worker wrote the cart between the read and the write"""
+        name = f"cart:{key}"
+        async with self._redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(name)
+                    current = await pipe.get(name)
+                    value = mutate(current)
+                    if value is None:
+                        return current
+                    pipe.multi()
+                    pipe.set(name, value, ex=ttl)
+                    await pipe.execute()
+                    return value
+                except self._watch_error:
+                    continue
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(f"cart:{key}")
+        await self._redis.srem(self.DIRTY_KEY, key)
+
+    async def mark_dirty(self, key: str) -> None:
+        await self._redis.sadd(self.DIRTY_KEY, key)
+
+    async def pop_dirty(self, count: int) -> List[str]:
+        return await self._redis.spop(self.DIRTY_KEY, count) or []
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+class CartStore:
+    """Write-behind store for active carts.
+
+    Scans update the stored cart atomically through `update` and mark it
+    dirty; a background task flushes dirty carts to carts/cart_items, and
+    their stock holds to inventory_reservations, in batches. Anything that
+    reads cart rows from the database (totals, checkout, merges) must call
+    `flush` for that cart first.
+    """
+
+    def __init__(
+        self,
+        backend: CartStoreBackend,
+        ttl: int,
+        flush_interval: float,
+        flush_batch_size: int
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._session_factory: Optional[Callable[[], Awaitable[AsyncSession]]] = None
+        self.flushes = 0
+        self.flushed_carts = 0
+        self.flush_errors = 0
+
+    @staticmethod
+    def key_for(user_id: Optional[int] = None, session_id: Optional[str] = None) -> str:
+        return f"user:{user_id}" if user_id else f"session:{session_id}"
+
+    def lock(self, key: str) -> asyncio.Lock:
+        """Serializes flushes of one cart within this worker"""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def get(self, key: str) -> Optional[StoredCart]:
+        raw = await self.backend.get(key)
+        return StoredCart.loads(raw) if raw is not None else None
+
+    async def add(self, key: str, cart: StoredCart) -> StoredCart:
+        """Store `cart` unless the key already holds one; returns the stored cart"""
+        raw = await self.backend.update(
+            key, lambda current: cart.dumps() if current is None else None, self.ttl
+        )
+        return StoredCart.loads(raw)
+
+    async def update(
+        self,
+        key: str,
+        change: Callable[[StoredCart], None],
+        dirty: bool = True
+    ) -> Optional[StoredCart]:
+        """Apply `change` to the stored cart atomically, so concurrent scans
+        on any worker are never lost; None if the key holds no cart.
+        `change` may be applied more than once, each time to a fresh copy."""
+        changed: Optional[StoredCart] = None
+
+        def mutate(raw: Optional[str]) -> Optional[str]:
+            nonlocal changed
+            if raw is None:
+                changed = None
+                return None
+            changed = StoredCart.loads(raw)
+            change(changed)
+            return changed.dumps()
+
+        await self.backend.update(key, mutate, self.ttl)
+        if changed is not None and dirty:
+            await self.backend.mark_dirty(key)
+        return changed
+
+    async def evict(self, key: str) -> None:
+        """Forget a cart after it was changed in the database directly"""
+        await self.backend.delete(key)
+        self._locks.pop(key, None)
+
+    async def flush(self, db: AsyncSession, keys: Optional[Iterable[str]] = None) -> int:
+        """Write the given carts (or one batch of dirty carts) to the database.
+
+        Lines are written with their absolute quantities, so flushing the
+        same state twice is harmless; the carts' stock reservations are reset
+        to the flushed lines. Lines of products that are no longer sellable
+        are dropped from the stored cart as well. Commits on `db`.
+        """
+        if keys is None:
+            keys = await self.backend.pop_dirty(self.flush_batch_size)
+        stored = {key: await self.get(key) for key in keys}
+        stored = {key: cart for key, cart in stored.items() if cart}
+        if not stored:
+            return 0
+
+        # Products taken off sale since they were scanned leave the carts
+        sellable = await product_repo.get_sellable_ids(
+            db, list({pid for cart in stored.values() for pid in cart.lines})
+        )
+        for key, cart in list(stored.items()):
+            withdrawn = [pid for pid in cart.lines if pid not in sellable]
+            if withdrawn:
+                logger.info(f"Dropping unsellable products {withdrawn} from cart {cart.id}")
+                # Written back through update so a scan that landed meanwhile is kept
+                updated = await self.update(key, lambda cart: _drop_lines(cart, withdrawn), dirty=False)
+                if updated is None:
+                    _drop_lines(cart, withdrawn)
+                stored[key] = updated or cart
+        carts = list(stored.values())
+
+        lines = [
+            {
+                "cart_id": cart.id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "price_at_addition": item.price_at_addition,
+                "tax_rate_at_addition": item.tax_rate,
+                "added_at": item.added_at,
+                "is_age_verified": item.is_age_verified
+            }
+            for cart in carts
+            for item in cart.lines.values()
+        ]
+        line_ids: Dict[tuple, int] = {}
+        if lines:
+            stmt = upsert_insert(db, CartItem).values(lines)
+            result = await db.execute(stmt.on_conflict_do_update(
+                index_elements=[CartItem.cart_id, CartItem.product_id],
+                set_={"quantity": stmt.excluded.quantity}
+            ).returning(CartItem.cart_id, CartItem.product_id, CartItem.id))
+            line_ids = {(cart_id, product_id): id for cart_id, product_id, id in result.all()}
+
+        # Lines removed from the stored carts
+        kept = [(line["cart_id"], line["product_id"]) for line in lines]
+        stale = delete(CartItem).where(CartItem.cart_id.in_([cart.id for cart in carts]))
+        if kept:
+            stale = stale.where(tuple_(CartItem.cart_id, CartItem.product_id).notin_(kept))
+        await db.execute(stale)
+        cart_ids = [cart.id for cart in carts]
+        await cart_repo.refresh_totals(db, cart_ids)
+        # Holds follow the flushed lines
+        await reservation_repo.release_carts(db, cart_ids)
+        await reservation_repo.hold_cart_lines(db, cart_ids)
+
+        await db.execute(
+            update(Cart),
+            [{"id": cart.id, "updated_at": cart.updated_at} for cart in carts]
+        )
+        await db.commit()
+
+        # New lines get their row ids, so they can be updated or removed by id
+        for key, cart in stored.items():
+            if any(item.id is None for item in cart.lines.values()):
+                await self.update(key, lambda cart: _set_line_ids(cart, line_ids), dirty=False)
+
+        self.flushes += 1
+        self.flushed_carts += len(carts)
+        return len(carts)
+
+    def start(self, session_factory: Callable[[], Awaitable[AsyncSession]]) -> None:
+        """Run the background flush loop on the current event loop"""
+        self._session_factory = session_factory
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Cancel the flush loop and write out everything still dirty"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session_factory is not None:
+            while await self._flush_once():
+                pass
+        await self.backend.close()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                # Keep going while full batches come back
+                while await self._flush_once() >= self.flush_batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Cart store flush failed: {str(e)}")
+
+    async def _flush_once(self) -> int:
+        keys = await self.backend.pop_dirty(self.flush_batch_size)
+        if not keys:
+            return 0
+        db = await self._session_factory()
+        try:
+            return await self.flush(db, keys)
+        except Exception:
+            self.flush_errors += 1
+            await db.rollback()
+            for key in keys:
+                await self.backend.mark_dirty(key)
+            raise
+        finally:
+            await db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "flushes": self.flushes,
+            "flushed_carts": self.flushed_carts,
+            "flush_errors": self.flush_errors
+        }
+
+
+def _drop_lines(cart: StoredCart, product_ids: List[int]) -> None:
+    for product_id in product_ids:
+        cart.lines.pop(product_id, None)
+
+
+def _set_line_ids(cart: StoredCart, line_ids: Dict[tuple, int]) -> None:
+    for item in cart.lines.values():
+        item.id = item.id or line_ids.get((cart.id, item.product_id))
+
+
+def create_cart_store() -> Optional[CartStore]:
+    """Cart store for CART_STORE_BACKEND, or None to keep carts in the database only"""
+    backend_name = settings.CART_STORE_BACKEND
+    if backend_name == "database":
+        return None
+    if backend_name == "memory":
+        if settings.WORKERS > 1:
+            raise ValueError(
+                "CART_STORE_BACKEND=memory keeps carts inside one worker; "
+                "set WORKERS=1 or use the redis backend"
+            )
+        backend = MemoryBackend()
+    elif backend_name == "redis":
+        backend = RedisBackend(settings.CART_STORE_REDIS_URL)
+    else:
+        raise ValueError(f"Unknown CART_STORE_BACKEND: {backend_name}")
+
+    return CartStore(
+        backend,
+        ttl=settings.CART_STORE_TTL_SECONDS,
+        flush_interval=settings.CART_STORE_FLUSH_INTERVAL_SECONDS,
+        flush_batch_size=settings.CART_STORE_FLUSH_BATCH_SIZE
+    )
+
+
+cart_store = create_cart_store()
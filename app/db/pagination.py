@@ -0,0 +1,82 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Sequence
+from sqlalchemy import DateTime, tuple_
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import ColumnElement
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+    pass
+
+
+class Page(list):
+    """List of rows that also carries the cursor of the following page"""
+
+    def __init__(self, items: Iterable = (), next_cursor: Optional[str] = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[ColumnElement]) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise InvalidCursorError("Malformed pagination cursor")
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursorError("Pagination cursor does not match this listing")
+
+    decoded = []
+    for column, value in zip(columns, values):
+        if value is not None and isinstance(column.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise InvalidCursorError("Malformed pagination cursor")
+        decoded.append(value)
+    return decoded
+
+
+def paginate(
+    query: Select,
+    columns: Sequence[ColumnElement],
+    *,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    descending: bool = False
+) -> Select:
+    """Order `query` by `columns` (sort key first, id last) and apply either
+    the keyset predicate for `cursor` or the legacy OFFSET for `skip`"""
+    query = query.order_by(*(c.desc() if descending else c.asc() for c in columns))
+
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if descending:
+            query = query.where(tuple_(*columns) < tuple_(*values))
+        else:
+            query = query.where(tuple_(*columns) > tuple_(*values))
+    elif skip:
+        query = query.offset(skip)
+
+    return query.limit(limit)
+
+
+def to_page(rows: Sequence[Any], columns: Sequence[ColumnElement], limit: int) -> Page:
+    """Wrap fetched rows, emitting a cursor only when the page came back full"""
+    next_cursor = None
+    if rows and len(rows) >= limit:
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return Page(rows, next_cursor=next_cursor)
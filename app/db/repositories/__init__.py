@@ -6,6 +6,10 @@ from .inventory import InventoryRepository
 from .transaction import TransactionRepository
 from .payment import PaymentRepository
 from .user import UserRepository
+from .reservation import ReservationRepository
+from .idempotency import IdempotencyRepository
+from .scheduled_run import ScheduledRunRepository
+from .webhook_event import WebhookEventRepository
 
 # Initialize repositories
 product_repo = ProductRepository()
@@ -14,6 +18,10 @@ inventory_repo = InventoryRepository()
 transaction_repo = TransactionRepository()
 payment_repo = PaymentRepository()
 user_repo = UserRepository()
+reservation_repo = ReservationRepository()
+idempotency_repo = IdempotencyRepository()
+scheduled_run_repo = ScheduledRunRepository()
+webhook_event_repo = WebhookEventRepository()
 
 __all__ = [
     "session_manager",
@@ -22,5 +30,9 @@ __all__ = [
     "inventory_repo",
     "transaction_repo",
     "payment_repo",
-    "user_repo"
+    "user_repo",
+    "reservation_repo",
+    "idempotency_repo",
+    "scheduled_run_repo",
+    "webhook_event_repo"
 ]
@@ -1,13 +1,43 @@
 from typing import Any, Generic, TypeVar, Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, any_, literal, union_all, values
+from sqlalchemy.dialects import postgresql, sqlite
 from pydantic import BaseModel
+from app.db.pagination import paginate, to_page
 from app.models.db_models import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+def dialect_name(db: AsyncSession) -> str:
+    """Name of the backend the session is bound to (postgresql, sqlite, ...)"""
+    return db.get_bind().dialect.name
+
+def any_of(db: AsyncSession, column, values: List[Any]):
+    """`column = ANY(:array)` on PostgreSQL, which binds one parameter no
+    matter how many values there are; a plain IN list elsewhere"""
+    if dialect_name(db) == "postgresql":
+        return column == any_(literal(list(values), postgresql.ARRAY(column.type)))
+    return column.in_(values)
+
+def upsert_insert(db: AsyncSession, model: type):
+    """INSERT construct supporting ON CONFLICT for the session's backend"""
+    if dialect_name(db) == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+def rows_table(db: AsyncSession, name: str, columns: List[Any], rows: List[tuple]):
+    """Literal rows as a derived table for set-based writes: a VALUES list
+    on PostgreSQL, a UNION ALL of one-row SELECTs where VALUES columns
+    cannot be aliased (SQLite caps these at 500 rows)"""
+    if dialect_name(db) == "postgresql":
+        return values(*columns, name=name).data(rows)
+    return union_all(*[
+        select(*[literal(value, col.type).label(col.name) for value, col in zip(row, columns)])
+        for row in rows
+    ]).subquery(name)
+
 class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: type[ModelType]):
         self.model = model
@@ -22,6 +52,7 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         *, 
         skip: int = 0, 
         limit: int = 100,
+        cursor: Optional[str] = None,
         **filters
     ) -> List[ModelType]:
         query = select(self.model)
@@ -31,11 +62,15 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if hasattr(self.model, field):
                 query = query.where(getattr(self.model, field) == value)
                 
-        result = await db.execute(query.offset(skip).limit(limit))
-        return result.scalars().all()
+        keyset = (self.model.id,)
+        result = await db.execute(
+            paginate(query, keyset, skip=skip, limit=limit, cursor=cursor)
+        )
+        return to_page(result.scalars().all(), keyset, limit)
 
     async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
-        db_obj = self.model(**obj_in.dict())
+        create_data = obj_in if isinstance(obj_in, dict) else obj_in.dict()
+        db_obj = self.model(**create_data)
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
@@ -59,9 +94,15 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             .values(**update_data)
         )
         await db.commit()
+        self.invalidate_cache(db_obj.id)
         await db.refresh(db_obj)
         return db_obj
 
     async def delete(self, db: AsyncSession, *, id: int) -> None:
         await db.execute(delete(self.model).where(self.model.id == id))
         await db.commit()
+        self.invalidate_cache(id)
+
+    def invalidate_cache(self, id: Any) -> None:
+        """Hook for repositories that keep a read cache in front of their table"""
+        pass
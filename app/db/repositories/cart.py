@@ -1,14 +1,38 @@
-from typing import Optional, List
+from datetime import datetime
+from typing import Dict, Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
-from sqlalchemy.orm import selectinload
-from app.models.db_models import Cart, CartItem, Product
+from sqlalchemy import select, update, delete, and_, or_, case, func, literal, literal_column, true
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from app.models.db_models import Cart, CartItem, Product, Inventory, InventoryReservation
 from app.models.schemas import CartItemCreate
-from .base import BaseRepository
+from .base import BaseRepository, any_of, dialect_name, upsert_insert
+from .reservation import ReservationRepository, held_quantity, hold_expiry
+
+
+def _computed_totals():
+    """Cart totals recomputed from cart_items, correlated to the enclosing carts row"""
+    line_total = CartItem.quantity * CartItem.price_at_addition
+    subtotal = (
+        select(func.coalesce(func.sum(line_total), 0))
+        .where(CartItem.cart_id == Cart.id)
+        .scalar_subquery()
+    )
+    tax_amount = (
+        select(func.coalesce(func.sum(line_total * CartItem.tax_rate_at_addition), 0))
+        .where(CartItem.cart_id == Cart.id)
+        .scalar_subquery()
+    )
+    item_count = (
+        select(func.count(CartItem.id))
+        .where(CartItem.cart_id == Cart.id)
+        .scalar_subquery()
+    )
+    return subtotal, tax_amount, item_count
 
 class CartRepository(BaseRepository[Cart, None, None]):
     def __init__(self):
         super().__init__(Cart)
+        self.reservations = ReservationRepository()
 
     async def get_by_user(
         self, 
@@ -38,70 +62,490 @@ class CartRepository(BaseRepository[Cart, None, None]):
         result = await db.execute(query)
         return result.scalars().first()
 
-    async def add_item_to_cart(
+    def _active_cart_id(self, user_id: Optional[int], session_id: Optional[str]):
+        """Subquery resolving the owner's active cart, as get_or_create_cart does"""
+        owner = Cart.user_id == user_id if user_id else Cart.session_id == session_id
+        return (
+            select(Cart.id.label("id"))
+            .where(owner, Cart.is_active == True)
+            .order_by(Cart.id)
+            .limit(1)
+            .subquery()
+        )
+
+    async def get_with_items(self, db: AsyncSession, cart_id: int) -> Optional[Cart]:
+        """Cart with its items and their products in a single query"""
+        result = await db.execute(
+            select(Cart)
+            .where(Cart.id == cart_id)
+            .options(joinedload(Cart.items).joinedload(CartItem.product))
+            .execution_options(populate_existing=True)
+        )
+        return result.unique().scalars().first()
+
+    async def upsert_item(
         self,
         db: AsyncSession,
         *,
-        cart_id: int,
         product_id: int,
-        quantity: int
-    ) -> CartItem:
-        # Check if item already exists in cart
-        existing_item = await db.execute(
-            select(CartItem)
-            .where(and_(
-                CartItem.cart_id == cart_id,
-                CartItem.product_id == product_id
-            ))
+        quantity: int,
+        user_id: Optional[int] = None,
+        session_id: Optional[str] = None,
+        check_stock: bool = True
+    ) -> Optional[int]:
+        """Add `quantity` of a product to the owner's active cart in one
+        INSERT ... SELECT ... ON CONFLICT DO UPDATE statement.
+
+        The price snapshot comes from products and, with `check_stock`, the
+        row is only written while inventory covers the cumulative quantity.
+        Returns the cart id, or None when nothing was written (no active cart,
+        unknown product or not enough stock left unheld by other carts).
+        Does not commit.
+        """
+        cart = self._active_cart_id(user_id, session_id)
+        in_cart = CartItem.__table__.alias("in_cart")
+
+        source = (
+            select(
+                cart.c.id,
+                Product.id,
+                literal(quantity),
+                Product.current_price,
+                func.coalesce(Product.tax_rate, 0),
+                literal(datetime.utcnow()),
+                literal(False)
+            )
+            .select_from(cart)
+            .join(Product, Product.id == product_id)
+            .where(true())
         )
-        existing_item = existing_item.scalars().first()
-        
-        if existing_item:
-            existing_item.quantity += quantity
-            await db.commit()
-            await db.refresh(existing_item)
-            return existing_item
-        
-        # Get product price
-        product = await db.execute(
-            select(Product).where(Product.id == product_id)
+        if check_stock:
+            source = (
+                source.join(Inventory, Inventory.product_id == Product.id)
+                .outerjoin(in_cart, and_(
+                    in_cart.c.cart_id == cart.c.id,
+                    in_cart.c.product_id == Product.id
+                ))
+                .where(
+                    Inventory.quantity - held_quantity(Product.id, cart.c.id)
+                    >= func.coalesce(in_cart.c.quantity, 0) + quantity
+                )
+            )
+
+        stmt = upsert_insert(db, CartItem).from_select(
+            [
+                "cart_id", "product_id", "quantity", "price_at_addition", "tax_rate_at_addition",
+                "added_at", "is_age_verified"
+            ],
+            source
         )
-        product = product.scalars().first()
-        
-        if not product:
-            raise ValueError("Product not found")
-        
-        # Create new cart item
-        new_item = CartItem(
-            cart_id=cart_id,
-            product_id=product_id,
-            quantity=quantity,
-            price_at_addition=product.current_price
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CartItem.cart_id, CartItem.product_id],
+            set_={"quantity": CartItem.quantity + stmt.excluded.quantity}
+        )
+        return await self._write_lines(
+            db, stmt, lambda product_id: literal(quantity), [product_id]
+        )
+
+    async def upsert_items(
+        self,
+        db: AsyncSession,
+        *,
+        cart_id: int,
+        lines: List[dict]
+    ) -> None:
+        """Add many lines (product_id, quantity, price_at_addition, tax_rate) to a cart
+        in one multi-row upsert; product ids must be unique. Does not commit."""
+        if not lines:
+            return
+
+        now = datetime.utcnow()
+        stmt = upsert_insert(db, CartItem).values([
+            {
+                "cart_id": cart_id,
+                "product_id": line["product_id"],
+                "quantity": line["quantity"],
+                "price_at_addition": line["price_at_addition"],
+                "tax_rate_at_addition": line["tax_rate"],
+                "added_at": now,
+                "is_age_verified": False
+            }
+            for line in lines
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CartItem.cart_id, CartItem.product_id],
+            set_={"quantity": CartItem.quantity + stmt.excluded.quantity}
+        )
+        added = {line["product_id"]: line["quantity"] for line in lines}
+        await self._write_lines(
+            db, stmt, lambda product_id: case(added, value=product_id), list(added)
         )
-        
-        db.add(new_item)
-        await db.commit()
-        await db.refresh(new_item)
-        return new_item
 
-    async def calculate_cart_total(self, db: AsyncSession, cart_id: int) -> dict:
+    async def _write_lines(
+        self,
+        db: AsyncSession,
+        stmt,
+        added_quantity,
+        product_ids: List[int]
+    ) -> Optional[int]:
+        """Run a cart_items upsert that adds quantities, move the cart's
+        running totals by the same amounts and hold stock for the new line
+        quantities; returns the cart id, if written.
+
+        On PostgreSQL all of it is one statement: the upsert runs as a CTE
+        whose RETURNING rows feed the reservation upsert and an UPDATE of
+        carts. Elsewhere the rest follows in the same transaction.
+        """
+        if dialect_name(db) != "postgresql":
+            cart_id = (await db.execute(stmt.returning(CartItem.cart_id))).scalars().first()
+            if cart_id is not None:
+                await self.refresh_totals(db, [cart_id])
+                await self.reservations.hold_cart_lines(db, [cart_id], product_ids)
+            return cart_id
+
+        line = stmt.returning(
+            CartItem.cart_id,
+            CartItem.product_id,
+            CartItem.quantity,
+            CartItem.price_at_addition,
+            CartItem.tax_rate_at_addition,
+            # xmax is 0 only for rows this statement inserted
+            (literal_column("xmax") == 0).label("inserted")
+        ).cte("line")
+        hold = upsert_insert(db, InventoryReservation).from_select(
+            ["cart_id", "product_id", "quantity", "expires_at", "created_at"],
+            select(
+                line.c.cart_id,
+                line.c.product_id,
+                line.c.quantity,
+                literal(hold_expiry()),
+                literal(datetime.utcnow())
+            )
+        )
+        hold = hold.on_conflict_do_update(
+            index_elements=[InventoryReservation.cart_id, InventoryReservation.product_id],
+            set_={"quantity": hold.excluded.quantity, "expires_at": hold.excluded.expires_at}
+        ).cte("hold")
+        added = line.c.price_at_addition * added_quantity(line.c.product_id)
+        delta = (
+            select(
+                line.c.cart_id,
+                func.sum(added).label("subtotal"),
+                func.sum(added * line.c.tax_rate_at_addition).label("tax_amount"),
+                func.count().filter(line.c.inserted).label("item_count")
+            )
+            .group_by(line.c.cart_id)
+            .cte("delta")
+        )
+        result = await db.execute(
+            update(Cart)
+            .add_cte(hold)
+            .where(Cart.id == delta.c.cart_id)
+            .values(
+                subtotal=Cart.subtotal + delta.c.subtotal,
+                tax_amount=Cart.tax_amount + delta.c.tax_amount,
+                item_count=Cart.item_count + delta.c.item_count,
+                updated_at=datetime.utcnow()
+            )
+            .returning(Cart.id)
+        )
+        return result.scalars().first()
+
+    async def get_item(self, db: AsyncSession, *, cart_id: int, item_id: int) -> Optional[CartItem]:
+        """One line of a cart, locked for update"""
         result = await db.execute(
+            select(CartItem)
+            .where(CartItem.id == item_id, CartItem.cart_id == cart_id)
+            .with_for_update()
+        )
+        return result.scalars().first()
+
+    async def set_item_quantity(
+        self,
+        db: AsyncSession,
+        *,
+        cart_id: int,
+        item_id: int,
+        quantity: int
+    ) -> Optional[int]:
+        """Set a line's quantity, refresh the cart's running totals and hold
+        the new quantity; returns the line's product id, if it exists.
+        Does not commit."""
+        result = await db.execute(
+            update(CartItem)
+            .where(CartItem.id == item_id, CartItem.cart_id == cart_id)
+            .values(quantity=quantity)
+            .returning(CartItem.product_id)
+            .execution_options(synchronize_session=False)
+        )
+        product_id = result.scalar()
+        if product_id is not None:
+            await self.refresh_totals(db, [cart_id])
+            await self.reservations.hold(db, cart_id, {product_id: quantity})
+        return product_id
+
+    async def delete_items(
+        self,
+        db: AsyncSession,
+        *,
+        cart_id: int,
+        item_ids: Optional[List[int]] = None
+    ) -> Dict[int, int]:
+        """Delete a cart's lines (all of them, or only `item_ids`), refresh
+        its running totals and release their holds; returns the deleted
+        quantities by product id. Does not commit."""
+        stmt = delete(CartItem).where(CartItem.cart_id == cart_id)
+        if item_ids is not None:
+            stmt = stmt.where(any_of(db, CartItem.id, item_ids))
+        result = await db.execute(
+            stmt.returning(CartItem.product_id, CartItem.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = {product_id: quantity for product_id, quantity in result.all()}
+        if deleted:
+            await self.refresh_totals(db, [cart_id])
+            await self.reservations.hold(db, cart_id, {product_id: 0 for product_id in deleted})
+        return deleted
+
+    async def refresh_totals(self, db: AsyncSession, cart_ids: List[int]) -> None:
+        """Recompute running totals of the given carts from their lines. Does not commit."""
+        if not cart_ids:
+            return
+        subtotal, tax_amount, item_count = _computed_totals()
+        await db.execute(
+            update(Cart)
+            .where(any_of(db, Cart.id, cart_ids))
+            .values(subtotal=subtotal, tax_amount=tax_amount, item_count=item_count)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def find_inconsistent_totals(
+        self,
+        db: AsyncSession,
+        *,
+        after_id: int = 0,
+        limit: int = 1000
+    ) -> tuple[List[int], List[int]]:
+        """Scan one batch of active carts past `after_id` in id order; returns
+        the ids scanned and those whose stored totals differ from their lines.
+
+        Checked-out and reaped carts keep their final totals after their
+        lines are gone, so only active carts are compared.
+        """
+        batch = (
+            select(Cart.id, Cart.subtotal, Cart.tax_amount, Cart.item_count)
+            .where(Cart.id > after_id, Cart.is_active == True)
+            .order_by(Cart.id)
+            .limit(limit)
+            .subquery()
+        )
+        line_total = CartItem.quantity * CartItem.price_at_addition
+        computed = (
             select(
-                func.sum(CartItem.quantity * CartItem.price_at_addition).label("subtotal"),
-                func.sum(
-                    CartItem.quantity * CartItem.price_at_addition * 
-                    Product.tax_rate
-                ).label("tax"),
+                CartItem.cart_id,
+                func.sum(line_total).label("subtotal"),
+                func.sum(line_total * CartItem.tax_rate_at_addition).label("tax_amount"),
                 func.count(CartItem.id).label("item_count")
             )
-            .join(Product, CartItem.product_id == Product.id)
-            .where(CartItem.cart_id == cart_id)
+            .join(batch, batch.c.id == CartItem.cart_id)
+            .group_by(CartItem.cart_id)
+            .subquery()
         )
-        
-        totals = result.first()
+        result = await db.execute(
+            select(
+                batch.c.id,
+                or_(
+                    batch.c.subtotal != func.coalesce(computed.c.subtotal, 0),
+                    batch.c.tax_amount != func.coalesce(computed.c.tax_amount, 0),
+                    batch.c.item_count != func.coalesce(computed.c.item_count, 0)
+                ).label("drifted")
+            )
+            .outerjoin(computed, computed.c.cart_id == batch.c.id)
+            .order_by(batch.c.id)
+        )
+        rows = result.all()
+        return [row.id for row in rows], [row.id for row in rows if row.drifted]
+
+    async def get_totals(self, db: AsyncSession, cart_id: int) -> Optional[Dict]:
+        """Running totals of one cart by primary key"""
+        result = await db.execute(
+            select(Cart.subtotal, Cart.tax_amount, Cart.item_count).where(Cart.id == cart_id)
+        )
+        row = result.first()
+        return self.totals_of(row) if row else None
+
+    async def get_totals_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        user_id: Optional[int] = None,
+        session_id: Optional[str] = None
+    ) -> Optional[Dict]:
+        """Running totals of the owner's active cart without loading its items"""
+        owner = Cart.user_id == user_id if user_id else Cart.session_id == session_id
+        result = await db.execute(
+            select(Cart.subtotal, Cart.tax_amount, Cart.item_count)
+            .where(owner, Cart.is_active == True)
+            .order_by(Cart.id)
+            .limit(1)
+        )
+        row = result.first()
+        return self.totals_of(row) if row else None
+
+    def totals_of(self, cart) -> Dict:
+        """Totals dict from anything carrying subtotal, tax_amount and item_count"""
         return {
-            "subtotal": totals.subtotal or 0,
-            "tax": totals.tax or 0,
-            "total": (totals.subtotal or 0) + (totals.tax or 0),
-            "item_count": totals.item_count or 0
+            "subtotal": cart.subtotal,
+            "tax": cart.tax_amount,
+            "total": cart.subtotal + cart.tax_amount,
+            "item_count": cart.item_count
         }
+
+    async def get_merge_pair(
+        self,
+        db: AsyncSession,
+        *,
+        session_id: str,
+        user_id: int
+    ) -> tuple[Optional[int], Optional[int]]:
+        """Ids of the active guest cart for `session_id` and the active cart of
+        `user_id`, in one query"""
+        result = await db.execute(
+            select(Cart.id, Cart.user_id)
+            .where(
+                Cart.is_active == True,
+                or_(
+                    Cart.user_id == user_id,
+                    and_(Cart.session_id == session_id, Cart.user_id.is_(None))
+                )
+            )
+            .order_by(Cart.id)
+        )
+        guest_id = user_cart_id = None
+        for cart_id, owner in result.all():
+            if owner is None:
+                guest_id = guest_id or cart_id
+            else:
+                user_cart_id = user_cart_id or cart_id
+        return guest_id, user_cart_id
+
+    async def merge_into(self, db: AsyncSession, *, source_id: int, target_id: int) -> None:
+        """Move every line of cart `source_id` into cart `target_id`, adding
+        quantities where both hold the product, then drop the source cart.
+        Does not commit."""
+        stmt = upsert_insert(db, CartItem).from_select(
+            [
+                "cart_id", "product_id", "quantity", "price_at_addition", "tax_rate_at_addition",
+                "added_at", "is_age_verified"
+            ],
+            select(
+                literal(target_id),
+                CartItem.product_id,
+                CartItem.quantity,
+                CartItem.price_at_addition,
+                CartItem.tax_rate_at_addition,
+                CartItem.added_at,
+                CartItem.is_age_verified
+            ).where(CartItem.cart_id == source_id)
+        )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[CartItem.cart_id, CartItem.product_id],
+            set_={"quantity": CartItem.quantity + stmt.excluded.quantity}
+        ))
+        await db.execute(delete(CartItem).where(CartItem.cart_id == source_id))
+        await self.reservations.release_carts(db, [source_id])
+        await db.execute(delete(Cart).where(Cart.id == source_id))
+        await self.refresh_totals(db, [target_id])
+        await self.reservations.hold_cart_lines(db, [target_id])
+
+    async def assign_to_user(self, db: AsyncSession, *, cart_id: int, user_id: int) -> None:
+        """Hand a guest cart over to a user. Does not commit."""
+        await db.execute(
+            update(Cart)
+            .where(Cart.id == cart_id)
+            .values(user_id=user_id, session_id=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def close_for_checkout(
+        self,
+        db: AsyncSession,
+        *,
+        user_id: Optional[int] = None,
+        session_id: Optional[str] = None
+    ):
+        """Deactivate the owner's active cart and return its (id, user_id,
+        subtotal, tax_amount, item_count) row, or None if there is none.
+
+        Claiming the cart with the same UPDATE that reads its totals means
+        a concurrent checkout of the same cart finds nothing. Does not commit.
+        """
+        cart = self._active_cart_id(user_id, session_id)
+        result = await db.execute(
+            update(Cart)
+            .where(Cart.id == select(cart.c.id).scalar_subquery(), Cart.is_active == True)
+            .values(is_active=False, updated_at=datetime.utcnow())
+            .returning(Cart.id, Cart.user_id, Cart.subtotal, Cart.tax_amount, Cart.item_count)
+            .execution_options(synchronize_session=False)
+        )
+        return result.first()
+
+    async def reopen(self, db: AsyncSession, cart_id: int) -> bool:
+        """Make a checked-out cart active again, unless its owner has opened
+        another one since. Does not commit."""
+        other = aliased(Cart)
+        newer = (
+            select(other.id)
+            .where(
+                other.is_active == True,
+                or_(other.user_id == Cart.user_id, other.session_id == Cart.session_id)
+            )
+            .exists()
+        )
+        result = await db.execute(
+            update(Cart)
+            .where(Cart.id == cart_id, Cart.is_active == False, ~newer)
+            .values(is_active=True, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount > 0
+
+    async def deactivate_idle(
+        self,
+        db: AsyncSession,
+        *,
+        idle_since: datetime,
+        limit: int = 1000
+    ) -> tuple[List, int]:
+        """Deactivate up to `limit` active carts untouched since `idle_since`
+        and delete their lines, oldest first. The cart rows stay behind with
+        their running totals as the archive. Returns the (id, user_id,
+        session_id) rows deactivated and the number of lines deleted; does
+        not commit."""
+        idle = (
+            select(Cart.id)
+            .where(Cart.is_active == True, Cart.updated_at < idle_since)
+            .order_by(Cart.updated_at)
+            .limit(limit)
+            # Concurrent reapers on other workers take different carts
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            update(Cart)
+            .where(Cart.id.in_(idle.scalar_subquery()))
+            .values(is_active=False, updated_at=Cart.updated_at)
+            .returning(Cart.id, Cart.user_id, Cart.session_id)
+            .execution_options(synchronize_session=False)
+        )
+        carts = result.all()
+        if not carts:
+            return [], 0
+
+        cart_ids = [cart.id for cart in carts]
+        deleted = await db.execute(
+            delete(CartItem)
+            .where(any_of(db, CartItem.cart_id, cart_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await self.reservations.release_carts(db, cart_ids)
+        return carts, deleted.rowcount
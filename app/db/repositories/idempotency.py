@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.db_models import IdempotencyKey
+from .base import BaseRepository, upsert_insert
+
+
+class IdempotencyRepository(BaseRepository[IdempotencyKey, None, None]):
+    def __init__(self):
+        super().__init__(IdempotencyKey)
+
+    async def get_by_key(self, db: AsyncSession, *, scope: str, key: str) -> Optional[IdempotencyKey]:
+        result = await db.execute(
+            select(IdempotencyKey)
+            .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+
+    async def claim(
+        self,
+        db: AsyncSession,
+        *,
+        scope: str,
+        key: str,
+        request_hash: str,
+        expired_before: datetime,
+        abandoned_before: datetime
+    ) -> bool:
+        """Record a key as in flight in one INSERT ... ON CONFLICT statement.
+
+        An existing row is only taken over when it has expired, or was left
+        in flight by a worker that never finished it. Returns whether this
+        caller owns the key. Does not commit.
+        """
+        stmt = upsert_insert(db, IdempotencyKey).values(
+            scope=scope,
+            key=key,
+            request_hash=request_hash,
+            created_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.scope, IdempotencyKey.key],
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "status_code": None,
+                "response_body": None,
+                "created_at": stmt.excluded.created_at,
+                "completed_at": None
+            },
+            where=or_(
+                IdempotencyKey.created_at < expired_before,
+                (IdempotencyKey.status_code == None) & (IdempotencyKey.created_at < abandoned_before)
+            )
+        )
+        result = await db.execute(stmt.returning(IdempotencyKey.id))
+        return result.first() is not None
+
+    async def complete(
+        self,
+        db: AsyncSession,
+        *,
+        scope: str,
+        key: str,
+        status_code: int,
+        response_body: str
+    ) -> None:
+        """Store the response of an in-flight key. Does not commit."""
+        await db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            .values(
+                status_code=status_code,
+                response_body=response_body,
+                completed_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def release(self, db: AsyncSession, *, scope: str, key: str) -> None:
+        """Forget an in-flight key so the request can be retried. Does not commit."""
+        await db.execute(
+            delete(IdempotencyKey)
+            .where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status_code == None
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def purge_expired(self, db: AsyncSession, *, expired_before: datetime, limit: int = 10000) -> int:
+        """Delete up to `limit` keys created before `expired_before`. Does not commit."""
+        expired = (
+            select(IdempotencyKey.id)
+            .where(IdempotencyKey.created_at < expired_before)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.id.in_(expired))
+        )
+        return result.rowcount
@@ -1,14 +1,20 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, and_, func
 from sqlalchemy.orm import selectinload
-from app.models.db_models import Inventory, Product
-from .base import BaseRepository
+from app.models.db_models import CartItem, Inventory, Product, TransactionItem
+from app.utils.http_cache import response_cache
+from .base import BaseRepository, upsert_insert
 
 class InventoryRepository(BaseRepository[Inventory, None, None]):
     def __init__(self):
         super().__init__(Inventory)
 
+    def invalidate_cache(self, id: Any) -> None:
+        # Stock moves often and is rarely looked up by inventory id, so any
+        # change drops every cached body that embeds stock levels
+        response_cache.invalidate("inventory")
+
     async def get_by_product(
         self, 
         db: AsyncSession, 
@@ -41,19 +47,97 @@ class InventoryRepository(BaseRepository[Inventory, None, None]):
         *,
         product_id: int,
         quantity: int
-    ) -> Inventory:
-        inventory = await self.get_by_product(db, product_id)
-        if not inventory:
-            raise ValueError("Inventory record not found for product")
-            
-        new_quantity = inventory.quantity + quantity
-        if new_quantity < 0:
-            raise ValueError("Insufficient stock available")
-            
-        inventory.quantity = new_quantity
-        await db.commit()
-        await db.refresh(inventory)
-        return inventory
+    ) -> Optional[Inventory]:
+        """Add `quantity` (negative to take stock out) in one guarded
+        UPDATE ... RETURNING, so concurrent adjustments neither lose updates
+        nor go below zero. None if the product has no inventory row or too
+        little stock. Does not commit."""
+        result = await db.execute(
+            update(Inventory)
+            .where(Inventory.product_id == product_id, Inventory.quantity + quantity >= 0)
+            .values(quantity=Inventory.quantity + quantity)
+            .returning(Inventory)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+
+    async def get_quantity(self, db: AsyncSession, product_id: int) -> Optional[int]:
+        """Stock on hand; None if the product has no inventory row"""
+        result = await db.execute(
+            select(Inventory.quantity).where(Inventory.product_id == product_id)
+        )
+        return result.scalar()
+
+    async def deduct_cart_lines(self, db: AsyncSession, cart_id: int) -> List[int]:
+        """Take every line of a cart out of stock in one UPDATE ... FROM
+        cart_items, guarded per row so no quantity goes negative. Returns the
+        product ids deducted; a line missing from the result was short.
+        Does not commit."""
+        result = await db.execute(
+            update(Inventory)
+            .where(
+                Inventory.product_id == CartItem.product_id,
+                CartItem.cart_id == cart_id,
+                Inventory.quantity >= CartItem.quantity
+            )
+            .values(quantity=Inventory.quantity - CartItem.quantity)
+            .returning(Inventory.product_id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.scalars().all()
+
+    async def restock_transaction_lines(self, db: AsyncSession, transaction_id: int) -> int:
+        """Put every line of a transaction back in stock in one UPDATE ...
+        FROM transaction_items. Does not commit."""
+        result = await db.execute(
+            update(Inventory)
+            .where(
+                Inventory.product_id == TransactionItem.product_id,
+                TransactionItem.transaction_id == transaction_id
+            )
+            .values(quantity=Inventory.quantity + TransactionItem.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    async def get_short_lines(self, db: AsyncSession, cart_id: int) -> List[tuple[int, int, int]]:
+        """(product_id, available, requested) for the lines of a cart that
+        stock on hand does not cover"""
+        available = func.coalesce(Inventory.quantity, 0)
+        result = await db.execute(
+            select(CartItem.product_id, available, CartItem.quantity)
+            .outerjoin(Inventory, Inventory.product_id == CartItem.product_id)
+            .where(CartItem.cart_id == cart_id, available < CartItem.quantity)
+            .order_by(CartItem.id)
+        )
+        return result.all()
+
+    async def bulk_upsert(
+        self,
+        db: AsyncSession,
+        rows: List[Dict[str, Any]]
+    ) -> None:
+        """Upsert inventory rows by product_id. Rows without a quantity only
+        update thresholds, and start at zero stock when newly inserted."""
+        thresholds = ("low_stock_threshold", "reorder_threshold")
+        with_quantity = [row for row in rows if row.get("quantity") is not None]
+        without_quantity = [
+            {**row, "quantity": 0} for row in rows if row.get("quantity") is None
+        ]
+
+        for group, columns in (
+            (with_quantity, ("quantity",) + thresholds),
+            (without_quantity, thresholds)
+        ):
+            if not group:
+                continue
+            stmt = upsert_insert(db, Inventory).values(group)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Inventory.product_id],
+                set_={column: stmt.excluded[column] for column in columns}
+            )
+            await db.execute(stmt)
+        self.invalidate_cache(None)
 
     async def get_low_stock_items(
         self,
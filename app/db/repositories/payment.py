@@ -1,13 +1,39 @@
-from typing import Optional, List
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import (
+    Integer,
+    String,
+    case,
+    column,
+    exists,
+    func,
+    null,
+    select,
+    update,
+    and_,
+    or_
+)
+from sqlalchemy.orm import aliased, selectinload
 
-from app.models.db_models import Payment, Transaction
+from app.models.db_models import Payment, PaymentStatus, Transaction, TransactionStatus
 from app.models.schemas import PaymentCreate
-from .base import BaseRepository
+from app.db.pagination import paginate, to_page
+from .base import BaseRepository, rows_table
+
+# Payment statuses under which the money was taken
+CAPTURED_STATUSES = (
+    PaymentStatus.COMPLETED,
+    PaymentStatus.PARTIALLY_REFUNDED,
+    PaymentStatus.REFUNDED
+)
+
+# Payment statuses still waiting on the gateway's answer
+UNSETTLED_STATUSES = (PaymentStatus.PENDING, PaymentStatus.PROCESSING)
 
 class PaymentRepository(BaseRepository[Payment, PaymentCreate, None]):
+    keyset = (Payment.processed_at, Payment.id)
+
     def __init__(self):
         super().__init__(Payment)
 
@@ -44,32 +70,32 @@ class PaymentRepository(BaseRepository[Payment, PaymentCreate, None]):
         db: AsyncSession,
         *,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
     ) -> List[Payment]:
         result = await db.execute(
-            select(Payment)
-            .where(Payment.status == "completed")
-            .order_by(Payment.processed_at.desc())
-            .offset(skip)
-            .limit(limit)
+            paginate(
+                select(Payment).where(Payment.status == PaymentStatus.COMPLETED),
+                self.keyset, skip=skip, limit=limit, cursor=cursor, descending=True
+            )
         )
-        return result.scalars().all()
+        return to_page(result.scalars().all(), self.keyset, limit)
 
     async def get_failed_payments(
         self,
         db: AsyncSession,
         *,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
     ) -> List[Payment]:
         result = await db.execute(
-            select(Payment)
-            .where(Payment.status == "failed")
-            .order_by(Payment.processed_at.desc())
-            .offset(skip)
-            .limit(limit)
+            paginate(
+                select(Payment).where(Payment.status == PaymentStatus.FAILED),
+                self.keyset, skip=skip, limit=limit, cursor=cursor, descending=True
+            )
         )
-        return result.scalars().all()
+        return to_page(result.scalars().all(), self.keyset, limit)
 
     async def get_payments_by_method(
         self,
@@ -77,13 +103,220 @@ class PaymentRepository(BaseRepository[Payment, PaymentCreate, None]):
         method: str,
         *,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
     ) -> List[Payment]:
+        """Processed payments of one method; pending payments have no
+        processed_at to page on and are left out"""
         result = await db.execute(
-            select(Payment)
-            .where(Payment.method == method)
-            .order_by(Payment.processed_at.desc())
-            .offset(skip)
+            paginate(
+                select(Payment).where(Payment.method == method, Payment.processed_at.is_not(None)),
+                self.keyset, skip=skip, limit=limit, cursor=cursor, descending=True
+            )
+        )
+        return to_page(result.scalars().all(), self.keyset, limit)
+
+    async def claim(self, db: AsyncSession, payment_id: int) -> bool:
+        """Move a pending payment to processing so exactly one worker charges
+        it; False if another worker claimed it, or it was settled, first.
+        Does not commit."""
+        result = await db.execute(
+            update(Payment)
+            .where(Payment.id == payment_id, Payment.status == PaymentStatus.PENDING)
+            .values(status=PaymentStatus.PROCESSING)
+            .returning(Payment.id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.first() is not None
+
+    async def claim_pending(self, db: AsyncSession, *, limit: int = 1000) -> List[Payment]:
+        """Claim the oldest pending payments, as `claim` does, in one
+        statement; rows another worker is claiming are skipped. Does not
+        commit."""
+        oldest = (
+            select(Payment.id)
+            .where(Payment.status == PaymentStatus.PENDING)
+            .order_by(Payment.id)
             .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            update(Payment)
+            .where(Payment.id.in_(oldest.scalar_subquery()), Payment.status == PaymentStatus.PENDING)
+            .values(status=PaymentStatus.PROCESSING)
+            .returning(Payment)
+            .execution_options(populate_existing=True, synchronize_session=False)
+        )
+        return sorted(result.scalars().all(), key=lambda payment: payment.id)
+
+    async def release(self, db: AsyncSession, payment_ids: List[int]) -> List[Payment]:
+        """Hand claimed payments whose charge gave no answer back to pending,
+        to be charged again with the same reference. Does not commit."""
+        if not payment_ids:
+            return []
+        result = await db.execute(
+            update(Payment)
+            .where(Payment.id.in_(payment_ids), Payment.status == PaymentStatus.PROCESSING)
+            .values(status=PaymentStatus.PENDING)
+            .returning(Payment)
+            .execution_options(populate_existing=True, synchronize_session=False)
         )
         return result.scalars().all()
+
+    async def settle(
+        self,
+        db: AsyncSession,
+        *,
+        payment_id: int,
+        status: PaymentStatus,
+        processor_reference: Optional[str],
+        receipt_number: Optional[str]
+    ) -> Optional[Payment]:
+        """Record the gateway outcome of an unsettled payment; None if it was
+        already settled. Does not commit."""
+        result = await db.execute(
+            update(Payment)
+            .where(Payment.id == payment_id, Payment.status.in_(UNSETTLED_STATUSES))
+            .values(
+                status=status,
+                processor_reference=processor_reference,
+                receipt_number=receipt_number,
+                processed_at=datetime.utcnow()
+            )
+            .returning(Payment)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+
+    async def settle_many(
+        self,
+        db: AsyncSession,
+        outcomes: List[tuple[int, PaymentStatus, str, Optional[str]]]
+    ) -> List[tuple[int, int, PaymentStatus]]:
+        """Record many gateway outcomes, given as (payment_id, status,
+        processor_reference, receipt_number), in one UPDATE. Payments already
+        settled, or whose reference is already on another payment, are left
+        alone. Returns (id, transaction_id, status) of the payments updated.
+        Does not commit."""
+        rows = rows_table(db, "outcomes", [
+            column("id", Integer),
+            column("status", Payment.status.type),
+            column("processor_reference", String(100)),
+            column("receipt_number", String(20))
+        ], outcomes)
+        other = aliased(Payment)
+        result = await db.execute(
+            update(Payment)
+            .where(
+                Payment.id == rows.c.id,
+                Payment.status.in_(UNSETTLED_STATUSES),
+                ~exists().where(other.processor_reference == rows.c.processor_reference)
+            )
+            .values(
+                status=rows.c.status,
+                processor_reference=rows.c.processor_reference,
+                receipt_number=rows.c.receipt_number,
+                processed_at=datetime.utcnow()
+            )
+            .returning(Payment.id, Payment.transaction_id, Payment.status)
+            .execution_options(synchronize_session=False)
+        )
+        return [tuple(row) for row in result.all()]
+
+    async def stream_transaction_discrepancies(
+        self,
+        db: AsyncSession,
+        *,
+        created_before: datetime,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Any]:
+        """Yield, through a server-side cursor, transactions whose captured
+        payments do not add up: completed but unpaid, paid a different
+        amount than total_amount, cancelled yet paid, or still waiting on
+        their payment"""
+        paid = (
+            select(Payment.transaction_id, func.sum(Payment.amount).label("amount"))
+            .where(Payment.status.in_(CAPTURED_STATUSES))
+            .group_by(Payment.transaction_id)
+            .subquery()
+        )
+        query = (
+            select(
+                case(
+                    (Transaction.status == TransactionStatus.CANCELLED, "paid_cancelled_transaction"),
+                    (Transaction.status == TransactionStatus.IN_PROGRESS, "unsettled_transaction"),
+                    (paid.c.transaction_id.is_(None), "unpaid_transaction"),
+                    else_="amount_mismatch"
+                ).label("kind"),
+                Transaction.id.label("transaction_id"),
+                null().label("payment_id"),
+                Transaction.total_amount.label("expected_amount"),
+                func.coalesce(paid.c.amount, 0).label("actual_amount")
+            )
+            .outerjoin(paid, paid.c.transaction_id == Transaction.id)
+            .where(
+                Transaction.created_at < created_before,
+                or_(
+                    and_(
+                        Transaction.status == TransactionStatus.COMPLETED,
+                        or_(paid.c.transaction_id.is_(None), paid.c.amount != Transaction.total_amount)
+                    ),
+                    and_(
+                        Transaction.status == TransactionStatus.CANCELLED,
+                        paid.c.transaction_id.is_not(None)
+                    ),
+                    Transaction.status == TransactionStatus.IN_PROGRESS
+                )
+            )
+            .order_by(Transaction.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await db.stream(query)
+        async for row in result:
+            yield row
+
+    async def stream_payment_discrepancies(
+        self,
+        db: AsyncSession,
+        *,
+        created_before: datetime,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Any]:
+        """Yield, through a server-side cursor, payments that point at no
+        transaction, failed on a sale left open with nothing captured, or
+        are still unsettled"""
+        captured = aliased(Payment)
+        query = (
+            select(
+                case(
+                    (Transaction.id.is_(None), "orphaned_payment"),
+                    (Payment.status == PaymentStatus.FAILED, "failed_payment"),
+                    else_="stuck_payment"
+                ).label("kind"),
+                Payment.transaction_id.label("transaction_id"),
+                Payment.id.label("payment_id"),
+                Transaction.total_amount.label("expected_amount"),
+                Payment.amount.label("actual_amount")
+            )
+            .outerjoin(Transaction, Transaction.id == Payment.transaction_id)
+            .where(
+                Payment.created_at < created_before,
+                or_(
+                    Transaction.id.is_(None),
+                    and_(
+                        Payment.status == PaymentStatus.FAILED,
+                        Transaction.status != TransactionStatus.CANCELLED,
+                        ~exists().where(
+                            captured.transaction_id == Payment.transaction_id,
+                            captured.status.in_(CAPTURED_STATUSES)
+                        )
+                    ),
+                    Payment.status.in_(UNSETTLED_STATUSES)
+                )
+            )
+            .order_by(Payment.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await db.stream(query)
+        async for row in result:
+            yield row
@@ -1,35 +1,264 @@
-from typing import Optional
-from sqlalchemy import and_, or_
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+from sqlalchemy import String, and_, or_, case, cast, delete, func, literal, text, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models.db_models import Product, ProductStatus
+from sqlalchemy.orm import contains_eager
+from app.db.cache import product_cache
+from app.db.pagination import paginate, to_page
+from app.utils.http_cache import response_cache
+from app.models.db_models import (
+    CatalogVersion,
+    Inventory,
+    Product,
+    ProductFacetCount,
+    ProductStatus,
+    ProductTombstone
+)
 from app.models.schemas import ProductCreate, ProductUpdate
-from .base import BaseRepository
+from .base import BaseRepository, any_of, dialect_name, upsert_insert
+from .reservation import held_quantity
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# Statuses that take a product off sale; any other status (or none) may be sold
+UNSELLABLE_STATUSES = (ProductStatus.DISCONTINUED, ProductStatus.RECALLED)
+
+def sellable():
+    """Clause: the product is on sale and its inventory, when joined, is active"""
+    return and_(
+        or_(Product.status.is_(None), Product.status.notin_(UNSELLABLE_STATUSES)),
+        or_(Inventory.is_active.is_(None), Inventory.is_active == True)
+    )
 
 class ProductRepository(BaseRepository[Product, ProductCreate, ProductUpdate]):
+    keyset = (Product.id,)
+    # Columns a catalog feed may overwrite on an existing barcode
+    import_columns = (
+        "sku", "name", "description", "category", "current_price", "cost_price",
+        "tax_rate", "requires_serial_number", "is_weighted", "age_restriction"
+    )
+
+    # Fields terminals need to resolve scans offline
+    catalog_columns = (
+        Product.id, Product.barcode, Product.sku, Product.name, Product.category,
+        Product.status, Product.age_restriction, Product.current_price, Product.tax_rate,
+        Product.is_weighted, Product.requires_serial_number, Product.updated_at,
+        Product.catalog_version
+    )
+
+    facet_columns = (Product.category, Product.status, Product.age_restriction)
+
     def __init__(self):
         super().__init__(Product)
 
+    async def get(self, db: AsyncSession, id: Any) -> Optional[Product]:
+        cached = product_cache.get_by_id(id)
+        if cached is not None:
+            return product_cache.detached(cached)
+
+        product = await super().get(db, id)
+        product_cache.put(product)
+        return product
+
     async def get_by_barcode(self, db: AsyncSession, barcode: str) -> Optional[Product]:
+        cached = product_cache.get_by_barcode(barcode)
+        if cached is not None:
+            return product_cache.detached(cached)
+
         result = await db.execute(
             select(Product).where(Product.barcode == barcode)
         )
-        return result.scalars().first()
+        product = result.scalars().first()
+        product_cache.put(product)
+        return product
+
+    def invalidate_cache(self, id: Any) -> None:
+        product_cache.invalidate(id)
+        response_cache.invalidate("catalog", f"product:{id}")
+
+    def is_sellable(self, product: Product) -> bool:
+        """Whether a loaded product is on sale; see `sellable` for the query form"""
+        return product.status not in UNSELLABLE_STATUSES
+
+    async def get_sellable_ids(self, db: AsyncSession, ids: List[int]) -> Set[int]:
+        """Those of `ids` that may still be sold"""
+        if not ids:
+            return set()
+        result = await db.execute(
+            select(Product.id)
+            .outerjoin(Inventory, Inventory.product_id == Product.id)
+            .where(any_of(db, Product.id, ids), sellable())
+        )
+        return set(result.scalars().all())
+
+    async def next_catalog_version(self, db: AsyncSession) -> int:
+        """Bump the catalog version inside the caller's transaction and
+        return it. The counter row stays locked until that transaction ends,
+        so a later version can never commit ahead of an earlier one."""
+        stmt = upsert_insert(db, CatalogVersion).values(id=1, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CatalogVersion.id],
+            set_={"version": CatalogVersion.version + 1}
+        ).returning(CatalogVersion.version)
+        return (await db.execute(stmt)).scalar_one()
+
+    async def get_catalog_version(self, db: AsyncSession) -> int:
+        """Newest committed catalog version"""
+        result = await db.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1))
+        return result.scalar() or 0
+
+    async def create(self, db: AsyncSession, *, obj_in: ProductCreate) -> Product:
+        create_data = obj_in if isinstance(obj_in, dict) else obj_in.dict()
+        version = await self.next_catalog_version(db)
+        return await super().create(db, obj_in={**create_data, "catalog_version": version})
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: Product,
+        obj_in: ProductUpdate | Dict[str, Any]
+    ) -> Product:
+        update_data = obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
+        version = await self.next_catalog_version(db)
+        return await super().update(
+            db, db_obj=db_obj, obj_in={**update_data, "catalog_version": version}
+        )
+
+    async def delete(self, db: AsyncSession, *, id: int) -> None:
+        """Delete a product, leaving a tombstone for the change feed"""
+        version = await self.next_catalog_version(db)
+        stmt = upsert_insert(db, ProductTombstone).values(
+            product_id=id, catalog_version=version, deleted_at=datetime.utcnow()
+        )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[ProductTombstone.product_id],
+            set_={"catalog_version": version, "deleted_at": stmt.excluded.deleted_at}
+        ))
+        await db.execute(delete(Product).where(Product.id == id))
+        await db.commit()
+        self.invalidate_cache(id)
+
+    def _with_inventory(self, query):
+        """Load each product's inventory row in the same statement"""
+        return (
+            query.outerjoin(Inventory, Inventory.product_id == Product.id)
+            .options(contains_eager(Product.inventory))
+        )
+
+    async def lookup_with_stock(
+        self,
+        db: AsyncSession,
+        *,
+        barcodes: List[str],
+        ids: List[int],
+        net_of_holds: bool = False,
+        exclude_cart_id: Optional[int] = None
+    ) -> List[tuple[Product, int, bool]]:
+        """Resolve many barcodes and ids, with stock on hand and whether the
+        product may be sold, in one query.
+
+        With `net_of_holds` the stock is less what carts other than
+        `exclude_cart_id` currently hold.
+        """
+        conditions = []
+        if barcodes:
+            conditions.append(any_of(db, Product.barcode, barcodes))
+        if ids:
+            conditions.append(any_of(db, Product.id, ids))
+        if not conditions:
+            return []
+
+        stock = func.coalesce(Inventory.quantity, 0)
+        if net_of_holds:
+            stock = stock - held_quantity(Product.id, exclude_cart_id)
+        result = await db.execute(
+            select(Product, stock, sellable().label("sellable"))
+            .outerjoin(Inventory, Inventory.product_id == Product.id)
+            .where(or_(*conditions))
+        )
+        rows = [(product, quantity, bool(on_sale)) for product, quantity, on_sale in result.all()]
+        for product, _, _ in rows:
+            product_cache.put(product)
+        return rows
+
+    async def bulk_upsert(
+        self,
+        db: AsyncSession,
+        rows: List[Dict[str, Any]]
+    ) -> tuple[Dict[str, int], int]:
+        """Multi-row INSERT ... ON CONFLICT (barcode) DO UPDATE.
+
+        Rows whose values are unchanged are left untouched so their
+        updated_at stays put, and a batch that changes nothing leaves the
+        catalog version alone. Returns the id of every barcode in `rows` and
+        the number of rows actually inserted or updated.
+        """
+        now = datetime.utcnow()
+        stmt = upsert_insert(db, Product).values([
+            {
+                **row,
+                "status": ProductStatus.ACTIVE,
+                "created_at": now,
+                "updated_at": now
+            }
+            for row in rows
+        ])
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.barcode],
+            set_={
+                **{column: excluded[column] for column in self.import_columns},
+                "updated_at": now
+            },
+            where=or_(*(
+                getattr(Product, column).is_distinct_from(excluded[column])
+                for column in self.import_columns
+            ))
+        ).returning(Product.id, Product.barcode)
+
+        result = await db.execute(stmt)
+        ids = {barcode: product_id for product_id, barcode in result.all()}
+        written = len(ids)
+        if ids:
+            # Stamped only now, so unchanged batches do not bump the version
+            version = await self.next_catalog_version(db)
+            await db.execute(
+                update(Product)
+                .where(any_of(db, Product.id, list(ids.values())))
+                .values(catalog_version=version)
+                .execution_options(synchronize_session=False)
+            )
+        for product_id in ids.values():
+            self.invalidate_cache(product_id)
+
+        unchanged = [row["barcode"] for row in rows if row["barcode"] not in ids]
+        if unchanged:
+            result = await db.execute(
+                select(Product.id, Product.barcode).where(Product.barcode.in_(unchanged))
+            )
+            ids.update({barcode: product_id for product_id, barcode in result.all()})
+
+        return ids, written
 
     async def get_active_products(
         self, 
         db: AsyncSession, 
         *, 
         skip: int = 0, 
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        with_inventory: bool = False
     ) -> list[Product]:
+        query = select(Product).where(Product.status == ProductStatus.ACTIVE)
+        if with_inventory:
+            query = self._with_inventory(query)
         result = await db.execute(
-            select(Product)
-            .where(Product.status == ProductStatus.ACTIVE)
-            .offset(skip)
-            .limit(limit)
+            paginate(query, self.keyset, skip=skip, limit=limit, cursor=cursor)
         )
-        return result.scalars().all()
+        return to_page(result.scalars().all(), self.keyset, limit)
 
     async def search_products(
         self,
@@ -37,22 +266,74 @@ class ProductRepository(BaseRepository[Product, ProductCreate, ProductUpdate]):
         *,
         search_term: str,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        with_inventory: bool = False
     ) -> list[Product]:
-        search = f"%{search_term}%"
-        result = await db.execute(
+        term = search_term.strip()
+        if not term:
+            return []
+
+        # Scanner input: an exact barcode hit skips the text search entirely
+        if term.isdigit() and not with_inventory:
+            product = await self.get_by_barcode(db, term)
+            if product:
+                return [product] if skip == 0 else []
+
+        if dialect_name(db) == "postgresql":
+            query = self._ranked_search_query(term)
+        else:
+            query = self._fallback_search_query(term)
+        if with_inventory:
+            query = self._with_inventory(query)
+
+        result = await db.execute(query.offset(skip).limit(limit))
+        return result.scalars().all()
+
+    def _ranked_search_query(self, term: str):
+        """Trigram search served by the GIN indexes on name and description"""
+        escaped = _escape_like(term)
+        contains = f"%{escaped}%"
+        rank = (
+            func.similarity(Product.name, term)
+            + func.word_similarity(term, Product.name)
+            + case((Product.name.ilike(f"{escaped}%", escape="\\"), 1.0), else_=0.0)
+            + case((Product.barcode == term, 2.0), else_=0.0)
+        )
+        return (
             select(Product)
             .where(
                 or_(
-                    Product.name.ilike(search),
-                    Product.barcode.ilike(search),
-                    Product.description.ilike(search)
+                    Product.name.ilike(contains, escape="\\"),
+                    Product.name.op("%")(term),
+                    Product.description.ilike(contains, escape="\\"),
+                    Product.barcode.like(f"{escaped}%", escape="\\")
                 )
             )
-            .offset(skip)
-            .limit(limit)
+            .order_by(rank.desc(), Product.id)
+        )
+
+    def _fallback_search_query(self, term: str):
+        """Portable ILIKE search with a coarse rank, used on SQLite"""
+        escaped = _escape_like(term)
+        contains = f"%{escaped}%"
+        rank = case(
+            (Product.barcode == term, 4),
+            (func.lower(Product.name) == term.lower(), 3),
+            (Product.name.ilike(f"{escaped}%", escape="\\"), 2),
+            (Product.name.ilike(contains, escape="\\"), 1),
+            else_=0
+        )
+        return (
+            select(Product)
+            .where(
+                or_(
+                    Product.name.ilike(contains, escape="\\"),
+                    Product.description.ilike(contains, escape="\\"),
+                    Product.barcode.like(f"{escaped}%", escape="\\")
+                )
+            )
+            .order_by(rank.desc(), Product.name, Product.id)
         )
-        return result.scalars().all()
 
     async def get_products_by_category(
         self,
@@ -60,12 +341,108 @@ class ProductRepository(BaseRepository[Product, ProductCreate, ProductUpdate]):
         *,
         category: str,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        with_inventory: bool = False
     ) -> list[Product]:
+        query = select(Product).where(Product.category == category)
+        if with_inventory:
+            query = self._with_inventory(query)
         result = await db.execute(
-            select(Product)
-            .where(Product.category == category)
-            .offset(skip)
-            .limit(limit)
+            paginate(query, self.keyset, skip=skip, limit=limit, cursor=cursor)
         )
-        return result.scalars().all()
+        return to_page(result.scalars().all(), self.keyset, limit)
+
+    async def get_deleted_since(
+        self,
+        db: AsyncSession,
+        version: int,
+        limit: Optional[int] = None
+    ) -> List[tuple[int, int]]:
+        """(product_id, catalog_version) of products deleted after `version`"""
+        query = (
+            select(ProductTombstone.product_id, ProductTombstone.catalog_version)
+            .where(ProductTombstone.catalog_version > version)
+            .order_by(ProductTombstone.catalog_version, ProductTombstone.product_id)
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        result = await db.execute(query)
+        return [tuple(row) for row in result.all()]
+
+    def _facet_rows_query(self):
+        """(facet, value, count) grouped straight from products"""
+        return union_all(*(
+            select(
+                literal(column.key).label("facet"),
+                cast(column, String).label("value"),
+                func.count().label("count")
+            ).where(column.isnot(None)).group_by(column)
+            for column in self.facet_columns
+        ))
+
+    async def get_facet_counts(self, db: AsyncSession) -> Dict[str, Dict[str, int]]:
+        """Product counts per facet value, keyed by the stored enum names.
+
+        On Postgres these come from product_facet_counts, which triggers keep
+        current; other backends fall back to grouping products directly.
+        """
+        if dialect_name(db) == "postgresql":
+            query = select(
+                ProductFacetCount.facet, ProductFacetCount.value, ProductFacetCount.count
+            ).where(ProductFacetCount.count > 0)
+        else:
+            query = self._facet_rows_query()
+
+        counts: Dict[str, Dict[str, int]] = {c.key: {} for c in self.facet_columns}
+        for facet, value, count in (await db.execute(query)).all():
+            counts.setdefault(facet, {})[value] = count
+        return counts
+
+    async def rebuild_facet_counts(self, db: AsyncSession) -> int:
+        """Recompute product_facet_counts from scratch and return the rows
+        written. Does not commit.
+
+        On Postgres the table is locked first, so product writes whose
+        triggers have not run yet apply their changes after the rebuild
+        instead of being counted twice or lost.
+        """
+        if dialect_name(db) == "postgresql":
+            await db.execute(text("LOCK TABLE product_facet_counts IN EXCLUSIVE MODE"))
+        await db.execute(delete(ProductFacetCount))
+        result = await db.execute(
+            ProductFacetCount.__table__.insert().from_select(
+                ["facet", "value", "count"], self._facet_rows_query()
+            )
+        )
+        return result.rowcount
+
+    async def stream_catalog(
+        self,
+        db: AsyncSession,
+        *,
+        changed_since: Optional[int] = None,
+        active_only: bool = False,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[Any]:
+        """Yield catalog rows through a server-side cursor.
+
+        Full listings come back in id order, change feeds (rows written after
+        catalog version `changed_since`) in catalog version order.
+        """
+        query = select(*self.catalog_columns)
+        if active_only:
+            query = query.where(Product.status == ProductStatus.ACTIVE)
+        if changed_since is not None:
+            query = (
+                query.where(Product.catalog_version > changed_since)
+                .order_by(Product.catalog_version, Product.id)
+            )
+        else:
+            query = query.order_by(Product.id)
+        if limit is not None:
+            query = query.limit(limit)
+
+        result = await db.stream(query)
+        async for row in result:
+            yield row
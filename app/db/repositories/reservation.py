@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.db_models import CartItem, Inventory, InventoryReservation
+from .base import BaseRepository, any_of, upsert_insert
+
+
+def held_quantity(product_id: Any, exclude_cart_id: Any = None):
+    """Scalar subquery: units of a product held by unexpired reservations,
+    optionally ignoring one cart's own holds"""
+    query = select(func.coalesce(func.sum(InventoryReservation.quantity), 0)).where(
+        InventoryReservation.product_id == product_id,
+        InventoryReservation.expires_at > datetime.utcnow()
+    )
+    if exclude_cart_id is not None:
+        query = query.where(InventoryReservation.cart_id != exclude_cart_id)
+    return query.scalar_subquery()
+
+
+def hold_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(minutes=settings.RESERVATION_TTL_MINUTES)
+
+
+class ReservationRepository(BaseRepository[InventoryReservation, None, None]):
+    def __init__(self):
+        super().__init__(InventoryReservation)
+
+    async def get_available(
+        self,
+        db: AsyncSession,
+        product_id: int,
+        exclude_cart_id: Optional[int] = None
+    ) -> int:
+        """Stock on hand less what other carts hold"""
+        result = await db.execute(
+            select(Inventory.quantity - held_quantity(Inventory.product_id, exclude_cart_id))
+            .where(Inventory.product_id == product_id)
+        )
+        return max(result.scalar() or 0, 0)
+
+    async def hold_cart_lines(
+        self,
+        db: AsyncSession,
+        cart_ids: List[int],
+        product_ids: Optional[List[int]] = None
+    ) -> None:
+        """Set the holds of the given carts (optionally only some products) to
+        their current line quantities, restarting the TTL. Does not commit."""
+        if not cart_ids:
+            return
+        lines = select(
+            CartItem.cart_id,
+            CartItem.product_id,
+            CartItem.quantity,
+            literal(hold_expiry()),
+            literal(datetime.utcnow())
+        ).where(any_of(db, CartItem.cart_id, cart_ids))
+        if product_ids:
+            lines = lines.where(any_of(db, CartItem.product_id, product_ids))
+
+        stmt = upsert_insert(db, InventoryReservation).from_select(
+            ["cart_id", "product_id", "quantity", "expires_at", "created_at"],
+            lines
+        )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[InventoryReservation.cart_id, InventoryReservation.product_id],
+            set_={"quantity": stmt.excluded.quantity, "expires_at": stmt.excluded.expires_at}
+        ))
+
+    async def hold(self, db: AsyncSession, cart_id: int, quantities: Dict[int, int]) -> None:
+        """Set a cart's holds on the given products to the given quantities,
+        restarting the TTL; a quantity of 0 drops the hold. Does not commit."""
+        kept = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+        dropped = [product_id for product_id, quantity in quantities.items() if quantity <= 0]
+        if dropped:
+            await db.execute(
+                delete(InventoryReservation).where(
+                    InventoryReservation.cart_id == cart_id,
+                    any_of(db, InventoryReservation.product_id, dropped)
+                )
+            )
+        if not kept:
+            return
+        expires_at, now = hold_expiry(), datetime.utcnow()
+        stmt = upsert_insert(db, InventoryReservation).values([
+            {
+                "cart_id": cart_id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "expires_at": expires_at,
+                "created_at": now
+            }
+            for product_id, quantity in kept.items()
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[InventoryReservation.cart_id, InventoryReservation.product_id],
+            set_={"quantity": stmt.excluded.quantity, "expires_at": stmt.excluded.expires_at}
+        ))
+
+    async def release_carts(self, db: AsyncSession, cart_ids: List[int]) -> int:
+        """Drop every hold of the given carts. Does not commit."""
+        if not cart_ids:
+            return 0
+        result = await db.execute(
+            delete(InventoryReservation).where(any_of(db, InventoryReservation.cart_id, cart_ids))
+        )
+        return result.rowcount
+
+    async def purge_expired(self, db: AsyncSession, limit: int = 10000) -> int:
+        """Delete up to `limit` expired holds. Does not commit."""
+        expired = (
+            select(InventoryReservation.id)
+            .where(InventoryReservation.expires_at <= datetime.utcnow())
+            .limit(limit)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            delete(InventoryReservation).where(InventoryReservation.id.in_(expired))
+        )
+        return result.rowcount
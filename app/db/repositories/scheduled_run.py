@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.db_models import ScheduledRun
+from .base import BaseRepository, upsert_insert
+
+
+class ScheduledRunRepository(BaseRepository[ScheduledRun, None, None]):
+    def __init__(self):
+        super().__init__(ScheduledRun)
+
+    async def claim(self, db: AsyncSession, *, job: str, slot: datetime) -> bool:
+        """Take `job`'s `slot` with one INSERT ... ON CONFLICT DO NOTHING;
+        False if another worker already has it. Commit before running the
+        job so the others find the row. Does not commit."""
+        stmt = upsert_insert(db, ScheduledRun).values(
+            job=job, slot=slot, claimed_at=datetime.utcnow()
+        )
+        result = await db.execute(
+            stmt.on_conflict_do_nothing(index_elements=[ScheduledRun.job, ScheduledRun.slot])
+            .returning(ScheduledRun.job)
+        )
+        return result.first() is not None
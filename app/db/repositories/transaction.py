@@ -1,13 +1,24 @@
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, and_
+from sqlalchemy import select, insert, update, desc, and_, func, literal
 from sqlalchemy.orm import selectinload
-from app.models.db_models import Transaction, TransactionItem, TransactionStatus, Cart, PaymentStatus
+from app.models.db_models import (
+    Transaction,
+    TransactionItem,
+    TransactionStatus,
+    CartItem,
+    PaymentMethod,
+    PaymentStatus
+)
 from app.models.schemas import TransactionCreate
-from .base import BaseRepository
+from app.db.pagination import paginate, to_page
+from .base import BaseRepository, any_of
 
 class TransactionRepository(BaseRepository[Transaction, TransactionCreate, None]):
+    keyset = (Transaction.created_at, Transaction.id)
+
     def __init__(self):
         super().__init__(Transaction)
 
@@ -24,6 +35,7 @@ class TransactionRepository(BaseRepository[Transaction, TransactionCreate, None]
                 selectinload(Transaction.payments)
             )
             .where(Transaction.id == transaction_id)
+            .execution_options(populate_existing=True)
         )
         return result.scalars().first()
 
@@ -33,75 +45,88 @@ class TransactionRepository(BaseRepository[Transaction, TransactionCreate, None]
         user_id: int,
         *,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
     ) -> List[Transaction]:
         result = await db.execute(
-            select(Transaction)
-            .where(Transaction.user_id == user_id)
-            .order_by(desc(Transaction.created_at))
-            .offset(skip)
-            .limit(limit)
+            paginate(
+                select(Transaction).where(Transaction.user_id == user_id),
+                self.keyset, skip=skip, limit=limit, cursor=cursor, descending=True
+            )
         )
-        return result.scalars().all()
+        return to_page(result.scalars().all(), self.keyset, limit)
 
     async def create_from_cart(
         self,
         db: AsyncSession,
         *,
         cart_id: int,
-        user_id: int,
-        payment_method: str,
-        total_amount: float
+        user_id: Optional[int],
+        payment_method: PaymentMethod,
+        subtotal: Decimal,
+        tax_amount: Decimal
     ) -> Transaction:
-        # Get cart with items
-        cart = await db.execute(
-            select(Cart)
-            .options(selectinload(Cart.items))
-            .where(Cart.id == cart_id)
-        )
-        cart = cart.scalars().first()
-        
-        if not cart:
-            raise ValueError("Cart not found")
-            
-        # Calculate totals (would normally come from service layer)
-        subtotal = sum(item.quantity * item.price_at_addition for item in cart.items)
-        tax = sum(
-            item.quantity * item.price_at_addition * item.product.tax_rate 
-            for item in cart.items
-        )
-        
-        # Create transaction
+        """Record an in-progress transaction for a cart and copy its lines,
+        with the tax rates captured on them, into transaction_items in one
+        INSERT ... SELECT. It is completed once its payment is approved.
+        Does not commit."""
+        tax_amount = Decimal(tax_amount).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
         transaction = Transaction(
             user_id=user_id,
             cart_id=cart_id,
-            status=TransactionStatus.COMPLETED,
+            status=TransactionStatus.IN_PROGRESS,
             subtotal=subtotal,
-            tax_amount=tax,
-            total_amount=total_amount,
+            tax_amount=tax_amount,
+            total_amount=subtotal + tax_amount,
             payment_method=payment_method,
-            payment_status=PaymentStatus.PENDING,
-            completed_at=datetime.utcnow()
+            payment_status=PaymentStatus.PENDING
         )
-        
         db.add(transaction)
-        await db.commit()
-        await db.refresh(transaction)
-        
-        # Create transaction items
-        for cart_item in cart.items:
-            transaction_item = TransactionItem(
-                transaction_id=transaction.id,
-                product_id=cart_item.product_id,
-                quantity=cart_item.quantity,
-                price=cart_item.price_at_addition,
-                tax_rate=cart_item.product.tax_rate,
-                was_age_verified=cart_item.is_age_verified
+        await db.flush()
+
+        await db.execute(
+            insert(TransactionItem).from_select(
+                ["transaction_id", "product_id", "quantity", "price", "tax_rate", "was_age_verified"],
+                select(
+                    literal(transaction.id),
+                    CartItem.product_id,
+                    CartItem.quantity,
+                    CartItem.price_at_addition,
+                    CartItem.tax_rate_at_addition,
+                    CartItem.is_age_verified
+                )
+                .where(CartItem.cart_id == cart_id)
             )
-            db.add(transaction_item)
-        
-        # Mark cart as inactive
-        cart.is_active = False
-        await db.commit()
-        
+        )
         return transaction
+
+    async def complete_many(self, db: AsyncSession, transaction_ids: List[int]) -> None:
+        """Complete in-progress transactions whose payment was approved.
+        Does not commit."""
+        if not transaction_ids:
+            return
+        await db.execute(
+            update(Transaction)
+            .where(
+                any_of(db, Transaction.id, transaction_ids),
+                Transaction.status == TransactionStatus.IN_PROGRESS
+            )
+            .values(
+                status=TransactionStatus.COMPLETED,
+                payment_status=PaymentStatus.COMPLETED,
+                completed_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def cancel(self, db: AsyncSession, transaction_id: int) -> Optional[int]:
+        """Cancel a transaction whose payment failed; returns its cart id.
+        Does not commit."""
+        result = await db.execute(
+            update(Transaction)
+            .where(Transaction.id == transaction_id, Transaction.status != TransactionStatus.CANCELLED)
+            .values(status=TransactionStatus.CANCELLED, payment_status=PaymentStatus.FAILED)
+            .returning(Transaction.cart_id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.scalar()
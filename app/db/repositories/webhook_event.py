@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.db_models import PaymentWebhookEvent, WebhookEventStatus
+from .base import BaseRepository, upsert_insert
+
+
+class WebhookEventRepository(BaseRepository[PaymentWebhookEvent, None, None]):
+    def __init__(self):
+        super().__init__(PaymentWebhookEvent)
+
+    async def record(
+        self,
+        db: AsyncSession,
+        *,
+        reference: str,
+        approved: bool,
+        message: Optional[str]
+    ) -> Optional[int]:
+        """Store a received event in one INSERT ... ON CONFLICT DO NOTHING;
+        its id, or None if an event with that reference is already stored.
+        Does not commit."""
+        stmt = upsert_insert(db, PaymentWebhookEvent).values(
+            reference=reference,
+            approved=approved,
+            message=message,
+            status=WebhookEventStatus.RECEIVED,
+            attempts=0,
+            received_at=datetime.utcnow()
+        )
+        result = await db.execute(
+            stmt.on_conflict_do_nothing(index_elements=[PaymentWebhookEvent.reference])
+            .returning(PaymentWebhookEvent.id)
+        )
+        return result.scalar()
+
+    async def get_received(self, db: AsyncSession, *, limit: int = 10000) -> List[PaymentWebhookEvent]:
+        """Oldest events acknowledged but not yet applied"""
+        result = await db.execute(
+            select(PaymentWebhookEvent)
+            .where(PaymentWebhookEvent.status == WebhookEventStatus.RECEIVED)
+            .order_by(PaymentWebhookEvent.id)
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    async def mark(self, db: AsyncSession, ids: List[int], status: WebhookEventStatus) -> None:
+        """Record how received events were applied; events another worker
+        already processed are left alone. Does not commit."""
+        if not ids:
+            return
+        await db.execute(
+            update(PaymentWebhookEvent)
+            .where(
+                PaymentWebhookEvent.id.in_(ids),
+                PaymentWebhookEvent.status == WebhookEventStatus.RECEIVED
+            )
+            .values(status=status, processed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    async def dead_letter(self, db: AsyncSession, *, id: int, attempts: int, error: str) -> None:
+        """Park an event that kept failing, with its last error. Does not commit."""
+        await db.execute(
+            update(PaymentWebhookEvent)
+            .where(PaymentWebhookEvent.id == id)
+            .values(
+                status=WebhookEventStatus.DEAD_LETTER,
+                attempts=attempts,
+                error=error,
+                processed_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def purge_processed(self, db: AsyncSession, *, processed_before: datetime, limit: int = 10000) -> int:
+        """Delete up to `limit` applied or stale events processed before
+        `processed_before`; dead letters are kept. Does not commit."""
+        processed = (
+            select(PaymentWebhookEvent.id)
+            .where(
+                PaymentWebhookEvent.status.in_((WebhookEventStatus.APPLIED, WebhookEventStatus.STALE)),
+                PaymentWebhookEvent.processed_at < processed_before
+            )
+            .limit(limit)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            delete(PaymentWebhookEvent).where(PaymentWebhookEvent.id.in_(processed))
+        )
+        return result.rowcount
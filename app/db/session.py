@@ -38,6 +38,10 @@ class DatabaseSessionManager:
             autoflush=False
         )
 
+    @property
+    def engine(self):
+        return self._engine
+
     async def close(self):
         if self._engine is not None:
             await self._engine.dispose()
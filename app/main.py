@@ -11,5 +11,5 @@ if __name__ == "__main__":
         port=8000,
         reload=settings.DEBUG,
         log_level=settings.LOG_LEVEL.lower(),
-        workers=4 if not settings.DEBUG else 1
+        workers=settings.WORKERS if not settings.DEBUG else 1
     )
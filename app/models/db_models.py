@@ -2,9 +2,9 @@ from enum import Enum
 from datetime import datetime
 from typing import Optional, List
 from sqlalchemy import (
-    Column, String, Integer, Float, Boolean, 
+    Column, String, Integer, BigInteger, Float, Boolean, Text,
     DateTime, ForeignKey, Enum as SQLAlchemyEnum,
-    Numeric, CheckConstraint, UniqueConstraint
+    Numeric, CheckConstraint, UniqueConstraint, Index
 )
 from sqlalchemy.orm import relationship, validates
 from app.db.base import Base  # SQLAlchemy Base class
@@ -48,12 +48,21 @@ class PaymentMethod(str, Enum):
 
 class PaymentStatus(str, Enum):
     PENDING = "pending"
+    # Claimed by the worker charging it
+    PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
     REFUNDED = "refunded"
     PARTIALLY_REFUNDED = "partially_refunded"
 
 
+class WebhookEventStatus(str, Enum):
+    RECEIVED = "received"  # Stored and acknowledged, not applied yet
+    APPLIED = "applied"
+    STALE = "stale"  # Its payment was already settled
+    DEAD_LETTER = "dead_letter"
+
+
 class TransactionStatus(str, Enum):
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
@@ -67,6 +76,13 @@ class Product(Base):
     __table_args__ = (
         CheckConstraint('current_price > 0', name='positive_price'),
         UniqueConstraint('barcode', name='unique_barcode'),
+        # Trigram indexes back ILIKE '%term%' and similarity ranking in search
+        Index('ix_products_name_trgm', 'name', postgresql_using='gin',
+              postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_products_description_trgm', 'description', postgresql_using='gin',
+              postgresql_ops={'description': 'gin_trgm_ops'}),
+        Index('ix_products_barcode_pattern', 'barcode',
+              postgresql_ops={'barcode': 'varchar_pattern_ops'}),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -84,7 +100,9 @@ class Product(Base):
     is_weighted = Column(Boolean, default=False)
     min_age_verification = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Catalog version of the write that last touched the row
+    catalog_version = Column(BigInteger, nullable=False, default=0, server_default='0', index=True)
 
     inventory = relationship("Inventory", back_populates="product", uselist=False)
     cart_items = relationship("CartItem", back_populates="product")
@@ -97,6 +115,34 @@ class Product(Base):
         return tax_rate
 
 
+class CatalogVersion(Base):
+    """Single-row counter bumped by every catalog write in its own
+    transaction. Writers queue on the row lock until the holder commits, so
+    versions become visible in the order they were handed out."""
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class ProductTombstone(Base):
+    """Deleted product, kept so the catalog change feed can report it"""
+    __tablename__ = "product_tombstones"
+
+    product_id = Column(Integer, primary_key=True)
+    catalog_version = Column(BigInteger, nullable=False, index=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ProductFacetCount(Base):
+    """Product counts per browse facet value, kept current by triggers on products"""
+    __tablename__ = "product_facet_counts"
+
+    facet = Column(String(30), primary_key=True)  # category, status, age_restriction
+    value = Column(String(30), primary_key=True)  # enum name as stored on products
+    count = Column(Integer, nullable=False, default=0)
+
+
 class Inventory(Base):
     """Real-time stock level tracking"""
     __tablename__ = "inventory"
@@ -117,6 +163,23 @@ class Inventory(Base):
     product = relationship("Product", back_populates="inventory")
 
 
+class InventoryReservation(Base):
+    """Time-limited hold on stock for a cart line"""
+    __tablename__ = "inventory_reservations"
+    __table_args__ = (
+        CheckConstraint('quantity > 0', name='positive_reservation'),
+        UniqueConstraint('cart_id', 'product_id', name='unique_cart_reservation'),
+        Index('ix_inventory_reservations_product_expires', 'product_id', 'expires_at'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    cart_id = Column(Integer, ForeignKey("carts.id", ondelete="CASCADE"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class User(Base):
     """System users (customers and staff)"""
     __tablename__ = "users"
@@ -146,8 +209,12 @@ class Cart(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     session_id = Column(String(100), index=True)  # For guest users
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     is_active = Column(Boolean, default=True)
+    # Running totals, maintained alongside every change to cart_items
+    subtotal = Column(Numeric(12, 2), nullable=False, default=0)
+    tax_amount = Column(Numeric(14, 6), nullable=False, default=0)
+    item_count = Column(Integer, nullable=False, default=0)
 
     user = relationship("User", back_populates="carts")
     items = relationship("CartItem", back_populates="cart", cascade="all, delete-orphan")
@@ -166,6 +233,7 @@ class CartItem(Base):
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, default=1)
     price_at_addition = Column(Numeric(10, 2))  # Snapshot of price
+    tax_rate_at_addition = Column(Numeric(5, 4), nullable=False, default=0, server_default='0')  # Snapshot of tax rate
     added_at = Column(DateTime, default=datetime.utcnow)
     is_age_verified = Column(Boolean, default=False)
 
@@ -229,10 +297,15 @@ class Payment(Base):
     __tablename__ = "payments"
     __table_args__ = (
         CheckConstraint('amount > 0', name='positive_amount'),
+        # One payment per gateway reference; webhook deliveries dedup on it
+        Index('ix_payments_processor_reference', 'processor_reference', unique=True),
+        # Keyset listings of settled payments by status or method
+        Index('ix_payments_status_processed_at', 'status', 'processed_at', 'id'),
+        Index('ix_payments_method_processed_at', 'method', 'processed_at', 'id'),
     )
 
     id = Column(Integer, primary_key=True, index=True)
-    transaction_id = Column(Integer, ForeignKey("transactions.id"))
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), index=True)
     amount = Column(Numeric(10, 2))
     method = Column(SQLAlchemyEnum(PaymentMethod))
     status = Column(SQLAlchemyEnum(PaymentStatus), default=PaymentStatus.PENDING)
@@ -245,6 +318,52 @@ class Payment(Base):
     transaction = relationship("Transaction", back_populates="payments")
 
 
+class IdempotencyKey(Base):
+    """Outcome of a request sent with an Idempotency-Key header; a row
+    without a status code is still in flight"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint('scope', 'key', name='unique_idempotency_key'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(100), nullable=False)  # "POST /api/v1/payment/checkout"
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer)
+    response_body = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    completed_at = Column(DateTime)
+
+
+class PaymentWebhookEvent(Base):
+    """Verified gateway webhook, stored before it is acknowledged so that
+    no event is lost with the worker that received it"""
+    __tablename__ = "payment_webhook_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reference = Column(String(100), nullable=False, unique=True)
+    approved = Column(Boolean, nullable=False)
+    message = Column(String(255))
+    status = Column(
+        SQLAlchemyEnum(WebhookEventStatus), nullable=False, default=WebhookEventStatus.RECEIVED, index=True
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    received_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = Column(DateTime, index=True)
+
+
+class ScheduledRun(Base):
+    """Claim of one scheduled slot of a periodic job by the worker that
+    runs it; the others find the row taken and skip the slot"""
+    __tablename__ = "scheduled_runs"
+
+    job = Column(String(100), primary_key=True)
+    slot = Column(DateTime, primary_key=True)
+    claimed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
 class SystemLog(Base):
     """Audit logging for security and troubleshooting"""
     __tablename__ = "system_logs"
@@ -1,7 +1,8 @@
 from enum import Enum
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pydantic import BaseModel, Field, validator, condecimal, conint, EmailStr, field_validator
+from app.models.db_models import ProductCategory, ProductStatus, AgeRestriction, PaymentMethod
 
 
 class UserBase(BaseModel):
@@ -69,6 +70,26 @@ class ProductCreate(ProductBase):
         return v
 
 
+class ProductImportRow(ProductCreate):
+    quantity: Optional[conint(ge=0)] = None
+
+
+class ImportRowError(BaseModel):
+    row: int
+    barcode: Optional[str] = None
+    error: str
+
+
+class ProductImportReport(BaseModel):
+    processed: int = 0
+    upserted: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = False
+    duration_seconds: float = 0.0
+
+
 class ProductUpdate(BaseModel):
     current_price: Optional[condecimal(gt=0, decimal_places=2)] = None
     status: Optional[str] = None  # Will be replaced with ProductStatus enum
@@ -92,6 +113,72 @@ class ProductInDB(ProductBase):
         from_attributes = True
 
 
+class StockLevel(BaseModel):
+    quantity: int
+    low_stock_threshold: int
+    is_low_stock: bool
+
+
+class ProductWithStock(ProductInDB):
+    stock: Optional[StockLevel] = None
+
+    @classmethod
+    def from_product(cls, product, include_stock: bool = False) -> "ProductWithStock":
+        """Build from an ORM product; `include_stock` requires product.inventory
+        to have been loaded with the product"""
+        item = cls.model_validate(product)
+        if include_stock:
+            inventory = product.inventory
+            quantity = (inventory.quantity or 0) if inventory else 0
+            threshold = (inventory.low_stock_threshold or 0) if inventory else 0
+            item.stock = StockLevel(
+                quantity=quantity,
+                low_stock_threshold=threshold,
+                is_low_stock=quantity <= threshold
+            )
+        return item
+
+
+class ProductLookupRequest(BaseModel):
+    barcodes: List[str] = Field(default_factory=list, max_length=200)
+    ids: List[int] = Field(default_factory=list, max_length=200)
+
+
+class ProductLookupHit(BaseModel):
+    product: ProductInDB
+    quantity: int
+    sellable: bool  # False for discontinued or recalled products
+    in_stock: bool
+
+
+class ProductLookupResponse(BaseModel):
+    barcodes: Dict[str, ProductLookupHit]
+    ids: Dict[int, ProductLookupHit]
+    missing_barcodes: List[str]
+    missing_ids: List[int]
+
+
+class CatalogFacets(BaseModel):
+    total: int
+    category: Dict[str, int]
+    status: Dict[str, int]
+    age_restriction: Dict[str, int]
+
+
+class InventoryInDB(BaseModel):
+    product_id: int
+    quantity: int
+    low_stock_threshold: int
+    reorder_threshold: int
+    last_restocked: Optional[datetime] = None
+    next_restock_estimate: Optional[datetime] = None
+    is_active: bool
+    product: Optional[ProductInDB] = None
+
+    class Config:
+        from_attributes = True
+
+
 class InventoryLevel(BaseModel):
     quantity: conint(ge=0)
     low_stock_threshold: conint(ge=0)
@@ -109,7 +196,7 @@ class CartItemUpdate(BaseModel):
 
 
 class CartItemInDB(BaseModel):
-    id: int
+    id: Optional[int] = None  # None while the line only exists in the cart store
     product_id: int
     quantity: int
     price_at_addition: condecimal(ge=0, decimal_places=2)
@@ -131,6 +218,19 @@ class CartInDB(BaseModel):
         from_attributes = True
 
 
+class CartLineResult(BaseModel):
+    product_id: int
+    quantity: int
+    added: bool
+    error: Optional[str] = None
+    available: Optional[int] = None  # Set when the line failed for lack of stock
+
+
+class CartBatchResult(BaseModel):
+    cart: CartInDB
+    results: List[CartLineResult]
+
+
 class PaymentCreate(BaseModel):
     method: str  # Will be replaced with PaymentMethod enum
     amount: condecimal(gt=0, decimal_places=2)
@@ -3,12 +3,18 @@ from .payment_service import PaymentService
 from .inventory_service import InventoryService
 from .receipt_service import ReceiptService
 from .age_verification import AgeVerificationService
+from .import_service import ProductImportService
+from .catalog_service import CatalogService
+from .checkout_service import CheckoutService
 from .exceptions import (
     ServiceException,
     InsufficientStockError,
     AgeVerificationError,
     PaymentProcessingError,
-    CartValidationError
+    CartValidationError,
+    IdempotencyKeyError,
+    WebhookSignatureError,
+    WebhookBacklogError
 )
 
 __all__ = [
@@ -17,9 +23,15 @@ __all__ = [
     "InventoryService",
     "ReceiptService",
     "AgeVerificationService",
+    "ProductImportService",
+    "CatalogService",
+    "CheckoutService",
     "ServiceException",
     "InsufficientStockError",
     "AgeVerificationError",
     "PaymentProcessingError",
-    "CartValidationError"
+    "CartValidationError",
+    "IdempotencyKeyError",
+    "WebhookSignatureError",
+    "WebhookBacklogError"
 ]
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional, Set
+from app.db.cache import product_cache
+from app.utils.http_cache import response_cache
+from app.services.cart_events import CartEventBroker, cart_events
+
+logger = logging.getLogger(__name__)
+
+# Keys per notification, keeping each payload well under the pg_notify cap
+MESSAGE_KEYS = 200
+
+
+class CacheInvalidationRelay:
+    """Passes product and response cache invalidations to the other workers
+    over the cart events LISTEN/NOTIFY bridge.
+
+    Invalidations are collected and sent on the next loop iteration, so a
+    bulk write that drops thousands of entries costs a handful of
+    notifications. Where there is no bridge to relay over and more than one
+    worker, the caches are switched off rather than left to serve entries
+    other workers have invalidated.
+    """
+
+    KIND = "cache.invalidate"
+
+    def __init__(self, broker: CartEventBroker):
+        self.broker = broker
+        self._tags: Set[str] = set()
+        self._product_ids: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.received = 0
+
+    def start(self, workers: int) -> None:
+        """Relay invalidations once the broker is bridged"""
+        if not self.broker.bridged:
+            if workers > 1 and (product_cache.enabled or response_cache.enabled):
+                logger.warning(
+                    f"No invalidation bridge between {workers} workers; "
+                    "product and response caches disabled"
+                )
+                product_cache.enabled = False
+                response_cache.enabled = False
+            return
+        self.broker.on_broadcast(self.KIND, self._apply)
+        response_cache.on_invalidate = self._queue_tags
+        product_cache.on_invalidate = self._queue_product
+
+    async def stop(self) -> None:
+        response_cache.on_invalidate = None
+        product_cache.on_invalidate = None
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception:
+                pass
+            self._task = None
+
+    def _queue_tags(self, tags: Iterable[str]) -> None:
+        self._tags.update(tags)
+        self._schedule()
+
+    def _queue_product(self, product_id: int) -> None:
+        self._product_ids.add(product_id)
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._send())
+
+    async def _send(self) -> None:
+        # Let the rest of the write's invalidations pile up first
+        await asyncio.sleep(0)
+        while self._tags or self._product_ids:
+            tags = [self._tags.pop() for _ in range(min(len(self._tags), MESSAGE_KEYS))]
+            room = MESSAGE_KEYS - len(tags)
+            product_ids = [self._product_ids.pop() for _ in range(min(len(self._product_ids), room))]
+            try:
+                await self.broker.broadcast(self.KIND, {"tags": tags, "product_ids": product_ids})
+                self.sent += 1
+            except Exception as e:
+                # Peers fall back on their TTLs for these
+                logger.error(f"Cache invalidation broadcast failed: {str(e)}")
+
+    def _apply(self, data: Dict[str, Any]) -> None:
+        self.received += 1
+        response_cache.invalidate(*data.get("tags", ()), relay=False)
+        for product_id in data.get("product_ids", ()):
+            product_cache.invalidate(product_id, relay=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": product_cache.on_invalidate is not None,
+            "sent": self.sent,
+            "received": self.received
+        }
+
+
+cache_relay = CacheInvalidationRelay(cart_events)
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# pg_notify payloads are capped just under 8000 bytes
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+
+class CartEventBroker:
+    """Fans cart change events out to the WebSocket subscribers of a cart.
+
+    Delivery is in-process; with the LISTEN/NOTIFY bridge started to relay
+    events, they are also broadcast to, and received from, the other
+    workers. Other per-worker state (e.g. caches) can share the bridge
+    through `broadcast` and `on_broadcast`, which work whenever it is up.
+    """
+
+    def __init__(self, channel: str, queue_size: int):
+        self.channel = channel
+        self.queue_size = queue_size
+        self.origin = uuid.uuid4().hex
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self._conn: Optional[AsyncConnection] = None
+        self._relay_events = False
+        self._notify_lock = asyncio.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    @asynccontextmanager
+    async def subscribe(self, cart_id: int) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(cart_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(cart_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[cart_id]
+
+    async def publish(self, cart_id: Optional[int], event: Dict[str, Any]) -> None:
+        """Deliver an event about a cart to local subscribers and, if
+        bridged, to other workers"""
+        if not cart_id:
+            return
+        event = {**event, "cart_id": cart_id}
+        self.published += 1
+        self._deliver(cart_id, event)
+
+        if self._conn is not None and self._relay_events:
+            try:
+                await self._notify(event)
+            except Exception as e:
+                logger.error(f"Cart event broadcast failed: {str(e)}")
+
+    @property
+    def bridged(self) -> bool:
+        return self._conn is not None
+
+    def on_broadcast(self, kind: str, handler: Callable[[Dict[str, Any]], None]) -> None:
+        """Call `handler` with the data of every `kind` message from other workers"""
+        self._handlers[kind] = handler
+
+    async def broadcast(self, kind: str, data: Dict[str, Any]) -> None:
+        """Send a `kind` message to the other workers; a no-op unless bridged.
+        `data` must fit in one notification."""
+        if self._conn is None:
+            return
+        await self._send(json.dumps({"origin": self.origin, "kind": kind, "data": data}, default=str))
+
+    def _deliver(self, cart_id: int, event: Dict[str, Any]) -> None:
+        for queue in self._subscribers.get(cart_id, ()):
+            if queue.full():
+                # A slow display only needs the latest state
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    async def _notify(self, event: Dict[str, Any]) -> None:
+        payload = json.dumps({"origin": self.origin, "event": event}, default=str)
+        if len(payload) > NOTIFY_PAYLOAD_LIMIT:
+            # Too big to broadcast whole; totals are enough to prompt a refetch
+            trimmed = {k: v for k, v in event.items() if k != "changes"}
+            payload = json.dumps({"origin": self.origin, "event": trimmed}, default=str)
+        await self._send(payload)
+
+    async def _send(self, payload: str) -> None:
+        async with self._notify_lock:
+            raw = await self._conn.get_raw_connection()
+            await raw.driver_connection.execute(
+                "SELECT pg_notify($1, $2)", self.channel, payload
+            )
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == self.origin:
+            return
+        if "kind" in message:
+            handler = self._handlers.get(message["kind"])
+            if handler is not None:
+                try:
+                    handler(message.get("data") or {})
+                except Exception as e:
+                    logger.error(f"Cart event broadcast handler failed: {str(e)}")
+            return
+        event = message.get("event") or {}
+        cart_id = event.get("cart_id")
+        if cart_id:
+            self._deliver(cart_id, event)
+
+    async def start(self, engine: AsyncEngine, relay_events: bool = True) -> None:
+        """Bridge workers over Postgres LISTEN/NOTIFY on a dedicated connection.
+        Without `relay_events` only `broadcast` messages cross it."""
+        self._relay_events = relay_events
+        if self._conn is not None or engine.dialect.name != "postgresql":
+            return
+        self._conn = await engine.connect()
+        raw = await self._conn.get_raw_connection()
+        await raw.driver_connection.add_listener(self.channel, self._on_notification)
+
+    async def stop(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            raw = await self._conn.get_raw_connection()
+            await raw.driver_connection.remove_listener(self.channel, self._on_notification)
+        finally:
+            await self._conn.close()
+            self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "bridged": self._conn is not None,
+            "relaying_events": self._conn is not None and self._relay_events,
+            "carts": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+
+cart_events = CartEventBroker(
+    channel=settings.CART_EVENTS_CHANNEL,
+    queue_size=settings.CART_EVENTS_QUEUE_SIZE
+)
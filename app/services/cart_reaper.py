@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.cart_store import cart_store
+from app.db.repositories import cart_repo, reservation_repo, webhook_event_repo
+from app.services.cart_events import cart_events
+from app.services.idempotency import idempotency_store
+
+logger = logging.getLogger(__name__)
+
+
+class CartReaper:
+    """Deactivates abandoned carts and deletes their lines in batches, and
+    purges expired stock reservations, idempotency keys and processed
+    payment webhook events"""
+
+    def __init__(self, idle_ttl: timedelta, batch_size: int, interval: float, event_retention: timedelta):
+        self.idle_ttl = idle_ttl
+        self.event_retention = event_retention
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.carts_reaped = 0
+        self.items_deleted = 0
+        self.holds_purged = 0
+        self.keys_purged = 0
+        self.events_purged = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    async def reap(self, db: AsyncSession, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """Reap every cart idle longer than the TTL, one committed batch at a time"""
+        started = time.monotonic()
+        idle_since = datetime.utcnow() - self.idle_ttl
+        carts_reaped = items_deleted = batches = 0
+
+        while max_batches is None or batches < max_batches:
+            carts, deleted = await cart_repo.deactivate_idle(
+                db, idle_since=idle_since, limit=self.batch_size
+            )
+            await db.commit()
+            if not carts:
+                break
+
+            batches += 1
+            carts_reaped += len(carts)
+            items_deleted += deleted
+            for cart in carts:
+                if cart_store:
+                    await cart_store.evict(cart_store.key_for(cart.user_id, cart.session_id))
+                # Displays still open on an abandoned cart show it closed
+                await cart_events.publish(cart.id, {"type": "cart.expired"})
+            if len(carts) < self.batch_size:
+                break
+
+        holds_purged = await self._purge(
+            lambda: reservation_repo.purge_expired(db, limit=self.batch_size), db
+        )
+        keys_purged = await self._purge(
+            lambda: idempotency_store.purge_expired(db, limit=self.batch_size), db
+        )
+        processed_before = datetime.utcnow() - self.event_retention
+        events_purged = await self._purge(
+            lambda: webhook_event_repo.purge_processed(
+                db, processed_before=processed_before, limit=self.batch_size
+            ), db
+        )
+
+        duration = time.monotonic() - started
+        report = {
+            "idle_since": idle_since.isoformat(),
+            "batches": batches,
+            "carts_reaped": carts_reaped,
+            "items_deleted": items_deleted,
+            "holds_purged": holds_purged,
+            "keys_purged": keys_purged,
+            "events_purged": events_purged,
+            "duration_seconds": round(duration, 3),
+            "carts_per_second": round(carts_reaped / duration, 1) if duration else 0.0
+        }
+
+        self.runs += 1
+        self.carts_reaped += carts_reaped
+        self.items_deleted += items_deleted
+        self.holds_purged += holds_purged
+        self.keys_purged += keys_purged
+        self.events_purged += events_purged
+        self.last_run = report
+        if carts_reaped:
+            logger.info(
+                f"Cart reaper deactivated {carts_reaped} carts and deleted {items_deleted} "
+                f"items in {report['duration_seconds']}s"
+            )
+        return report
+
+    async def _purge(self, purge_batch: Callable[[], Awaitable[int]], db: AsyncSession) -> int:
+        """Run a batched purge until a batch comes back short, committing each"""
+        total = 0
+        while True:
+            purged = await purge_batch()
+            await db.commit()
+            total += purged
+            if purged < self.batch_size:
+                return total
+
+    def start(self, session_factory: Callable[[], Awaitable[AsyncSession]]) -> None:
+        """Run the reaper every `interval` seconds on the current event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever(session_factory))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self, session_factory: Callable[[], Awaitable[AsyncSession]]) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            db = await session_factory()
+            try:
+                await self.reap(db)
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Cart reaper failed: {str(e)}")
+            finally:
+                await db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "idle_ttl_minutes": self.idle_ttl.total_seconds() / 60,
+            "runs": self.runs,
+            "carts_reaped": self.carts_reaped,
+            "items_deleted": self.items_deleted,
+            "holds_purged": self.holds_purged,
+            "keys_purged": self.keys_purged,
+            "events_purged": self.events_purged,
+            "last_run": self.last_run
+        }
+
+
+cart_reaper = CartReaper(
+    idle_ttl=timedelta(minutes=settings.CART_IDLE_TTL_MINUTES),
+    batch_size=settings.CART_REAPER_BATCH_SIZE,
+    interval=settings.CART_REAPER_INTERVAL_SECONDS,
+    event_retention=timedelta(days=settings.PAYMENT_WEBHOOK_RETENTION_DAYS)
+)
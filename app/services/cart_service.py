@@ -1,19 +1,30 @@
-from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional, Dict, Any, List
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 from fastapi import Depends
-from app.db.repositories import cart_repo, product_repo, inventory_repo
+from app.core.config import settings
+from app.core.security import create_access_token, decode_token
+from app.db.cart_store import CartStore, StoredCart, StoredCartItem, cart_store
+from app.db.repositories import cart_repo, product_repo, reservation_repo
 from app.db.session import get_db
-from app.models.schemas import CartItemCreate
+from app.models.schemas import CartItemCreate, CartItemUpdate
+from app.services.cart_events import cart_events
 from app.services.exceptions import (
     InsufficientStockError,
     AgeVerificationError,
     CartValidationError
 )
-from app.models.db_models import Cart, CartItem, Product, AgeRestriction
+from app.models.db_models import Cart, Product, AgeRestriction
+
+# Marks tokens that open a cart's event socket, and nothing else
+EVENTS_TOKEN_SCOPE = "cart_events"
 
 class CartService:
-    def __init__(self, db_session: AsyncSession):
+    def __init__(self, db_session: AsyncSession, store: Optional[CartStore] = cart_store):
         self.db = db_session
+        self.store = store
 
     async def get_or_create_cart(
         self, 
@@ -21,6 +32,9 @@ class CartService:
         session_id: Optional[str] = None
     ) -> Cart:
         """Get existing active cart or create new one"""
+        if self.store and (user_id or session_id):
+            return await self._get_stored_cart(user_id, session_id)
+
         if user_id:
             cart = await cart_repo.get_by_user(self.db, user_id=user_id)
         elif session_id:
@@ -31,45 +45,371 @@ class CartService:
         if not cart:
             cart_data = {"user_id": user_id} if user_id else {"session_id": session_id}
             cart = await cart_repo.create(self.db, obj_in=cart_data)
+            # A new cart has no items; say so instead of leaving a lazy load behind
+            set_committed_value(cart, "items", [])
         
         return cart
 
-    async def add_item_to_cart(
+    async def add_item(
         self,
-        cart_id: int,
         item_data: CartItemCreate,
+        user_id: Optional[int] = None,
+        session_id: Optional[str] = None,
         skip_stock_check: bool = False
-    ) -> CartItem:
-        """Add item to cart with validation"""
-        # Get product and validate
+    ) -> Cart:
+        """Add item to the owner's cart and return the updated cart.
+
+        The happy path is one upsert statement plus one reload; the lookups
+        below only run to explain why nothing was written.
+        """
+        if not user_id and not session_id:
+            raise CartValidationError("Either user_id or session_id must be provided")
+
+        added = {item_data.product_id: item_data.quantity}
+        if self.store:
+            cart = await self._add_stored_item(item_data, user_id, session_id, skip_stock_check)
+            await self._publish_lines(cart, added)
+            return cart
+
+        for _ in range(2):
+            cart_id = await cart_repo.upsert_item(
+                self.db,
+                product_id=item_data.product_id,
+                quantity=item_data.quantity,
+                user_id=user_id,
+                session_id=session_id,
+                check_stock=not skip_stock_check
+            )
+            if cart_id is not None:
+                cart = await cart_repo.get_with_items(self.db, cart_id)
+                await self.db.commit()
+                await self._publish_lines(cart, added)
+                return cart
+
+            if user_id:
+                cart = await cart_repo.get_by_user(self.db, user_id=user_id)
+            else:
+                cart = await cart_repo.get_by_session(self.db, session_id=session_id)
+            if not cart:
+                # First scan of the session: open the cart and try again
+                await self.get_or_create_cart(user_id=user_id, session_id=session_id)
+                continue
+
+            product = await product_repo.get(self.db, id=item_data.product_id)
+            if not product:
+                raise CartValidationError(f"Product {item_data.product_id} not found")
+
+            in_cart = next(
+                (item.quantity for item in cart.items if item.product_id == product.id), 0
+            )
+            available = await reservation_repo.get_available(
+                self.db, product.id, exclude_cart_id=cart.id
+            )
+            raise InsufficientStockError(
+                product_id=product.id,
+                available=max(available - in_cart, 0),
+                requested=item_data.quantity
+            )
+
+        raise CartValidationError("Failed to add item to cart")
+
+    async def add_items(
+        self,
+        items: List[CartItemCreate],
+        user_id: Optional[int] = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Add a burst of scans with one stock query, one upsert and one commit.
+
+        Lines are checked in order against the stock not held by other carts,
+        less the cart's current contents and the lines accepted before them;
+        failed lines are reported instead of failing the whole batch.
+        """
+        cart = await self.get_or_create_cart(user_id=user_id, session_id=session_id)
+        in_cart = {item.product_id: item.quantity for item in cart.items}
+
+        product_ids = list({item.product_id for item in items})
+        stock = {
+            product.id: (product, quantity, sellable)
+            for product, quantity, sellable in await product_repo.lookup_with_stock(
+                self.db,
+                barcodes=[],
+                ids=product_ids,
+                net_of_holds=True,
+                exclude_cart_id=cart.id
+            )
+        }
+
+        results = []
+        accepted: Dict[int, Dict[str, Any]] = {}
+        for item in items:
+            if item.product_id not in stock:
+                results.append({
+                    "product_id": item.product_id,
+                    "quantity": item.quantity,
+                    "added": False,
+                    "error": f"Product {item.product_id} not found"
+                })
+                continue
+
+            product, on_hand, sellable = stock[item.product_id]
+            if not sellable:
+                results.append({
+                    "product_id": product.id,
+                    "quantity": item.quantity,
+                    "added": False,
+                    "error": f"Product {product.id} is not for sale"
+                })
+                continue
+
+            line = accepted.get(product.id)
+            reserved = in_cart.get(product.id, 0) + (line["quantity"] if line else 0)
+            if on_hand < reserved + item.quantity:
+                exc = InsufficientStockError(
+                    product_id=product.id,
+                    available=max(on_hand - reserved, 0),
+                    requested=item.quantity
+                )
+                results.append({
+                    "product_id": product.id,
+                    "quantity": item.quantity,
+                    "added": False,
+                    "error": str(exc),
+                    "available": exc.available
+                })
+                continue
+
+            if line:
+                line["quantity"] += item.quantity
+            else:
+                accepted[product.id] = {
+                    "product_id": product.id,
+                    "quantity": item.quantity,
+                    "price_at_addition": product.current_price,
+                    "tax_rate": product.tax_rate or Decimal(0)
+                }
+            results.append({"product_id": product.id, "quantity": item.quantity, "added": True})
+
+        if self.store:
+            cart = await self._add_stored_lines(cart, list(accepted.values()))
+        elif accepted:
+            await cart_repo.upsert_items(self.db, cart_id=cart.id, lines=list(accepted.values()))
+            cart = await cart_repo.get_with_items(self.db, cart.id)
+            await self.db.commit()
+
+        if accepted:
+            await self._publish_lines(
+                cart, {pid: line["quantity"] for pid, line in accepted.items()}
+            )
+        return {"cart": cart, "results": results}
+
+    async def _publish_lines(self, cart: Cart, added: Dict[int, int]) -> None:
+        """Push the lines that changed, and the new totals, to the cart's displays"""
+        quantities = {item.product_id: item.quantity for item in cart.items}
+        await cart_events.publish(cart.id, {
+            "type": "cart.updated",
+            "changes": [
+                {
+                    "product_id": product_id,
+                    "quantity": quantities.get(product_id),
+                    "delta": delta,
+                    "change": (
+                        "removed" if product_id not in quantities
+                        else "added" if quantities[product_id] == delta
+                        else "quantity_changed"
+                    )
+                }
+                for product_id, delta in added.items()
+            ],
+            "totals": cart_repo.totals_of(cart)
+        })
+
+    def events_token(self, cart: Cart) -> str:
+        """Short-lived signed token that opens the cart's event socket"""
+        return create_access_token(
+            {
+                "scope": EVENTS_TOKEN_SCOPE,
+                "cart_id": cart.id,
+                "user_id": cart.user_id,
+                "session_id": cart.session_id
+            },
+            expires_delta=timedelta(seconds=settings.CART_EVENTS_TOKEN_TTL_SECONDS)
+        )
+
+    async def authorize_events(self, token: str) -> Optional[int]:
+        """Id of the cart an events token was issued for, if the token is
+        genuine and unexpired and the cart is still open under the owner it
+        was issued to. Closes the session, as the socket outlives the check."""
+        claims = decode_token(token)
+        if not claims or claims.get("scope") != EVENTS_TOKEN_SCOPE:
+            return None
+        try:
+            cart = await cart_repo.get(self.db, id=claims.get("cart_id"))
+        finally:
+            await self.db.close()
+        if (
+            cart is None
+            or not cart.is_active
+            or cart.user_id != claims.get("user_id")
+            or cart.session_id != claims.get("session_id")
+        ):
+            return None
+        return cart.id
+
+    async def _get_stored_cart(
+        self,
+        user_id: Optional[int],
+        session_id: Optional[str]
+    ) -> StoredCart:
+        key = self.store.key_for(user_id, session_id)
+        cart = await self.store.get(key)
+        if cart is None:
+            if user_id:
+                db_cart = await cart_repo.get_by_user(self.db, user_id=user_id)
+            else:
+                db_cart = await cart_repo.get_by_session(self.db, session_id=session_id)
+
+            if db_cart:
+                cart = StoredCart.from_cart(db_cart)
+            else:
+                cart_data = {"user_id": user_id} if user_id else {"session_id": session_id}
+                db_cart = await cart_repo.create(self.db, obj_in=cart_data)
+                cart = StoredCart(
+                    id=db_cart.id,
+                    user_id=db_cart.user_id,
+                    session_id=db_cart.session_id,
+                    created_at=db_cart.created_at,
+                    updated_at=db_cart.updated_at
+                )
+            cart = await self.store.add(key, cart)
+        return cart
+
+    async def _add_stored_item(
+        self,
+        item_data: CartItemCreate,
+        user_id: Optional[int],
+        session_id: Optional[str],
+        skip_stock_check: bool
+    ) -> StoredCart:
+        """Scan into the cart store without touching the database beyond
+        reads; the line and its stock hold are written on the next flush"""
+        cart = await self._get_stored_cart(user_id, session_id)
         product = await product_repo.get(self.db, id=item_data.product_id)
         if not product:
             raise CartValidationError(f"Product {item_data.product_id} not found")
-        
-        # Check inventory
+        if not product_repo.is_sellable(product):
+            raise CartValidationError(f"Product {product.id} is not for sale")
+
         if not skip_stock_check:
-            inventory = await inventory_repo.get_by_product(self.db, product_id=product.id)
-            if not inventory or inventory.quantity < item_data.quantity:
-                available = inventory.quantity if inventory else 0
+            line = cart.lines.get(product.id)
+            in_cart = line.quantity if line else 0
+            available = await reservation_repo.get_available(
+                self.db, product.id, exclude_cart_id=cart.id
+            )
+            if available < in_cart + item_data.quantity:
                 raise InsufficientStockError(
                     product_id=product.id,
-                    available=available,
+                    available=max(available - in_cart, 0),
                     requested=item_data.quantity
                 )
-        
-        # Add item to cart
-        try:
-            return await cart_repo.add_item_to_cart(
-                db=self.db,
-                cart_id=cart_id,
-                product_id=product.id,
-                quantity=item_data.quantity
+
+        return await self._add_stored_lines(cart, [{
+            "product_id": product.id,
+            "quantity": item_data.quantity,
+            "price_at_addition": product.current_price,
+            "tax_rate": product.tax_rate or Decimal(0)
+        }])
+
+    async def _add_stored_lines(self, cart: StoredCart, lines: List[Dict[str, Any]]) -> StoredCart:
+        """Add lines to a stored cart in one atomic update, so scans racing
+        on other workers are not lost"""
+        def add(cart: StoredCart) -> None:
+            now = datetime.utcnow()
+            for line in lines:
+                existing = cart.lines.get(line["product_id"])
+                if existing:
+                    existing.quantity += line["quantity"]
+                else:
+                    cart.lines[line["product_id"]] = StoredCartItem(added_at=now, **line)
+            cart.updated_at = now
+
+        key = self.store.key_for(cart.user_id, cart.session_id)
+        for _ in range(2):
+            updated = await self.store.update(key, add)
+            if updated is not None:
+                return updated
+            # Evicted since it was read; load it again and retry
+            await self._get_stored_cart(cart.user_id, cart.session_id)
+        raise CartValidationError("Failed to add item to cart")
+
+    async def _store_key(self, cart_id: int) -> Optional[str]:
+        """Cart store key of a cart, from the owner on its row"""
+        cart = await cart_repo.get(self.db, id=cart_id)
+        return self.store.key_for(cart.user_id, cart.session_id) if cart else None
+
+    async def flush_cart(self, cart_id: int) -> None:
+        """Make the stored state of a cart durable before reading cart rows"""
+        if not self.store:
+            return
+        key = await self._store_key(cart_id)
+        if key:
+            async with self.store.lock(key):
+                await self.store.flush(self.db, [key])
+
+    async def _take_from_store(self, cart_id: int) -> None:
+        """Flush a stored cart and forget it, before changing its rows directly"""
+        if not self.store:
+            return
+        key = await self._store_key(cart_id)
+        if key:
+            async with self.store.lock(key):
+                await self.store.flush(self.db, [key])
+            await self.store.evict(key)
+
+    async def update_cart_item(self, cart_id: int, item_id: int, item_data: CartItemUpdate) -> Cart:
+        """Set a line's quantity; its stock hold follows in the same transaction"""
+        await self._take_from_store(cart_id)
+        line = await cart_repo.get_item(self.db, cart_id=cart_id, item_id=item_id)
+        if not line:
+            raise CartValidationError("Cart item not found")
+
+        product_id, delta = line.product_id, item_data.quantity - line.quantity
+        if delta > 0:
+            available = await reservation_repo.get_available(
+                self.db, product_id, exclude_cart_id=cart_id
             )
-        except Exception as e:
-            raise CartValidationError(f"Failed to add item to cart: {str(e)}")
+            if available < item_data.quantity:
+                raise InsufficientStockError(
+                    product_id=product_id,
+                    available=max(available - line.quantity, 0),
+                    requested=delta
+                )
+
+        await cart_repo.set_item_quantity(
+            self.db, cart_id=cart_id, item_id=item_id, quantity=item_data.quantity
+        )
+        cart = await cart_repo.get_with_items(self.db, cart_id)
+        await self.db.commit()
+        if delta:
+            await self._publish_lines(cart, {product_id: delta})
+        return cart
+
+    async def remove_item_from_cart(self, cart_id: int, item_id: int) -> Cart:
+        """Delete a line and release its stock hold in the same transaction"""
+        await self._take_from_store(cart_id)
+        removed = await cart_repo.delete_items(self.db, cart_id=cart_id, item_ids=[item_id])
+        if not removed:
+            raise CartValidationError("Cart item not found")
+        cart = await cart_repo.get_with_items(self.db, cart_id)
+        await self.db.commit()
+        await self._publish_lines(
+            cart, {product_id: -quantity for product_id, quantity in removed.items()}
+        )
+        return cart
 
     async def verify_age_restrictions(self, cart_id: int) -> bool:
         """Check if cart contains age-restricted items"""
+        await self.flush_cart(cart_id)
         cart = await cart_repo.get_by_id(
             self.db, 
             id=cart_id, 
@@ -88,83 +428,128 @@ class CartService:
         return len(restricted_items) > 0
 
     async def calculate_cart_totals(self, cart_id: int) -> Dict[str, Any]:
-        """Calculate subtotal, tax, and total for cart"""
-        return await cart_repo.calculate_cart_total(self.db, cart_id=cart_id)
+        """Subtotal, tax, and total for cart from its running totals"""
+        await self.flush_cart(cart_id)
+        totals = await cart_repo.get_totals(self.db, cart_id=cart_id)
+        if totals is None:
+            raise CartValidationError("Cart not found")
+        return totals
+
+    async def get_cart_totals(
+        self,
+        user_id: Optional[int] = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Totals of the owner's active cart; an owner without one has an empty cart"""
+        if not user_id and not session_id:
+            raise CartValidationError("Either user_id or session_id must be provided")
+
+        if self.store:
+            cart = await self.get_or_create_cart(user_id=user_id, session_id=session_id)
+            return await self.calculate_cart_totals(cart.id)
+
+        totals = await cart_repo.get_totals_by_owner(
+            self.db, user_id=user_id, session_id=session_id
+        )
+        return totals or {"subtotal": 0, "tax": 0, "total": 0, "item_count": 0}
+
+    async def check_totals(self, fix: bool = False, batch_size: int = 1000) -> Dict[str, Any]:
+        """Compare every active cart's running totals with its lines, batch
+        by batch, optionally recomputing the ones that drifted"""
+        checked = 0
+        drifted: List[int] = []
+        after_id = 0
+        while True:
+            scanned, cart_ids = await cart_repo.find_inconsistent_totals(
+                self.db, after_id=after_id, limit=batch_size
+            )
+            if not scanned:
+                break
+            checked += len(scanned)
+            after_id = scanned[-1]
+            drifted.extend(cart_ids)
+            if fix and cart_ids:
+                await cart_repo.refresh_totals(self.db, cart_ids)
+                await self.db.commit()
+        return {"checked": checked, "drifted": len(drifted), "cart_ids": drifted, "fixed": fix}
+
+    async def evict_cart(self, cart_id: int) -> None:
+        """Drop a cart from the cart store, if it is kept there"""
+        if not self.store:
+            return
+        key = await self._store_key(cart_id)
+        if key:
+            await self.store.evict(key)
 
     async def clear_cart(self, cart_id: int) -> None:
         """Remove all items from cart"""
-        cart = await cart_repo.get_by_id(self.db, id=cart_id, load_items=True)
+        await self.evict_cart(cart_id)
+        cart = await cart_repo.get(self.db, id=cart_id)
         if not cart:
             raise CartValidationError("Cart not found")
-        
-        for item in cart.items:
-            await cart_repo.delete_item(self.db, item_id=item.id)
-        
+
+        await cart_repo.delete_items(self.db, cart_id=cart_id)
+        # Also drops holds of stored lines that never reached cart_items
+        await reservation_repo.release_carts(self.db, [cart_id])
+        cart = await cart_repo.get_with_items(self.db, cart_id)
         await self.db.commit()
 
+        await cart_events.publish(cart.id, {
+            "type": "cart.cleared",
+            "totals": cart_repo.totals_of(cart)
+        })
+
     async def merge_carts(
         self, 
         source_session_id: str, 
         target_user_id: int
     ) -> Cart:
         """Merge guest cart with user cart after login"""
-        # Get both carts
-        guest_cart = await cart_repo.get_by_session(
-            self.db, 
-            session_id=source_session_id,
-            load_items=True
-        )
-        user_cart = await cart_repo.get_by_user(
+        if self.store:
+            keys = [
+                self.store.key_for(session_id=source_session_id),
+                self.store.key_for(user_id=target_user_id)
+            ]
+            await self.store.flush(self.db, keys)
+            for key in keys:
+                await self.store.evict(key)
+
+        guest_id, user_cart_id = await cart_repo.get_merge_pair(
             self.db,
-            user_id=target_user_id,
-            load_items=True
+            session_id=source_session_id,
+            user_id=target_user_id
         )
-        
-        if not guest_cart:
-            return user_cart or await self.get_or_create_cart(user_id=target_user_id)
-        
-        # If no user cart exists, just assign the guest cart to the user
-        if not user_cart:
-            guest_cart.user_id = target_user_id
-            guest_cart.session_id = None
-            await self.db.commit()
-            await self.db.refresh(guest_cart)
-            return guest_cart
-        
-        # Merge items from guest cart to user cart
-        for guest_item in guest_cart.items:
-            existing_item = next(
-                (item for item in user_cart.items 
-                 if item.product_id == guest_item.product_id),
-                None
-            )
-            
-            if existing_item:
-                existing_item.quantity += guest_item.quantity
-            else:
-                await cart_repo.add_item_to_cart(
-                    db=self.db,
-                    cart_id=user_cart.id,
-                    product_id=guest_item.product_id,
-                    quantity=guest_item.quantity
-                )
-        
-        # Delete guest cart
-        await cart_repo.delete(self.db, id=guest_cart.id)
+
+        if not guest_id:
+            if not user_cart_id:
+                return await self.get_or_create_cart(user_id=target_user_id)
+            return await cart_repo.get_with_items(self.db, user_cart_id)
+
+        if user_cart_id:
+            # One INSERT ... SELECT ... ON CONFLICT moves every guest line
+            await cart_repo.merge_into(self.db, source_id=guest_id, target_id=user_cart_id)
+        else:
+            # If no user cart exists, just assign the guest cart to the user
+            await cart_repo.assign_to_user(self.db, cart_id=guest_id, user_id=target_user_id)
+            user_cart_id = guest_id
+
+        cart = await cart_repo.get_with_items(self.db, user_cart_id)
         await self.db.commit()
-        
-        return await cart_repo.get_by_user(
-            self.db, 
-            user_id=target_user_id,
-            load_items=True
-        )
+
+        # Displays of the guest cart follow it to the cart it became part of
+        merged = {"type": "cart.merged", "merged_into": cart.id, "totals": cart_repo.totals_of(cart)}
+        await cart_events.publish(guest_id, merged)
+        if cart.id != guest_id:
+            await cart_events.publish(cart.id, merged)
+        return cart
 
     # Transaction-related methods
     async def get_user_transactions(
         self,
         user_id: int,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
     ):
         """Get user's transaction history"""
         from app.db.repositories import transaction_repo
@@ -172,7 +557,8 @@ class CartService:
             self.db,
             user_id=user_id,
             skip=skip,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
 
     async def get_transaction(self, transaction_id: int):
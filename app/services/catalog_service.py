@@ -0,0 +1,144 @@
+import asyncio
+import gzip
+import io
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.repositories import product_repo
+from app.models.db_models import AgeRestriction, ProductCategory, ProductStatus
+from app.utils.cache import TTLCache
+
+@dataclass
+class CatalogSnapshot:
+    version: int
+    product_count: int
+    body: bytes  # gzip-compressed JSON document
+
+    @property
+    def etag(self) -> str:
+        return f'"catalog-{self.version}"'
+
+
+class CatalogService:
+    # Built snapshots are shared by every request in the worker
+    _snapshots = TTLCache(maxsize=2, ttl=settings.CATALOG_SNAPSHOT_TTL_SECONDS)
+    _build_lock = asyncio.Lock()
+
+    def __init__(self, db_session: AsyncSession):
+        self.db = db_session
+
+    async def get_version(self) -> int:
+        """Current catalog version; every product write bumps it in the
+        same transaction, and versions commit in order"""
+        return await product_repo.get_catalog_version(self.db)
+
+    async def get_snapshot(self, version: Optional[int] = None) -> CatalogSnapshot:
+        """Compressed full listing of active products at the current version"""
+        if version is None:
+            version = await self.get_version()
+
+        snapshot = self._snapshots.get(version)
+        if snapshot is not None:
+            return snapshot
+
+        async with self._build_lock:
+            # Another request may have built it while we waited
+            snapshot = self._snapshots.get(version)
+            if snapshot is None:
+                snapshot = await self._build_snapshot(version)
+                self._snapshots.set(version, snapshot)
+        return snapshot
+
+    async def get_changes(self, since: int, version: Optional[int] = None) -> Dict[str, Any]:
+        """Products written after version `since`, including ones that left
+        the active catalog, plus the ids of products deleted since. Oversized
+        deltas, and versions this catalog never issued, ask the terminal to
+        re-snapshot."""
+        if version is None:
+            version = await self.get_version()
+
+        reset = {"since": since, "version": version, "reset": True, "products": [], "deleted": []}
+        if since > version:
+            return reset
+        if since == version:
+            return {"since": since, "version": version, "reset": False, "products": [], "deleted": []}
+
+        max_rows = settings.CATALOG_DELTA_MAX_ROWS
+        deleted = await product_repo.get_deleted_since(self.db, since, limit=max_rows + 1)
+        if len(deleted) > max_rows:
+            return reset
+
+        latest = max([version] + [deleted_version for _, deleted_version in deleted])
+        products: List[Dict[str, Any]] = []
+        async for row in product_repo.stream_catalog(
+            self.db,
+            changed_since=since,
+            limit=max_rows + 1
+        ):
+            if len(products) + len(deleted) == max_rows:
+                return reset
+            products.append(self._serialize(row))
+            latest = max(latest, row.catalog_version)
+
+        return {
+            "since": since,
+            "version": latest,
+            "reset": False,
+            "products": products,
+            "deleted": [product_id for product_id, _ in deleted]
+        }
+
+    async def get_facets(self) -> Dict[str, Any]:
+        """Product counts by category, status and age restriction"""
+        counts = await product_repo.get_facet_counts(self.db)
+        facets: Dict[str, Any] = {}
+        for facet, enum in (
+            ("category", ProductCategory),
+            ("status", ProductStatus),
+            ("age_restriction", AgeRestriction)
+        ):
+            stored = counts.get(facet, {})
+            facets[facet] = {member.value: stored.get(member.name, 0) for member in enum}
+        # Category is the one facet every product has; status may be NULL
+        facets["total"] = sum(facets["category"].values())
+        return facets
+
+    async def rebuild_facets(self) -> Dict[str, Any]:
+        """Recompute the stored facet counts from products and return the
+        facets they now give"""
+        rows = await product_repo.rebuild_facet_counts(self.db)
+        await self.db.commit()
+        return {"rows": rows, "facets": await self.get_facets()}
+
+    async def _build_snapshot(self, version: int) -> CatalogSnapshot:
+        buffer = io.BytesIO()
+        count = 0
+        with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=6) as stream:
+            stream.write(f'{{"version":{version},"products":['.encode())
+            async for row in product_repo.stream_catalog(self.db, active_only=True):
+                if count:
+                    stream.write(b",")
+                stream.write(json.dumps(self._serialize(row), separators=(",", ":")).encode())
+                count += 1
+            stream.write(b"]}")
+
+        return CatalogSnapshot(version=version, product_count=count, body=buffer.getvalue())
+
+    def _serialize(self, row: Any) -> Dict[str, Any]:
+        return {
+            "id": row.id,
+            "barcode": row.barcode,
+            "sku": row.sku,
+            "name": row.name,
+            "category": row.category.value if row.category else None,
+            "status": row.status.value if row.status else None,
+            "age_restriction": row.age_restriction.value if row.age_restriction else None,
+            "current_price": str(row.current_price),
+            "tax_rate": str(row.tax_rate) if row.tax_rate is not None else None,
+            "is_weighted": row.is_weighted,
+            "requires_serial_number": row.requires_serial_number,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+            "version": row.catalog_version
+        }
@@ -0,0 +1,181 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.cart_store import CartStore, cart_store
+from app.db.repositories import (
+    cart_repo,
+    inventory_repo,
+    payment_repo,
+    reservation_repo,
+    transaction_repo
+)
+from app.models.db_models import Payment, PaymentMethod, PaymentStatus
+from app.services.cart_events import cart_events
+from app.services.cart_service import CartService
+from app.services.payment_gateway import ChargeRequest, payment_reference
+from app.services.payment_queue import PaymentJob, PaymentQueue, payment_queue
+from app.services.payment_service import PaymentService
+from app.services.exceptions import CartValidationError, InsufficientStockError
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutService:
+    def __init__(
+        self,
+        db_session: AsyncSession,
+        store: Optional[CartStore] = cart_store,
+        queue: Optional[PaymentQueue] = payment_queue
+    ):
+        self.db = db_session
+        self.carts = CartService(db_session, store=store)
+        self.payments = PaymentService(db_session)
+        self.queue = queue
+
+    async def checkout(
+        self,
+        payment_method: PaymentMethod,
+        payment_details: Dict[str, Any],
+        user_id: Optional[int] = None,
+        session_id: Optional[str] = None,
+        before_commit: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """Turn the owner's cart into a transaction awaiting payment in one
+        database transaction, then charge it.
+
+        Claiming the cart, copying its lines, taking them out of stock,
+        releasing its holds and recording a pending payment take the same
+        handful of statements whatever the basket size, and are committed
+        once; any failure rolls all of it back and leaves the cart open.
+
+        The gateway is only called after that commit, so no cart or stock
+        rows stay locked during its round trip. With the payment queue
+        running the charge happens in the background and its outcome is
+        pushed to the cart's displays; otherwise it happens here and is
+        settled in a second transaction. Either way an approval completes the
+        transaction and a decline unwinds it, and the payment status
+        endpoint serves the outcome. `before_commit` is awaited with the
+        result just before each commit, to record it in the same
+        transaction.
+        """
+        if not user_id and not session_id:
+            raise CartValidationError("Either user_id or session_id must be provided")
+
+        if self.carts.store:
+            stored = await self.carts.get_or_create_cart(user_id=user_id, session_id=session_id)
+            await self.carts.flush_cart(stored.id)
+
+        try:
+            cart = await cart_repo.close_for_checkout(
+                self.db, user_id=user_id, session_id=session_id
+            )
+            if cart is None or not cart.item_count:
+                raise CartValidationError("Cart is empty")
+
+            transaction = await transaction_repo.create_from_cart(
+                self.db,
+                cart_id=cart.id,
+                user_id=cart.user_id,
+                payment_method=payment_method,
+                subtotal=cart.subtotal,
+                tax_amount=cart.tax_amount
+            )
+
+            deducted = await inventory_repo.deduct_cart_lines(self.db, cart.id)
+            if len(deducted) < cart.item_count:
+                await self.db.rollback()
+                short = await inventory_repo.get_short_lines(self.db, cart.id)
+                product_id, available, requested = short[0] if short else (None, 0, 0)
+                raise InsufficientStockError(
+                    product_id=product_id,
+                    available=available,
+                    requested=requested
+                )
+            await reservation_repo.release_carts(self.db, [cart.id])
+
+            # A payment charged here starts out claimed by this request
+            queued = self.queue is not None and self.queue.running
+            payment = Payment(
+                transaction_id=transaction.id,
+                amount=transaction.total_amount,
+                method=payment_method,
+                status=PaymentStatus.PENDING if queued else PaymentStatus.PROCESSING,
+                last_four_digits=payment_details.get("last_four_digits")
+            )
+            self.db.add(payment)
+            await self.db.flush()
+
+            result = await self._result(transaction.id, payment)
+            if before_commit is not None:
+                await before_commit(result)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        inventory_repo.invalidate_cache(None)
+        await self.carts.evict_cart(cart.id)
+
+        # Charge before anything else can fail and strand the pending payment
+        job = PaymentJob(
+            payment_id=payment.id,
+            transaction_id=transaction.id,
+            amount=payment.amount,
+            method=payment.method,
+            last_four_digits=payment.last_four_digits,
+            cart_id=cart.id,
+            claimed=not queued
+        )
+        if queued:
+            await self.queue.enqueue(job)
+        else:
+            result = await self._charge_now(job, before_commit) or result
+
+        await cart_events.publish(cart.id, {
+            "type": "cart.checked_out",
+            "transaction_id": transaction.id
+        })
+
+        logger.info(
+            f"Checked out cart {cart.id} as transaction {transaction.id} "
+            f"({cart.item_count} lines, {transaction.total_amount})"
+        )
+        return result
+
+    async def _charge_now(
+        self,
+        job: PaymentJob,
+        before_commit: Optional[Callable[[Dict[str, Any]], Awaitable[None]]]
+    ) -> Optional[Dict[str, Any]]:
+        """Charge a checked-out payment in this request and settle it; None
+        if its outcome is unknown, handing it back to pending"""
+        try:
+            charge = await self.payments.gateway.charge(ChargeRequest(
+                reference=payment_reference(job.payment_id),
+                amount=job.amount,
+                method=job.method,
+                last_four_digits=job.last_four_digits
+            ))
+        except Exception as e:
+            logger.error(f"Payment {job.payment_id} unresolved: {str(e)}; handing it back to pending")
+            await payment_repo.release(self.db, [job.payment_id])
+            await self.db.commit()
+            return None
+
+        settled: List[Dict[str, Any]] = []
+
+        async def record(payment: Payment) -> None:
+            settled.append(await self._result(job.transaction_id, payment))
+            if before_commit is not None:
+                await before_commit(settled[0])
+
+        if await self.payments.settle(job.payment_id, job.transaction_id, charge, before_commit=record) is None:
+            return None
+        return settled[0]
+
+    async def _result(self, transaction_id: int, payment: Payment) -> Dict[str, Any]:
+        return {
+            "transaction": await transaction_repo.get_with_items(self.db, transaction_id),
+            "payment": payment,
+            "receipt_number": payment.receipt_number
+        }
@@ -24,3 +24,16 @@ class PaymentProcessingError(ServiceException):
 class CartValidationError(ServiceException):
     """Raised when cart validation fails"""
     pass
+
+class IdempotencyKeyError(ServiceException):
+    """Raised when an Idempotency-Key is reused for a different request or
+    its first request is still running"""
+    pass
+
+class WebhookSignatureError(ServiceException):
+    """Raised when a webhook's signature does not match its body"""
+    pass
+
+class WebhookBacklogError(ServiceException):
+    """Raised when webhooks arrive faster than they can be applied"""
+    pass
@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.repositories import idempotency_repo
+from app.services.exceptions import IdempotencyKeyError
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Records a response on the request's session; called by the executing
+# request just before it commits its own writes
+Record = Callable[[int, bytes], Awaitable[None]]
+# Hands a service's result to be recorded before the service commits
+BeforeCommit = Callable[[Any], Awaitable[None]]
+
+
+@dataclass
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: bytes
+
+
+class IdempotencyStore:
+    """Replays the recorded response of requests retried with the same
+    Idempotency-Key instead of running them again.
+
+    Outcomes are kept in idempotency_keys behind an in-process LRU. The
+    executing request records its response in the same transaction as its
+    writes, so a key is never left open over committed work nor completed
+    for work that rolled back. A duplicate that arrives while the first
+    request is running waits for it: on the same worker through a shared
+    future, on another worker by polling the row.
+    """
+
+    def __init__(self, ttl: timedelta, cache_size: int, wait_timeout: float, lock_timeout: timedelta):
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.lock_timeout = lock_timeout
+        self._cache = TTLCache(maxsize=cache_size, ttl=ttl.total_seconds())
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.replayed = 0
+        self.waited = 0
+
+    @staticmethod
+    def fingerprint(request: Request, body: bytes) -> str:
+        """Hash of everything that makes a retry the same request"""
+        digest = hashlib.sha256()
+        for part in (
+            request.method,
+            request.url.path,
+            request.url.query,
+            request.headers.get("x-session-id", ""),
+            request.headers.get("x-user-id", "")
+        ):
+            digest.update(part.encode() + b"\0")
+        digest.update(body)
+        return digest.hexdigest()
+
+    async def run(
+        self,
+        db: AsyncSession,
+        *,
+        scope: str,
+        key: str,
+        request_hash: str,
+        execute: Callable[[Record], Awaitable[tuple[int, bytes]]]
+    ) -> tuple[StoredResponse, bool]:
+        """Execute the request once per key and return its response, and
+        whether it is a replay. `execute` is given a callback to record its
+        response before it commits; a response it returns without having
+        recorded one is recorded afterwards. Exceptions are not recorded,
+        so the client can retry them."""
+        cache_key = (scope, key)
+        deadline = time.monotonic() + self.wait_timeout
+        poll = 0.05
+
+        while True:
+            stored = self._cache.get(cache_key)
+            if stored is not None:
+                return self._replay(stored, request_hash), True
+
+            pending = self._inflight.get(cache_key)
+            if pending is not None:
+                self.waited += 1
+                try:
+                    stored = await asyncio.wait_for(
+                        asyncio.shield(pending), max(deadline - time.monotonic(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    raise IdempotencyKeyError("A request with this Idempotency-Key is still in progress")
+                if stored is None:
+                    # The first attempt failed without a response; run it ourselves
+                    continue
+                return self._replay(stored, request_hash), True
+
+            pending = asyncio.get_running_loop().create_future()
+            self._inflight[cache_key] = pending
+            outcome = None
+            try:
+                outcome = await self._claim_and_execute(
+                    db, scope=scope, key=key, request_hash=request_hash, execute=execute
+                )
+            finally:
+                del self._inflight[cache_key]
+                pending.set_result(outcome[0] if outcome else None)
+
+            if outcome is None:
+                # Running on another worker
+                if time.monotonic() + poll > deadline:
+                    raise IdempotencyKeyError("A request with this Idempotency-Key is still in progress")
+                await asyncio.sleep(poll)
+                poll = min(poll * 2, 1.0)
+                continue
+
+            stored, executed = outcome
+            if executed:
+                return stored, False
+            return self._replay(stored, request_hash), True
+
+    async def _claim_and_execute(
+        self,
+        db: AsyncSession,
+        *,
+        scope: str,
+        key: str,
+        request_hash: str,
+        execute: Callable[[Record], Awaitable[tuple[int, bytes]]]
+    ) -> Optional[tuple[StoredResponse, bool]]:
+        """The recorded or freshly executed response and whether this call
+        executed it; None while another worker holds the key"""
+        now = datetime.utcnow()
+        claimed = await idempotency_repo.claim(
+            db,
+            scope=scope,
+            key=key,
+            request_hash=request_hash,
+            expired_before=now - self.ttl,
+            abandoned_before=now - self.lock_timeout
+        )
+        await db.commit()
+
+        if not claimed:
+            stored = await self._recorded(db, scope=scope, key=key)
+            return (stored, False) if stored is not None else None
+
+        async def record(status_code: int, body: bytes) -> None:
+            await idempotency_repo.complete(
+                db, scope=scope, key=key, status_code=status_code, response_body=body.decode()
+            )
+
+        try:
+            status_code, body = await execute(record)
+        except BaseException:
+            await db.rollback()
+            stored = await self._recorded(db, scope=scope, key=key)
+            if stored is not None:
+                # The work committed along with its response; retries replay it
+                logger.error(f"Request for Idempotency-Key {key!r} failed after committing")
+                raise
+            logger.warning(f"Request for Idempotency-Key {key!r} failed; releasing the key")
+            await idempotency_repo.release(db, scope=scope, key=key)
+            await db.commit()
+            raise
+
+        await db.commit()
+        stored = await self._recorded(db, scope=scope, key=key)
+        if stored is None:
+            # Nothing was committed with a response (a refusal, or a request
+            # without writes of its own), so record the one returned
+            await record(status_code, body)
+            await db.commit()
+            stored = StoredResponse(request_hash, status_code, body)
+            self._cache.set((scope, key), stored)
+        self.executed += 1
+        return stored, True
+
+    async def _recorded(self, db: AsyncSession, *, scope: str, key: str) -> Optional[StoredResponse]:
+        """The committed response of a key, cached; None while it has none"""
+        row = await idempotency_repo.get_by_key(db, scope=scope, key=key)
+        if row is None or row.status_code is None:
+            return None
+        stored = StoredResponse(row.request_hash, row.status_code, row.response_body.encode())
+        self._cache.set((scope, key), stored)
+        return stored
+
+    def _replay(self, stored: StoredResponse, request_hash: str) -> StoredResponse:
+        if stored.request_hash != request_hash:
+            raise IdempotencyKeyError("This Idempotency-Key was already used for a different request")
+        self.replayed += 1
+        return stored
+
+    async def purge_expired(self, db: AsyncSession, limit: int = 10000) -> int:
+        """Delete up to `limit` keys past their TTL. Does not commit."""
+        return await idempotency_repo.purge_expired(
+            db, expired_before=datetime.utcnow() - self.ttl, limit=limit
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "cached": len(self._cache),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "waited": self.waited
+        }
+
+
+idempotency_store = IdempotencyStore(
+    ttl=timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+    cache_size=settings.IDEMPOTENCY_CACHE_SIZE,
+    wait_timeout=settings.IDEMPOTENCY_WAIT_SECONDS,
+    lock_timeout=timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS)
+)
+
+
+async def idempotent_response(
+    request: Request,
+    db: AsyncSession,
+    *,
+    key: Optional[str],
+    run: Callable[[Optional[BeforeCommit]], Awaitable[Any]]
+) -> Any:
+    """Run an endpoint body at most once per Idempotency-Key.
+
+    Without a key `run(None)` simply runs. With one, `run` is given a
+    callback for the service to pass its result to just before it commits,
+    which records the JSON response in the same transaction. That response
+    (or a 4xx HTTPException raised before any commit) is returned verbatim
+    to every retry, marked with an Idempotent-Replayed header.
+    """
+    if not key:
+        return await run(None)
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+
+    async def execute(record: Record) -> tuple[int, bytes]:
+        async def before_commit(content: Any) -> None:
+            await record(200, _encode(content))
+
+        try:
+            content, status_code = await run(before_commit), 200
+        except HTTPException as exc:
+            if exc.status_code >= 500:
+                raise
+            content, status_code = {"detail": exc.detail}, exc.status_code
+        return status_code, _encode(content)
+
+    route = request.scope.get("route")
+    scope = f"{request.method} {route.path if route else request.url.path}"
+    stored, replayed = await idempotency_store.run(
+        db,
+        scope=scope,
+        key=key,
+        request_hash=IdempotencyStore.fingerprint(request, await request.body()),
+        execute=execute
+    )
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"} if replayed else {}
+    )
+
+
+def _encode(content: Any) -> bytes:
+    return JSONResponse(content=jsonable_encoder(content)).body
@@ -0,0 +1,182 @@
+import asyncio
+import csv
+import itertools
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, TextIO, Tuple
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.cache import product_cache
+from app.db.repositories import inventory_repo, product_repo
+from app.models.db_models import AgeRestriction, ProductCategory
+from app.utils.http_cache import response_cache
+from app.models.schemas import ImportRowError, ProductImportReport, ProductImportRow
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FORMATS = ("csv", "ndjson")
+
+
+class ProductImportService:
+    def __init__(self, db_session: AsyncSession):
+        self.db = db_session
+
+    async def import_stream(
+        self,
+        stream: TextIO,
+        fmt: str = "csv",
+        batch_size: Optional[int] = None
+    ) -> ProductImportReport:
+        """Stream a CSV/NDJSON product feed into products and inventory.
+
+        Rows are validated against ProductCreate and written in batches, one
+        commit per batch, so memory stays flat regardless of feed size. Bad
+        rows are reported and skipped without aborting their batch. The
+        stream is read and parsed a batch at a time in a worker thread, so a
+        large upload does not block the event loop on file IO.
+        """
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported import format: {fmt}")
+
+        batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        report = ProductImportReport()
+        started = time.monotonic()
+        batch: Dict[str, Tuple[int, ProductImportRow]] = {}
+
+        async for row_number, raw in self._read_rows(stream, fmt, batch_size):
+            report.processed += 1
+            if isinstance(raw, Exception):
+                self._add_error(report, row_number, None, str(raw))
+                continue
+
+            try:
+                row = ProductImportRow(**raw)
+            except ValidationError as exc:
+                self._add_error(report, row_number, raw.get("barcode"), self._format_error(exc))
+                continue
+
+            # A later row for the same barcode supersedes an earlier one
+            batch[row.barcode] = (row_number, row)
+            if len(batch) >= batch_size:
+                await self._write_batch(list(batch.values()), report)
+                batch = {}
+
+        if batch:
+            await self._write_batch(list(batch.values()), report)
+
+        product_cache.clear()
+        response_cache.invalidate("catalog")
+        report.duration_seconds = round(time.monotonic() - started, 3)
+        logger.info(
+            f"Product import finished: {report.processed} rows, {report.upserted} written, "
+            f"{report.unchanged} unchanged, {report.failed} failed in {report.duration_seconds}s"
+        )
+        return report
+
+    async def _read_rows(self, stream: TextIO, fmt: str, chunk_size: int) -> AsyncIterator[Tuple[int, Any]]:
+        rows = self._iter_rows(stream, fmt)
+        while True:
+            chunk = await asyncio.to_thread(list, itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            for row in chunk:
+                yield row
+
+    def _iter_rows(self, stream: TextIO, fmt: str) -> Iterator[Tuple[int, Any]]:
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            for row_number, row in enumerate(reader, start=2):
+                # Empty cells fall back to the schema defaults
+                yield row_number, {k: v for k, v in row.items() if k and v not in ("", None)}
+            return
+
+        for row_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as exc:
+                yield row_number, ValueError(f"Invalid JSON: {exc}")
+                continue
+            if not isinstance(data, dict):
+                yield row_number, ValueError("Each line must be a JSON object")
+                continue
+            yield row_number, data
+
+    async def _write_batch(
+        self,
+        batch: List[Tuple[int, ProductImportRow]],
+        report: ProductImportReport
+    ) -> None:
+        try:
+            async with self.db.begin_nested():
+                await self._upsert(batch, report)
+        except DBAPIError:
+            # Fall back to row-at-a-time to pin down the offending rows
+            for row_number, row in batch:
+                try:
+                    async with self.db.begin_nested():
+                        await self._upsert([(row_number, row)], report)
+                except DBAPIError as exc:
+                    self._add_error(report, row_number, row.barcode, str(exc.orig))
+        await self.db.commit()
+
+    async def _upsert(
+        self,
+        batch: List[Tuple[int, ProductImportRow]],
+        report: ProductImportReport
+    ) -> None:
+        products = [self._product_values(row) for _, row in batch]
+        ids, written = await product_repo.bulk_upsert(self.db, products)
+
+        await inventory_repo.bulk_upsert(self.db, [
+            {
+                "product_id": ids[row.barcode],
+                "quantity": row.quantity,
+                "low_stock_threshold": row.low_stock_threshold,
+                "reorder_threshold": row.reorder_threshold,
+                "is_active": True
+            }
+            for _, row in batch
+        ])
+
+        report.upserted += written
+        report.unchanged += len(batch) - written
+
+    def _product_values(self, row: ProductImportRow) -> Dict[str, Any]:
+        return {
+            "barcode": row.barcode,
+            "sku": row.sku,
+            "name": row.name,
+            "description": row.description,
+            "category": ProductCategory(row.category),
+            "current_price": row.current_price,
+            "cost_price": row.cost_price,
+            "tax_rate": row.tax_rate,
+            "requires_serial_number": row.requires_serial_number,
+            "is_weighted": row.is_weighted,
+            "age_restriction": AgeRestriction(row.age_restriction or AgeRestriction.NONE.value)
+        }
+
+    def _add_error(
+        self,
+        report: ProductImportReport,
+        row_number: int,
+        barcode: Optional[str],
+        error: str
+    ) -> None:
+        report.failed += 1
+        if len(report.errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            report.errors.append(ImportRowError(row=row_number, barcode=barcode, error=error))
+        else:
+            report.errors_truncated = True
+
+    def _format_error(self, exc: ValidationError) -> str:
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in exc.errors()
+        )
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.repositories import inventory_repo, product_repo
 from app.models.db_models import Inventory, Product
@@ -33,26 +33,32 @@ class InventoryService:
         quantity: int
     ) -> Inventory:
         """Adjust inventory levels (positive or negative)"""
+        inventory = await self._adjust(product_id, quantity)
+        await self.db.commit()
+        inventory_repo.invalidate_cache(inventory.id)
+        return inventory
+
+    async def _adjust(self, product_id: int, quantity: int) -> Inventory:
+        """Apply one adjustment without committing; stock is only read back
+        when the guarded update refused it"""
         if quantity == 0:
             raise ValueError("Quantity must be positive or negative")
-        
-        inventory = await inventory_repo.get_by_product(self.db, product_id=product_id)
-        if not inventory:
-            raise ValueError("Inventory record not found")
-        
-        new_quantity = inventory.quantity + quantity
-        if new_quantity < 0:
-            raise InsufficientStockError(
-                product_id=product_id,
-                available=inventory.quantity,
-                requested=abs(quantity)
-            )
-        
-        return await inventory_repo.adjust_stock(
+
+        inventory = await inventory_repo.adjust_stock(
             self.db,
             product_id=product_id,
             quantity=quantity
         )
+        if inventory is None:
+            available = await inventory_repo.get_quantity(self.db, product_id)
+            if available is None:
+                raise ValueError("Inventory record not found")
+            raise InsufficientStockError(
+                product_id=product_id,
+                available=available,
+                requested=abs(quantity)
+            )
+        return inventory
 
     async def get_low_stock_items(
         self,
@@ -76,7 +82,7 @@ class InventoryService:
         results = []
         for update in updates:
             try:
-                adjusted = await self.adjust_inventory(
+                adjusted = await self._adjust(
                     product_id=update["product_id"],
                     quantity=update["adjustment"]
                 )
@@ -86,51 +92,63 @@ class InventoryService:
                 raise
                 
         await self.db.commit()
+        if results:
+            inventory_repo.invalidate_cache(None)
         return results
 
     async def get_active_products(
         self,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include_inventory: bool = False
     ) -> List[Product]:
-        """Get all active products"""
+        """Get all active products, optionally with their inventory joined in"""
         return await product_repo.get_active_products(
             self.db,
             skip=skip,
-            limit=limit
+            limit=limit,
+            cursor=cursor,
+            with_inventory=include_inventory
         )
 
     async def search_products(
         self,
         search_term: str,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        include_inventory: bool = False
     ) -> List[Product]:
         """Search products by name or description"""
         return await product_repo.search_products(
             self.db,
             search_term=search_term,
             skip=skip,
-            limit=limit
+            limit=limit,
+            with_inventory=include_inventory
         )
 
     async def get_products_by_category(
         self,
         category: str,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include_inventory: bool = False
     ) -> List[Product]:
         """Get products by category"""
         return await product_repo.get_products_by_category(
             self.db,
             category=category,
             skip=skip,
-            limit=limit
+            limit=limit,
+            cursor=cursor,
+            with_inventory=include_inventory
         )
 
     async def get_product_by_id(self, product_id: int) -> Optional[Product]:
         """Get a single product by ID"""
-        return await product_repo.get_by_id(self.db, product_id)
+        return await product_repo.get(self.db, id=product_id)
 
     async def get_product(self, product_id: int) -> Optional[Product]:
         """Get a single product by ID (alias for get_product_by_id)"""
@@ -139,3 +157,33 @@ class InventoryService:
     async def get_product_by_barcode(self, barcode: str) -> Optional[Product]:
         """Get a product by its barcode"""
         return await product_repo.get_by_barcode(self.db, barcode)
+
+    async def lookup_products(
+        self,
+        barcodes: List[str],
+        ids: List[int]
+    ) -> Dict[str, Any]:
+        """Resolve a basket of scanned codes at once, keyed by barcode and
+        by id separately so a numeric barcode cannot shadow an id"""
+        barcodes = list(dict.fromkeys(barcodes))
+        ids = list(dict.fromkeys(ids))
+        rows = await product_repo.lookup_with_stock(self.db, barcodes=barcodes, ids=ids)
+
+        hits = {
+            product.id: {
+                "product": product,
+                "quantity": quantity,
+                "sellable": sellable,
+                # Discontinued or recalled products are never in stock
+                "in_stock": sellable and quantity > 0
+            }
+            for product, quantity, sellable in rows
+        }
+        by_barcode = {hit["product"].barcode: hit for hit in hits.values()}
+
+        return {
+            "barcodes": {code: by_barcode[code] for code in barcodes if code in by_barcode},
+            "ids": {product_id: hits[product_id] for product_id in ids if product_id in hits},
+            "missing_barcodes": [code for code in barcodes if code not in by_barcode],
+            "missing_ids": [product_id for product_id in ids if product_id not in hits]
+        }
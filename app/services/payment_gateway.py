@@ -0,0 +1,102 @@
+import asyncio
+import random
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.models.db_models import PaymentMethod
+
+
+@dataclass
+class ChargeRequest:
+    # Unique per payment so a retried charge is not taken twice
+    reference: str
+    amount: Decimal
+    method: PaymentMethod
+    last_four_digits: Optional[str] = None
+    email: Optional[str] = None
+
+
+@dataclass
+class ChargeResult:
+    approved: bool
+    processor_reference: Optional[str] = None
+    message: Optional[str] = None
+
+
+def payment_reference(payment_id: int) -> str:
+    """Gateway reference of a queued payment's charge"""
+    return f"pay-{payment_id}"
+
+
+def payment_id_from_reference(reference: str) -> Optional[int]:
+    """Payment id behind a reference made by payment_reference, else None"""
+    prefix, _, number = reference.partition("-")
+    if prefix == "pay" and number.isdigit():
+        return int(number)
+    return None
+
+
+class PaymentGateway(ABC):
+    """Interface of a payment processor backend.
+
+    `charge` returns a declined result for a refused payment and raises
+    for errors where the outcome is unknown (timeouts, network failures),
+    which may be retried with the same reference.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def charge(self, request: ChargeRequest) -> ChargeResult:
+        ...
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+
+class SimulatedGateway(PaymentGateway):
+    """In-process stand-in for a processor with configurable latency and
+    decline rate, for development and load tests"""
+
+    name = "simulator"
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, failure_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+
+    async def charge(self, request: ChargeRequest) -> ChargeResult:
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        processor_reference = f"sim_{uuid.uuid4().hex[:24]}"
+        if random.random() < self.failure_rate:
+            return ChargeResult(False, processor_reference, "Declined by simulator")
+        return ChargeResult(True, processor_reference)
+
+
+def create_payment_gateway() -> PaymentGateway:
+    """Gateway selected by PAYMENT_GATEWAY"""
+    if settings.PAYMENT_GATEWAY == "simulator":
+        return SimulatedGateway(
+            latency_ms=settings.PAYMENT_SIMULATOR_LATENCY_MS,
+            jitter_ms=settings.PAYMENT_SIMULATOR_JITTER_MS,
+            failure_rate=settings.PAYMENT_SIMULATOR_FAILURE_RATE
+        )
+    if settings.PAYMENT_GATEWAY == "paystack":
+        from app.services.paystack import create_paystack_gateway
+        return create_paystack_gateway()
+    raise ValueError(f"Unknown PAYMENT_GATEWAY {settings.PAYMENT_GATEWAY!r}")
+
+
+payment_gateway = create_payment_gateway()
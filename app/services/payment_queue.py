@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.repositories import payment_repo
+from app.models.db_models import PaymentMethod
+from app.services.cart_events import cart_events
+from app.services.payment_gateway import (
+    ChargeRequest,
+    PaymentGateway,
+    payment_gateway,
+    payment_reference
+)
+from app.services.payment_service import PaymentService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PaymentJob:
+    payment_id: int
+    transaction_id: int
+    amount: Decimal
+    method: PaymentMethod
+    last_four_digits: Optional[str] = None
+    cart_id: Optional[int] = None
+    # Whether this worker holds the payment in processing
+    claimed: bool = False
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class PaymentQueue:
+    """Charges pending payments on a bounded pool of workers so requests
+    never wait on the gateway.
+
+    Checkout commits a pending payment and enqueues it. A worker first
+    claims it (pending -> processing in one UPDATE), so however many
+    workers or processes have it queued only one charges it; it then calls
+    the gateway without holding a database session, settles the payment in
+    one short transaction and pushes the outcome to the cart's displays.
+    Only a definite answer from the gateway settles a payment: one whose
+    charge keeps erroring is handed back to pending, to be claimed again at
+    startup, settled by the gateway's webhook or flagged by reconciliation.
+    """
+
+    def __init__(
+        self,
+        gateway: PaymentGateway,
+        workers: int,
+        max_size: int,
+        max_attempts: int,
+        retry_delay: float
+    ):
+        self.gateway = gateway
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Dict[asyncio.Task, PaymentJob] = {}
+        self._session_factory: Optional[Callable[[], Awaitable[AsyncSession]]] = None
+        self.in_flight = 0
+        self.approved = 0
+        self.declined = 0
+        self.retried = 0
+        self.unresolved = 0
+        self.skipped = 0
+        self.total_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def enqueue(self, job: PaymentJob) -> None:
+        """Queue a charge; waits for room when the queue is full"""
+        await self._queue.put(job)
+
+    async def start(self, session_factory: Callable[[], Awaitable[AsyncSession]]) -> None:
+        """Start the workers and queue the pending payments this worker claims"""
+        if self._tasks:
+            return
+        self._session_factory = session_factory
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        db = await session_factory()
+        try:
+            pending = await payment_repo.claim_pending(db, limit=self._queue.maxsize or 1000)
+            await db.commit()
+        finally:
+            await db.close()
+        for payment in pending:
+            await self.enqueue(PaymentJob(
+                payment_id=payment.id,
+                transaction_id=payment.transaction_id,
+                amount=payment.amount,
+                method=payment.method,
+                last_four_digits=payment.last_four_digits,
+                claimed=True
+            ))
+        if pending:
+            logger.info(f"Requeued {len(pending)} pending payments")
+
+    async def stop(self) -> None:
+        """Stop the workers; queued payments are left, or handed back,
+        pending in the database"""
+        claimed = [job.payment_id for job in self._retries.values()]
+        tasks = self._tasks + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            if job.claimed:
+                claimed.append(job.payment_id)
+            self._queue.task_done()
+        if claimed and self._session_factory is not None:
+            await self._release(claimed)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self.in_flight += 1
+            try:
+                await self._process(job)
+            except Exception as e:
+                logger.error(f"Payment {job.payment_id} failed to settle: {str(e)}")
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    async def _process(self, job: PaymentJob) -> None:
+        if not job.claimed:
+            db = await self._session_factory()
+            try:
+                job.claimed = await payment_repo.claim(db, job.payment_id)
+                await db.commit()
+            finally:
+                await db.close()
+            if not job.claimed:
+                # Charged, or being charged, elsewhere
+                self.skipped += 1
+                return
+
+        job.attempts += 1
+        try:
+            result = await self.gateway.charge(ChargeRequest(
+                reference=payment_reference(job.payment_id),
+                amount=job.amount,
+                method=job.method,
+                last_four_digits=job.last_four_digits
+            ))
+        except Exception as e:
+            if job.attempts < self.max_attempts:
+                self.retried += 1
+                logger.warning(
+                    f"Payment {job.payment_id} attempt {job.attempts} failed: {str(e)}; retrying"
+                )
+                retry = asyncio.create_task(self._retry_later(job))
+                self._retries[retry] = job
+                retry.add_done_callback(lambda task: self._retries.pop(task, None))
+                return
+            # The charge may still have gone through, so it is not a decline
+            self.unresolved += 1
+            logger.error(
+                f"Payment {job.payment_id} unresolved after {job.attempts} attempts: {str(e)}; "
+                "handing it back to pending"
+            )
+            await self._release([job.payment_id])
+            return
+
+        db = await self._session_factory()
+        try:
+            payment = await PaymentService(db, gateway=self.gateway).settle(
+                job.payment_id, job.transaction_id, result
+            )
+        finally:
+            await db.close()
+        if payment is None:
+            return
+
+        if result.approved:
+            self.approved += 1
+        else:
+            self.declined += 1
+        self.total_seconds += time.monotonic() - job.enqueued_at
+        await cart_events.publish(job.cart_id, {
+            "type": "payment.updated",
+            "payment_id": payment.id,
+            "transaction_id": payment.transaction_id,
+            "status": payment.status.value,
+            "receipt_number": payment.receipt_number,
+            "message": result.message
+        })
+
+    async def _release(self, payment_ids: List[int]) -> None:
+        db = await self._session_factory()
+        try:
+            await payment_repo.release(db, payment_ids)
+            await db.commit()
+        finally:
+            await db.close()
+
+    async def _retry_later(self, job: PaymentJob) -> None:
+        await asyncio.sleep(self.retry_delay * job.attempts)
+        await self.enqueue(job)
+
+    async def join(self) -> None:
+        """Wait until every queued payment, including retries, has been processed"""
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.gather(*self._retries, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        settled = self.approved + self.declined
+        return {
+            "running": self.running,
+            "gateway": self.gateway.stats(),
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize(),
+            "in_flight": self.in_flight,
+            "approved": self.approved,
+            "declined": self.declined,
+            "retried": self.retried,
+            "unresolved": self.unresolved,
+            "skipped": self.skipped,
+            "mean_seconds_to_settle": round(self.total_seconds / settled, 3) if settled else 0.0
+        }
+
+
+payment_queue = PaymentQueue(
+    gateway=payment_gateway,
+    workers=settings.PAYMENT_WORKERS,
+    max_size=settings.PAYMENT_QUEUE_SIZE,
+    max_attempts=settings.PAYMENT_MAX_ATTEMPTS,
+    retry_delay=settings.PAYMENT_RETRY_DELAY_SECONDS
+)
@@ -1,88 +1,155 @@
 import logging
-from typing import Optional, Dict, Any
+import uuid
+from typing import Optional, Dict, Any, List, Tuple, Awaitable, Callable
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
-from app.db.repositories import payment_repo, transaction_repo
+from app.db.repositories import (
+    cart_repo,
+    inventory_repo,
+    payment_repo,
+    reservation_repo,
+    transaction_repo
+)
 from app.db.session import get_db
 from app.models.db_models import Payment, PaymentStatus, PaymentMethod
 from app.services.exceptions import PaymentProcessingError
+from app.services.payment_gateway import ChargeRequest, ChargeResult, PaymentGateway, payment_gateway
 
 logger = logging.getLogger(__name__)
 
 class PaymentService:
-    def __init__(self, db_session: AsyncSession):
+    def __init__(self, db_session: AsyncSession, gateway: PaymentGateway = payment_gateway):
         self.db = db_session
+        self.gateway = gateway
     
-    async def process_payment(
+    async def charge(
         self,
-        transaction_id: int,
         payment_method: PaymentMethod,
         amount: float,
         payment_details: Dict[str, Any]
-    ) -> Payment:
-        """Process payment through appropriate gateway"""
+    ) -> Dict[str, Any]:
+        """Charge through the configured gateway and return the payment
+        fields to record; raises PaymentProcessingError if declined"""
         try:
-            # In a real implementation, this would integrate with:
-            # - Paystack for credit cards
-            # - Square for mobile payments
-            # - Cash drawer management for cash payments
-            
-            # For now, we'll simulate successful payment
-            payment_data = {
-                "transaction_id": transaction_id,
-                "amount": amount,
-                "method": payment_method,
-                "status": PaymentStatus.COMPLETED,
-                "processor_reference": "simulated_payment_123",
-                "last_four_digits": payment_details.get("last_four", "1234"),
-                "receipt_number": f"RCPT-{datetime.now().timestamp()}",
-                "processed_at": datetime.utcnow()
-            }
-            
-            payment = await payment_repo.create(self.db, obj_in=payment_data)
-            
-            # Update transaction status
-            await transaction_repo.update(
-                self.db,
-                db_obj=await transaction_repo.get(self.db, id=transaction_id),
-                obj_in={"payment_status": PaymentStatus.COMPLETED}
-            )
-            
-            return payment
-            
+            result = await self.gateway.charge(ChargeRequest(
+                reference=f"chg-{uuid.uuid4().hex}",
+                amount=amount,
+                method=payment_method,
+                last_four_digits=payment_details.get("last_four_digits")
+            ))
         except Exception as e:
-            logger.error(f"Payment processing failed: {str(e)}")
-            
-            # Record failed payment attempt
-            payment_data = {
-                "transaction_id": transaction_id,
-                "amount": amount,
-                "method": payment_method,
-                "status": PaymentStatus.FAILED,
-                "processor_reference": None,
-                "last_four_digits": payment_details.get("last_four", ""),
-                "receipt_number": None,
-                "processed_at": datetime.utcnow()
-            }
-            
-            await payment_repo.create(self.db, obj_in=payment_data)
-            
-            # Update transaction status
-            await transaction_repo.update(
-                self.db,
-                db_obj=await transaction_repo.get(self.db, id=transaction_id),
-                obj_in={"payment_status": PaymentStatus.FAILED}
+            raise PaymentProcessingError(f"Payment gateway error: {str(e)}")
+        if not result.approved:
+            raise PaymentProcessingError(result.message or "Payment declined")
+
+        return {
+            "amount": amount,
+            "method": payment_method,
+            "status": PaymentStatus.COMPLETED,
+            "processor_reference": result.processor_reference,
+            "last_four_digits": payment_details.get("last_four_digits"),
+            "receipt_number": f"RCPT-{int(datetime.now().timestamp() * 1000)}",
+            "processed_at": datetime.utcnow()
+        }
+
+    async def settle(
+        self,
+        payment_id: int,
+        transaction_id: int,
+        result: ChargeResult,
+        before_commit: Optional[Callable[[Payment], Awaitable[None]]] = None
+    ) -> Optional[Payment]:
+        """Record a pending charge's outcome in one transaction; None if the
+        payment was already settled.
+
+        An approved charge completes the transaction. A declined one cancels
+        it, puts its lines back in stock and reopens the cart, so the
+        shopper can pay another way. `before_commit` is awaited with the
+        settled payment just before the commit.
+        """
+        status = PaymentStatus.COMPLETED if result.approved else PaymentStatus.FAILED
+        payment = await payment_repo.settle(
+            self.db,
+            payment_id=payment_id,
+            status=status,
+            processor_reference=result.processor_reference,
+            receipt_number=f"RCPT-{payment_id:010d}" if result.approved else None
+        )
+        if payment is None:
+            await self.db.rollback()
+            return None
+
+        if result.approved:
+            await transaction_repo.complete_many(self.db, [transaction_id])
+        else:
+            await self._unwind_declined(transaction_id)
+        if before_commit is not None:
+            await before_commit(payment)
+        await self.db.commit()
+        if not result.approved:
+            inventory_repo.invalidate_cache(None)
+        return payment
+
+    async def settle_many(
+        self,
+        outcomes: List[Tuple[int, ChargeResult]],
+        before_commit: Optional[Callable[[List[Tuple[int, int, PaymentStatus]]], Awaitable[None]]] = None
+    ) -> List[Tuple[int, int, PaymentStatus]]:
+        """Record many (payment_id, result) outcomes in one transaction with
+        set-based updates; returns (payment_id, transaction_id, status) of
+        the payments that were still unsettled. `before_commit` is awaited
+        with that list just before the commit."""
+        settled = await payment_repo.settle_many(self.db, [
+            (
+                payment_id,
+                PaymentStatus.COMPLETED if result.approved else PaymentStatus.FAILED,
+                result.processor_reference,
+                f"RCPT-{payment_id:010d}" if result.approved else None
             )
-            
-            raise PaymentProcessingError(f"Payment processing failed: {str(e)}")
+            for payment_id, result in outcomes
+        ])
+        await transaction_repo.complete_many(
+            self.db,
+            [transaction_id for _, transaction_id, status in settled if status == PaymentStatus.COMPLETED]
+        )
+        declined = [transaction_id for _, transaction_id, status in settled if status == PaymentStatus.FAILED]
+        for transaction_id in declined:
+            await self._unwind_declined(transaction_id)
+        if before_commit is not None:
+            await before_commit(settled)
+        await self.db.commit()
+        if declined:
+            inventory_repo.invalidate_cache(None)
+        return settled
+
+    async def _unwind_declined(self, transaction_id: int) -> None:
+        cart_id = await transaction_repo.cancel(self.db, transaction_id)
+        await inventory_repo.restock_transaction_lines(self.db, transaction_id)
+        if cart_id and await cart_repo.reopen(self.db, cart_id):
+            await reservation_repo.hold_cart_lines(self.db, [cart_id])
+
+    async def get_payment_status(self, payment_id: int) -> Dict[str, Any]:
+        payment = await payment_repo.get(self.db, id=payment_id)
+        if not payment:
+            raise PaymentProcessingError("Payment not found")
+        return {
+            "payment_id": payment.id,
+            "transaction_id": payment.transaction_id,
+            "status": payment.status,
+            "receipt_number": payment.receipt_number,
+            "processor_reference": payment.processor_reference,
+            "processed_at": payment.processed_at
+        }
 
     async def refund_payment(
         self,
         payment_id: int,
-        amount: Optional[float] = None
+        amount: Optional[float] = None,
+        before_commit: Optional[Callable[[Payment], Awaitable[None]]] = None
     ) -> Payment:
-        """Process refund for a payment"""
+        """Process refund for a payment; `before_commit` is awaited with the
+        refunded payment just before the commit"""
         payment = await payment_repo.get(self.db, id=payment_id)
         if not payment:
             raise PaymentProcessingError("Payment not found")
@@ -94,17 +161,17 @@ class PaymentService:
         
         try:
             # Simulate refund processing
-            updated_payment = await payment_repo.update(
-                self.db,
-                db_obj=payment,
-                obj_in={
-                    "status": PaymentStatus.REFUNDED if refund_amount == payment.amount 
-                            else PaymentStatus.PARTIALLY_REFUNDED
-                }
+            payment.status = (
+                PaymentStatus.REFUNDED if refund_amount == payment.amount
+                else PaymentStatus.PARTIALLY_REFUNDED
             )
-            
-            return updated_payment
+            await self.db.flush()
+            if before_commit is not None:
+                await before_commit(payment)
+            await self.db.commit()
+            return payment
             
         except Exception as e:
+            await self.db.rollback()
             logger.error(f"Refund failed: {str(e)}")
             raise PaymentProcessingError(f"Refund processing failed: {str(e)}")
@@ -0,0 +1,331 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.repositories import webhook_event_repo
+from app.models.db_models import WebhookEventStatus
+from app.services.exceptions import WebhookBacklogError, WebhookSignatureError
+from app.services.payment_gateway import ChargeResult, payment_id_from_reference
+from app.services.payment_service import PaymentService
+from app.services.paystack import DECLINED_STATUSES
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WebhookEvent:
+    payment_id: int
+    reference: str
+    approved: bool
+    message: Optional[str] = None
+    id: Optional[int] = None  # Row in payment_webhook_events once stored
+    attempts: int = 0
+    retry_at: float = 0.0  # time.monotonic() before which it is not retried
+
+
+def verify_paystack_signature(secret: Optional[str], body: bytes, signature: Optional[str]) -> bool:
+    """Paystack signs the raw body with HMAC-SHA512 of the secret key"""
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def parse_paystack_event(payload: Dict[str, Any]) -> Optional[WebhookEvent]:
+    """Charge outcome carried by a Paystack event; None for events that do
+    not settle one of our payments"""
+    data = payload.get("data") or {}
+    reference = data.get("reference")
+    payment_id = payment_id_from_reference(reference) if isinstance(reference, str) else None
+    if payment_id is None:
+        return None
+
+    status = data.get("status")
+    if payload.get("event") == "charge.success" and status == "success":
+        return WebhookEvent(payment_id, reference, True)
+    if status in DECLINED_STATUSES:
+        return WebhookEvent(payment_id, reference, False, data.get("gateway_response") or "Declined")
+    return None
+
+
+class PaymentWebhookBuffer:
+    """Buffers verified gateway webhooks and applies them in batches.
+
+    Receiving a webhook checks its signature and stores the event in
+    payment_webhook_events (one insert) before it is acknowledged, so an
+    acknowledged event survives a crash; events still unapplied are loaded
+    again when the flusher starts. A flusher settles up to `batch_size`
+    events per transaction with set-based updates of payments and
+    transactions, marking the events applied in the same transaction.
+    Redeliveries are dropped by reference in memory, and by the unique
+    reference of the stored events.
+
+    A failed batch is split up and its events applied one by one, so one
+    bad event cannot hold back the rest. An event that still fails is
+    retried with exponential backoff and, after `max_attempts`, marked as a
+    dead letter in the table with its last error; its payment stays
+    unsettled for reconciliation to report.
+    """
+
+    def __init__(
+        self,
+        secret: Optional[str],
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        dedup_size: int,
+        dedup_ttl: float,
+        max_attempts: int,
+        retry_delay: float
+    ):
+        self.secret = secret
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # Insertion ordered, keyed by reference so a burst of redeliveries
+        # collapses into one pending event
+        self._events: Dict[str, WebhookEvent] = {}
+        self._seen = TTLCache(maxsize=dedup_size, ttl=dedup_ttl)
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._session_factory: Optional[Callable[[], Awaitable[AsyncSession]]] = None
+        self.received = 0
+        self.duplicates = 0
+        self.ignored = 0
+        self.applied = 0
+        self.stale = 0
+        self.batches = 0
+        self.errors = 0
+        self.retries = 0
+        self.dead_lettered = 0
+        self.flush_seconds = 0.0
+
+    async def receive(self, body: bytes, signature: Optional[str]) -> bool:
+        """Verify, store and queue a Paystack webhook; False if it was a
+        duplicate or carries nothing to apply"""
+        if not verify_paystack_signature(self.secret, body, signature):
+            raise WebhookSignatureError("Invalid webhook signature")
+        self.received += 1
+        try:
+            event = parse_paystack_event(json.loads(body))
+        except (ValueError, AttributeError):
+            event = None
+        if event is None:
+            self.ignored += 1
+            return False
+
+        if event.reference in self._events or self._seen.get(event.reference):
+            self.duplicates += 1
+            return False
+        if len(self._events) >= self.max_size:
+            raise WebhookBacklogError("Webhook backlog is full, retry later")
+
+        db = await self._session_factory()
+        try:
+            event.id = await webhook_event_repo.record(
+                db, reference=event.reference, approved=event.approved, message=event.message
+            )
+            await db.commit()
+        finally:
+            await db.close()
+        if event.id is None:
+            # Stored before, by this worker or another
+            self._seen.set(event.reference, True)
+            self.duplicates += 1
+            return False
+        self._events.setdefault(event.reference, event)
+        if len(self._events) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def start(self, session_factory: Callable[[], Awaitable[AsyncSession]]) -> None:
+        """Load the stored events still unapplied, then flush every
+        `flush_interval` seconds, or as soon as a batch fills"""
+        self._session_factory = session_factory
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Stop the flusher after applying what is still buffered"""
+        if self._task is not None:
+            # Let a batch being applied finish rather than cancel it mid-transaction
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        while self._events and await self.flush():
+            pass
+        if self._events:
+            logger.warning(
+                f"Stopping with {len(self._events)} payment webhooks waiting for a retry; "
+                "they are applied after the next start"
+            )
+
+    async def recover(self) -> int:
+        """Queue the stored events no worker has applied yet; returns how many.
+        Another worker may have them queued too, which is harmless: only
+        unsettled payments are settled and only unapplied events marked."""
+        db = await self._session_factory()
+        try:
+            stored = await webhook_event_repo.get_received(db, limit=self.max_size)
+        finally:
+            await db.close()
+        recovered = 0
+        for row in stored:
+            payment_id = payment_id_from_reference(row.reference)
+            if payment_id is None or row.reference in self._events:
+                continue
+            self._events[row.reference] = WebhookEvent(
+                payment_id, row.reference, row.approved, row.message, id=row.id
+            )
+            recovered += 1
+        if recovered:
+            logger.info(f"Recovered {recovered} stored payment webhooks")
+        return recovered
+
+    async def _run_forever(self) -> None:
+        try:
+            await self.recover()
+        except Exception as e:
+            logger.error(f"Recovering stored payment webhooks failed: {str(e)}")
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._events and not self._stopping and await self.flush():
+                pass
+
+    async def flush(self) -> int:
+        """Apply up to one batch of buffered events that are due; returns how
+        many were taken"""
+        now = time.monotonic()
+        batch = [event for event in self._events.values() if event.retry_at <= now][:self.batch_size]
+        if not batch:
+            return 0
+        for event in batch:
+            del self._events[event.reference]
+
+        started = time.perf_counter()
+        try:
+            await self._apply(batch)
+        except asyncio.CancelledError:
+            self._requeue(batch)
+            raise
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Applying {len(batch)} payment webhooks failed: {str(e)}")
+            if len(batch) == 1:
+                await self._retry(batch[0], e)
+            else:
+                await self._apply_each(batch)
+        self.batches += 1
+        self.flush_seconds += time.perf_counter() - started
+        return len(batch)
+
+    async def _apply(self, batch: List[WebhookEvent]) -> None:
+        db = await self._session_factory()
+
+        async def mark_events(settled: List[tuple]) -> None:
+            applied = {payment_id for payment_id, _, _ in settled}
+            await webhook_event_repo.mark(
+                db, [event.id for event in batch if event.payment_id in applied], WebhookEventStatus.APPLIED
+            )
+            await webhook_event_repo.mark(
+                db, [event.id for event in batch if event.payment_id not in applied], WebhookEventStatus.STALE
+            )
+
+        try:
+            settled = await PaymentService(db).settle_many([
+                (event.payment_id, ChargeResult(event.approved, event.reference, event.message))
+                for event in batch
+            ], before_commit=mark_events)
+        except BaseException:
+            await db.rollback()
+            raise
+        finally:
+            await db.close()
+
+        for event in batch:
+            self._seen.set(event.reference, True)
+        self.applied += len(settled)
+        self.stale += len(batch) - len(settled)
+
+    async def _apply_each(self, batch: List[WebhookEvent]) -> None:
+        """Apply the events of a failed batch in a transaction each"""
+        for index, event in enumerate(batch):
+            try:
+                await self._apply([event])
+            except asyncio.CancelledError:
+                self._requeue(batch[index:])
+                raise
+            except Exception as e:
+                await self._retry(event, e)
+
+    async def _retry(self, event: WebhookEvent, error: Exception) -> None:
+        event.attempts += 1
+        if event.attempts >= self.max_attempts:
+            self.dead_lettered += 1
+            logger.error(
+                f"Dead-lettering payment webhook {event.reference} after "
+                f"{event.attempts} attempts: {str(error)}"
+            )
+            db = await self._session_factory()
+            try:
+                await webhook_event_repo.dead_letter(
+                    db, id=event.id, attempts=event.attempts, error=str(error)
+                )
+                await db.commit()
+            except Exception as e:
+                # Still stored as received, so the next start picks it up again
+                logger.error(f"Recording dead letter {event.reference} failed: {str(e)}")
+            finally:
+                await db.close()
+            return
+        self.retries += 1
+        event.retry_at = time.monotonic() + self.retry_delay * 2 ** (event.attempts - 1)
+        self._events.setdefault(event.reference, event)
+
+    def _requeue(self, batch: List[WebhookEvent]) -> None:
+        # Back in front of anything that arrived meanwhile
+        self._events = {**{event.reference: event for event in batch}, **self._events}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "buffered": len(self._events),
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "ignored": self.ignored,
+            "applied": self.applied,
+            "stale": self.stale,
+            "batches": self.batches,
+            "errors": self.errors,
+            "retries": self.retries,
+            "dead_lettered": self.dead_lettered,
+            "mean_batch_seconds": round(self.flush_seconds / self.batches, 4) if self.batches else 0.0
+        }
+
+
+payment_webhooks = PaymentWebhookBuffer(
+    secret=settings.PAYSTACK_SECRET_KEY,
+    max_size=settings.PAYMENT_WEBHOOK_QUEUE_SIZE,
+    batch_size=settings.PAYMENT_WEBHOOK_BATCH_SIZE,
+    flush_interval=settings.PAYMENT_WEBHOOK_FLUSH_SECONDS,
+    dedup_size=settings.PAYMENT_WEBHOOK_DEDUP_SIZE,
+    dedup_ttl=settings.PAYMENT_WEBHOOK_DEDUP_SECONDS,
+    max_attempts=settings.PAYMENT_WEBHOOK_MAX_ATTEMPTS,
+    retry_delay=settings.PAYMENT_WEBHOOK_RETRY_SECONDS
+)
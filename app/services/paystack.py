@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import random
+from decimal import Decimal
+from typing import Any, Dict, Optional
+import httpx
+from app.core.config import settings
+from app.services.payment_gateway import ChargeRequest, ChargeResult, PaymentGateway
+from app.utils.circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.paystack.co"
+
+# Statuses of a finished charge; anything else is still in progress
+DECLINED_STATUSES = {"failed", "abandoned", "reversed"}
+
+
+class PaystackError(Exception):
+    """A Paystack call failed without a usable answer"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+class PaystackClient:
+    """Paystack API client sharing one pooled httpx.AsyncClient.
+
+    Connections are kept alive between payments, so peak traffic does not
+    pay a TLS handshake per charge. Transport errors, timeouts, 429s and
+    5xx responses are retried with full-jitter backoff, and a circuit
+    breaker fails calls fast while Paystack is down or refusing our key.
+    Other rejected requests raise PaystackError without a retry.
+    """
+
+    def __init__(
+        self,
+        secret_key: Optional[str],
+        base_url: str,
+        *,
+        timeout: httpx.Timeout,
+        limits: httpx.Limits,
+        max_retries: int,
+        retry_backoff: float,
+        breaker: CircuitBreaker,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.secret_key = secret_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.limits = limits
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.secret_key or ''}"},
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Call the API and return its JSON body. 400 bodies are returned
+        too, since Paystack explains refusals such as a duplicate reference
+        in them; other 4xx responses raise PaystackError."""
+        self.start()
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self.requests += 1
+            try:
+                response = await self._client.request(method, path, json=json)
+            except httpx.TransportError as e:
+                error = PaystackError(f"{type(e).__name__}: {str(e) or 'transport error'}")
+            else:
+                status_code = response.status_code
+                error = PaystackError(f"Paystack returned {status_code}", status_code)
+                if status_code != 429 and status_code < 500:
+                    if status_code in (401, 403):
+                        # Every call fails until the key is fixed
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    if status_code >= 300 and status_code != 400:
+                        self.errors += 1
+                        raise error
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise PaystackError("Invalid JSON from Paystack", status_code)
+            finally:
+                # A trial cancelled mid-call must not keep the circuit half
+                # open for good; outcomes are recorded above before this runs
+                self.breaker.end_trial()
+
+            self.breaker.record_failure()
+            self.errors += 1
+            if attempt >= self.max_retries:
+                raise error
+            attempt += 1
+            self.retries += 1
+            # Full jitter keeps retrying kiosks from hitting Paystack in step
+            await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "started": self._client is not None,
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "breaker": self.breaker.stats()
+        }
+
+
+class PaystackGateway(PaymentGateway):
+    """Charges through the Paystack API.
+
+    The charge reference is the payment's reference, so a charge retried
+    after an unknown outcome is looked up instead of taken twice.
+    """
+
+    name = "paystack"
+
+    def __init__(self, client: PaystackClient, default_email: str):
+        self.client = client
+        self.default_email = default_email
+
+    async def start(self) -> None:
+        self.client.start()
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    async def charge(self, request: ChargeRequest) -> ChargeResult:
+        body = await self.client.request("POST", "/charge", json={
+            "email": request.email or self.default_email,
+            # Paystack amounts are in the currency's subunit
+            "amount": int((Decimal(request.amount) * 100).to_integral_value()),
+            "reference": request.reference,
+            "metadata": {
+                "method": getattr(request.method, "value", request.method),
+                "last_four_digits": request.last_four_digits
+            }
+        })
+        if not body.get("status") and "reference" in (body.get("message") or "").lower():
+            # Duplicate reference: an earlier attempt reached Paystack
+            return await self.verify(request.reference)
+        return self._result(body)
+
+    async def verify(self, reference: str) -> ChargeResult:
+        return self._result(await self.client.request("GET", f"/transaction/verify/{reference}"))
+
+    @staticmethod
+    def _result(body: Dict[str, Any]) -> ChargeResult:
+        """Outcome of a charge from its status. A refused request or a
+        charge still awaiting the shopper (send_otp, pending, ...) raises, so
+        the payment stays pending until a webhook or verify settles it."""
+        data = body.get("data") or {}
+        status = data.get("status")
+        if status == "success":
+            return ChargeResult(True, data.get("reference"))
+        if status in DECLINED_STATUSES:
+            return ChargeResult(
+                False,
+                data.get("reference"),
+                data.get("gateway_response") or body.get("message") or "Declined by Paystack"
+            )
+        if not body.get("status"):
+            raise PaystackError(f"Paystack refused the request: {body.get('message') or 'no reason given'}")
+        raise PaystackError(f"Charge still {status or 'pending'}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, **self.client.stats()}
+
+
+def create_paystack_gateway(transport: Optional[httpx.AsyncBaseTransport] = None) -> PaystackGateway:
+    client = PaystackClient(
+        settings.PAYSTACK_SECRET_KEY,
+        settings.PAYSTACK_BASE_URL or DEFAULT_BASE_URL,
+        timeout=httpx.Timeout(
+            settings.PAYSTACK_TIMEOUT_SECONDS,
+            connect=settings.PAYSTACK_CONNECT_TIMEOUT_SECONDS
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.PAYSTACK_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.PAYSTACK_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.PAYSTACK_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        max_retries=settings.PAYSTACK_MAX_RETRIES,
+        retry_backoff=settings.PAYSTACK_RETRY_BACKOFF_SECONDS,
+        breaker=CircuitBreaker(
+            failure_threshold=settings.PAYSTACK_BREAKER_THRESHOLD,
+            reset_timeout=settings.PAYSTACK_BREAKER_RESET_SECONDS
+        ),
+        transport=transport
+    )
+    return PaystackGateway(client, settings.PAYSTACK_DEFAULT_EMAIL)
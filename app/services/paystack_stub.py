@@ -0,0 +1,67 @@
+import asyncio
+import random
+from typing import Any, Dict
+from fastapi import Body, FastAPI, Header
+from fastapi.responses import JSONResponse
+
+
+def create_paystack_stub(
+    latency_ms: float = 0.0,
+    failure_rate: float = 0.0,
+    error_rate: float = 0.0
+) -> FastAPI:
+    """Local stand-in for the Paystack charge API, for tests and benchmarks.
+
+    Pass `httpx.ASGITransport(app=create_paystack_stub())` to
+    create_paystack_gateway, or serve it with
+    `uvicorn app.services.paystack_stub:create_paystack_stub --factory`
+    and point PAYSTACK_BASE_URL at it. `error_rate` answers a share of
+    calls with a 503 to exercise retries and the circuit breaker.
+    """
+    app = FastAPI(title="Paystack stub")
+    charges: Dict[str, Dict[str, Any]] = {}
+
+    async def answer(authorization: str):
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+        if not authorization.startswith("Bearer "):
+            return JSONResponse(status_code=401, content={"status": False, "message": "Invalid key"})
+        if random.random() < error_rate:
+            return JSONResponse(status_code=503, content={"status": False, "message": "Service unavailable"})
+        return None
+
+    @app.post("/charge")
+    async def charge(body: Dict[str, Any] = Body(...), authorization: str = Header("")):
+        refused = await answer(authorization)
+        if refused is not None:
+            return refused
+
+        reference = body["reference"]
+        if reference in charges:
+            return JSONResponse(
+                status_code=400,
+                content={"status": False, "message": "Duplicate Transaction Reference"}
+            )
+        declined = random.random() < failure_rate
+        charges[reference] = {
+            "reference": reference,
+            "amount": body["amount"],
+            "status": "failed" if declined else "success",
+            "gateway_response": "Declined" if declined else "Approved"
+        }
+        return {"status": True, "message": "Charge attempted", "data": charges[reference]}
+
+    @app.get("/transaction/verify/{reference}")
+    async def verify(reference: str, authorization: str = Header("")):
+        refused = await answer(authorization)
+        if refused is not None:
+            return refused
+
+        if reference not in charges:
+            return JSONResponse(
+                status_code=404,
+                content={"status": False, "message": "Transaction reference not found"}
+            )
+        return {"status": True, "message": "Verification successful", "data": charges[reference]}
+
+    return app
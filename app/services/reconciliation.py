@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.repositories import payment_repo, scheduled_run_repo
+
+logger = logging.getLogger(__name__)
+
+# Job name the scheduled passes are claimed under
+RECONCILIATION_JOB = "payment_reconciliation"
+
+
+class PaymentReconciler:
+    """Reconciles payments against transactions in two set-based passes.
+
+    One query finds transactions whose captured payments do not add up,
+    the other payments that are orphaned, failed or stuck. Both stream
+    through server-side cursors, so memory stays flat at any volume.
+    Anything younger than `grace` is skipped, since checkouts settle
+    asynchronously.
+    """
+
+    def __init__(
+        self,
+        grace: timedelta,
+        interval: float,
+        batch_size: int,
+        sample_size: int,
+        start_hour: int = 0
+    ):
+        self.grace = grace
+        self.interval = interval
+        self.batch_size = batch_size
+        self.sample_size = sample_size
+        self.start_hour = start_hour
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.skipped = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.next_run: Optional[datetime] = None
+
+    async def reconcile(
+        self,
+        db: AsyncSession,
+        sink: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """Run both passes and return counts by kind plus a sample of
+        discrepancies; every discrepancy is also passed to `sink`"""
+        started = time.monotonic()
+        created_before = datetime.utcnow() - self.grace
+        counts: Dict[str, int] = {}
+        sample: List[Dict[str, Any]] = []
+
+        for stream in (
+            payment_repo.stream_transaction_discrepancies,
+            payment_repo.stream_payment_discrepancies
+        ):
+            async for row in stream(db, created_before=created_before, batch_size=self.batch_size):
+                discrepancy = {
+                    "kind": row.kind,
+                    "transaction_id": row.transaction_id,
+                    "payment_id": row.payment_id,
+                    "expected_amount": _amount(row.expected_amount),
+                    "actual_amount": _amount(row.actual_amount)
+                }
+                counts[row.kind] = counts.get(row.kind, 0) + 1
+                if len(sample) < self.sample_size:
+                    sample.append(discrepancy)
+                if sink is not None:
+                    sink(discrepancy)
+
+        duration = time.monotonic() - started
+        report = {
+            "created_before": created_before.isoformat(),
+            "discrepancies": sum(counts.values()),
+            "by_kind": counts,
+            "sample": sample,
+            "duration_seconds": round(duration, 3)
+        }
+        self.runs += 1
+        self.last_run = report
+        if counts:
+            logger.warning(f"Payment reconciliation found discrepancies: {counts}")
+        return report
+
+    def next_run_after(self, now: datetime) -> datetime:
+        """First scheduled time after `now`: every `interval` seconds on the
+        wall clock, counted from `start_hour` UTC. Restarts do not move it
+        and every worker agrees on it."""
+        anchor = now.replace(hour=self.start_hour, minute=0, second=0, microsecond=0)
+        periods = math.floor((now - anchor).total_seconds() / self.interval) + 1
+        return anchor + timedelta(seconds=periods * self.interval)
+
+    def start(self, session_factory: Callable[[], Awaitable[AsyncSession]]) -> None:
+        """Reconcile on the `interval` schedule on the current event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever(session_factory))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self, session_factory: Callable[[], Awaitable[AsyncSession]]) -> None:
+        while True:
+            self.next_run = self.next_run_after(datetime.utcnow())
+            await asyncio.sleep(max((self.next_run - datetime.utcnow()).total_seconds(), 0))
+            db = await session_factory()
+            try:
+                # Every worker wakes up for the same slot; the first to claim it runs it
+                if await scheduled_run_repo.claim(db, job=RECONCILIATION_JOB, slot=self.next_run):
+                    await db.commit()
+                    await self.reconcile(db)
+                else:
+                    await db.rollback()
+                    self.skipped += 1
+            except Exception as e:
+                logger.error(f"Payment reconciliation failed: {str(e)}")
+            finally:
+                await db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        last_run = self.last_run and {key: value for key, value in self.last_run.items() if key != "sample"}
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval,
+            "next_run": self.next_run and self.next_run.isoformat(),
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "last_run": last_run
+        }
+
+
+def _amount(value: Any) -> Optional[str]:
+    return None if value is None else str(Decimal(value).quantize(Decimal("0.01")))
+
+
+payment_reconciler = PaymentReconciler(
+    grace=timedelta(minutes=settings.RECONCILIATION_GRACE_MINUTES),
+    interval=settings.RECONCILIATION_INTERVAL_SECONDS,
+    batch_size=settings.RECONCILIATION_BATCH_SIZE,
+    sample_size=settings.RECONCILIATION_SAMPLE_SIZE,
+    start_hour=settings.RECONCILIATION_START_HOUR
+)
@@ -13,6 +13,8 @@ from .exceptions import (
     BadRequestException
 )
 from .middleware import request_middleware
+from .cache import TTLCache
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
 
 __all__ = [
     "get_logger",
@@ -27,5 +29,8 @@ __all__ = [
     "UnauthorizedException",
     "ForbiddenException",
     "BadRequestException",
-    "request_middleware"
+    "request_middleware",
+    "TTLCache",
+    "CircuitBreaker",
+    "CircuitOpenError"
 ]
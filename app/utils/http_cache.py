@@ -0,0 +1,223 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+from app.core.config import settings
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    if not accept_encoding:
+        return False
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    tags: FrozenSet[str]
+    expires_at: float
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class ResponseCache:
+    """Per-worker cache of serialized JSON bodies, bounded by total bytes.
+
+    Entries carry tags so repositories can drop everything derived from a
+    table (or a single row) the moment it changes. `on_invalidate` lets the
+    cache invalidation relay pass the tags on to the other workers; a
+    multi-worker deployment without the relay runs with the cache disabled.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, enabled: bool = True):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.on_invalidate: Optional[Callable[[Tuple[str, ...]], None]] = None
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(
+        self,
+        key: str,
+        body: bytes,
+        *,
+        tags: Iterable[str],
+        etag: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            etag=etag or f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"',
+            tags=frozenset(tags),
+            expires_at=time.monotonic() + self.ttl,
+            headers=headers or {}
+        )
+        # Oversized bodies are served but never stored
+        if not self.enabled or len(body) > self.max_bytes // 8:
+            return entry
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self.size += len(body)
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return entry
+
+    def invalidate(self, *tags: str, relay: bool = True) -> None:
+        """Drop every entry carrying one of `tags`; with `relay`, on the
+        other workers too"""
+        if relay and self.on_invalidate is not None:
+            self.on_invalidate(tags)
+        for tag in tags:
+            keys = self._tags.pop(tag, None)
+            if not keys:
+                continue
+            for key in list(keys):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+response_cache = ResponseCache(
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    enabled=settings.RESPONSE_CACHE_ENABLED
+)
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def render_json(schema: Any, data: Any) -> bytes:
+    """Serialize `data` the way FastAPI would for response_model=`schema`"""
+    adapter = _adapter(schema)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+def cache_key(request: Request) -> str:
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+async def cached_json_response(
+    request: Request,
+    *,
+    schema: Any,
+    tags: Iterable[str],
+    load: Callable[[], Awaitable[Any]],
+    etag: Optional[Callable[[Any], str]] = None,
+    headers: Optional[Callable[[Any], Dict[str, str]]] = None
+) -> Optional[Response]:
+    """Serve a read endpoint from the response cache.
+
+    On a miss `load` runs and its result is serialized with `schema`; a
+    None result (e.g. 404) is not cached and None is returned. `etag` may
+    derive the validator from row versions, otherwise the body is hashed.
+    Matching If-None-Match requests get a 304 without touching the database.
+    """
+    key = cache_key(request)
+    entry = response_cache.get(key)
+    cache_status = "HIT"
+
+    if entry is None:
+        cache_status = "MISS"
+        data = await load()
+        if data is None:
+            return None
+        entry = response_cache.set(
+            key,
+            render_json(schema, data),
+            tags=tags,
+            etag=etag(data) if etag else None,
+            headers=headers(data) if headers else None
+        )
+
+    response_headers = {
+        **entry.headers,
+        "ETag": entry.etag,
+        "Cache-Control": f"public, max-age={settings.HTTP_CACHE_MAX_AGE_SECONDS}",
+        "X-Cache": cache_status
+    }
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers)
+    return Response(content=entry.body, media_type="application/json", headers=response_headers)
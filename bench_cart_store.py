@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import statistics
+import sys
+import os
+import time
+import uuid
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+async def run_scans(session_manager, store, product_id: int, scans: int):
+    """
+    Scan one product `scans` times into a fresh guest cart, one session per
+    scan as a request would use, and return per-scan latencies in ms
+    """
+    from app.services.cart_service import CartService
+    from app.models.schemas import CartItemCreate
+
+    session_id = f"bench-{uuid.uuid4().hex[:12]}"
+    item = CartItemCreate(product_id=product_id, quantity=1)
+    latencies = []
+    cart_id = None
+
+    for _ in range(scans):
+        db = await session_manager.get_db_no_ctx()
+        try:
+            service = CartService(db_session=db, store=store)
+            started = time.perf_counter()
+            cart = await service.add_item(item, session_id=session_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+            cart_id = cart.id
+        finally:
+            await db.close()
+
+    flush_ms = 0.0
+    if store:
+        db = await session_manager.get_db_no_ctx()
+        try:
+            started = time.perf_counter()
+            await store.flush(db, [store.key_for(session_id=session_id)])
+            flush_ms = (time.perf_counter() - started) * 1000
+        finally:
+            await db.close()
+
+    return cart_id, latencies, flush_ms
+
+async def remove_carts(session_manager, cart_ids):
+    from sqlalchemy import delete
+    from app.models.db_models import Cart, CartItem
+
+    db = await session_manager.get_db_no_ctx()
+    try:
+        await db.execute(delete(CartItem).where(CartItem.cart_id.in_(cart_ids)))
+        await db.execute(delete(Cart).where(Cart.id.in_(cart_ids)))
+        await db.commit()
+    finally:
+        await db.close()
+
+def report(label: str, latencies, flush_ms: float = 0.0):
+    ordered = sorted(latencies)
+    p95 = ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+    print(
+        f"{label:<10} scans={len(ordered)} mean={statistics.mean(ordered):.2f}ms "
+        f"p50={statistics.median(ordered):.2f}ms p95={p95:.2f}ms max={ordered[-1]:.2f}ms"
+    )
+    if flush_ms:
+        print(f"{'':<10} final flush {flush_ms:.2f}ms")
+
+async def bench(scans: int) -> bool:
+    """
+    Compare scan latency with carts in the database only and in the
+    write-behind memory store
+    """
+    try:
+        from sqlalchemy import select
+        from app.db.session import session_manager
+        from app.db.cart_store import CartStore, MemoryBackend
+        from app.core.config import settings
+        from app.models.db_models import Inventory, Product, ProductStatus
+
+        session_manager.init(settings.DATABASE_URL)
+
+        db = await session_manager.get_db_no_ctx()
+        try:
+            result = await db.execute(
+                select(Product.id)
+                .join(Inventory, Inventory.product_id == Product.id)
+                .where(Product.status == ProductStatus.ACTIVE, Inventory.quantity >= scans)
+                .limit(1)
+            )
+            product_id = result.scalar()
+        finally:
+            await db.close()
+
+        if product_id is None:
+            print(f" No active product with at least {scans} units in stock")
+            return False
+
+        store = CartStore(
+            MemoryBackend(),
+            ttl=settings.CART_STORE_TTL_SECONDS,
+            flush_interval=settings.CART_STORE_FLUSH_INTERVAL_SECONDS,
+            flush_batch_size=settings.CART_STORE_FLUSH_BATCH_SIZE
+        )
+
+        print(f"Scanning product {product_id} {scans} times per backend")
+        db_cart, db_latencies, _ = await run_scans(session_manager, None, product_id, scans)
+        store_cart, store_latencies, flush_ms = await run_scans(session_manager, store, product_id, scans)
+
+        report("database", db_latencies)
+        report("memory", store_latencies, flush_ms)
+
+        await remove_carts(session_manager, [db_cart, store_cart])
+        await session_manager.close()
+        return True
+
+    except Exception as e:
+        print(f" Benchmark failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scan latency with and without the cart store")
+    parser.add_argument("--scans", type=int, default=200, help="scans per backend")
+    args = parser.parse_args()
+
+    if not asyncio.run(bench(args.scans)):
+        sys.exit(1)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import sys
+import os
+import time
+from decimal import Decimal
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+async def create_payments(session_manager, count: int):
+    """
+    Create a throwaway transaction with `count` pending payments and return
+    their (transaction id, payment ids)
+    """
+    from app.models.db_models import Payment, PaymentMethod, PaymentStatus, Transaction
+
+    db = await session_manager.get_db_no_ctx()
+    try:
+        transaction = Transaction(total_amount=Decimal("1.00"), payment_status=PaymentStatus.PENDING)
+        db.add(transaction)
+        await db.flush()
+        payments = [
+            Payment(
+                transaction_id=transaction.id,
+                amount=Decimal("1.00"),
+                method=PaymentMethod.CREDIT_CARD,
+                status=PaymentStatus.PENDING
+            )
+            for _ in range(count)
+        ]
+        db.add_all(payments)
+        await db.commit()
+        return transaction.id, [payment.id for payment in payments]
+    finally:
+        await db.close()
+
+async def remove_payments(session_manager, transaction_id: int):
+    from sqlalchemy import delete
+    from app.models.db_models import Payment, Transaction
+
+    db = await session_manager.get_db_no_ctx()
+    try:
+        await db.execute(delete(Payment).where(Payment.transaction_id == transaction_id))
+        await db.execute(delete(Transaction).where(Transaction.id == transaction_id))
+        await db.commit()
+    finally:
+        await db.close()
+
+def create_gateway(args):
+    """
+    The in-process simulator, or the Paystack client against a stub served
+    at --base-url (or mounted in-process when no URL is given)
+    """
+    from app.services.payment_gateway import SimulatedGateway
+
+    if args.gateway == "simulator":
+        return SimulatedGateway(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            failure_rate=args.failure_rate
+        )
+
+    import httpx
+    from app.core.config import settings
+    from app.services.paystack import create_paystack_gateway
+    from app.services.paystack_stub import create_paystack_stub
+
+    if args.base_url:
+        settings.PAYSTACK_BASE_URL = args.base_url
+        return create_paystack_gateway()
+    stub = create_paystack_stub(latency_ms=args.latency_ms, failure_rate=args.failure_rate)
+    return create_paystack_gateway(transport=httpx.ASGITransport(app=stub))
+
+async def bench(args) -> bool:
+    """
+    Drain a burst of pending payments through the worker pool against the
+    chosen gateway
+    """
+    try:
+        from app.db.session import session_manager
+        from app.core.config import settings
+        from app.services.payment_queue import PaymentQueue
+
+        session_manager.init(settings.DATABASE_URL)
+        transaction_id, payment_ids = await create_payments(session_manager, args.payments)
+
+        gateway = create_gateway(args)
+        await gateway.start()
+        queue = PaymentQueue(
+            gateway=gateway,
+            workers=args.workers,
+            max_size=len(payment_ids),
+            max_attempts=1,
+            retry_delay=0
+        )
+
+        print(
+            f"Charging {len(payment_ids)} payments through {gateway.name} on {args.workers} workers "
+            f"(latency {args.latency_ms}±{args.jitter_ms}ms, failure rate {args.failure_rate})"
+        )
+        started = time.perf_counter()
+        await queue.start(session_manager.get_db_no_ctx)
+        await queue.join()
+        elapsed = time.perf_counter() - started
+        await queue.stop()
+        await gateway.close()
+
+        stats = queue.stats()
+        print(
+            f"approved={stats['approved']} declined={stats['declined']} "
+            f"in {elapsed:.2f}s ({len(payment_ids) / elapsed:.1f} payments/s, "
+            f"mean {stats['mean_seconds_to_settle'] * 1000:.1f}ms from queue to settled)"
+        )
+        print(f"gateway: {gateway.stats()}")
+
+        await remove_payments(session_manager, transaction_id)
+        await session_manager.close()
+        return True
+
+    except Exception as e:
+        print(f" Benchmark failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the payment worker pool against a payment gateway")
+    parser.add_argument("--gateway", choices=["simulator", "paystack"], default="simulator",
+                        help="in-process simulator, or the Paystack client against a stub")
+    parser.add_argument("--base-url", help="Paystack stub to call over HTTP instead of in-process")
+    parser.add_argument("--payments", type=int, default=1000, help="pending payments to charge")
+    parser.add_argument("--workers", type=int, default=8, help="payment workers")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="simulated gateway latency")
+    parser.add_argument("--jitter-ms", type=float, default=100.0, help="simulated latency jitter")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="share of charges declined")
+    args = parser.parse_args()
+
+    if not asyncio.run(bench(args)):
+        sys.exit(1)
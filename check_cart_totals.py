@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import sys
+import os
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+async def check_cart_totals(fix: bool, batch_size: int) -> bool:
+    """
+    Recompute every active cart's subtotal, tax and item count from its lines and
+    report (or repair) carts whose running totals drifted
+    """
+    try:
+        from app.db.session import session_manager
+        from app.core.config import settings
+        from app.services.cart_service import CartService
+
+        session_manager.init(settings.DATABASE_URL)
+
+        async for session in session_manager.get_db():
+            service = CartService(db_session=session, store=None)
+            report = await service.check_totals(fix=fix, batch_size=batch_size)
+            break
+
+        await session_manager.close()
+
+        print(f"Checked: {report['checked']}")
+        print(f"Drifted: {report['drifted']}")
+        for cart_id in report["cart_ids"][:50]:
+            print(f"  cart {cart_id}")
+        if report["drifted"] > 50:
+            print("  ... more carts omitted")
+        if report["drifted"] and fix:
+            print(" Totals recomputed")
+        return fix or report["drifted"] == 0
+
+    except Exception as e:
+        print(f" Check failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check cart running totals against cart lines")
+    parser.add_argument("--fix", action="store_true", help="recompute carts that drifted")
+    parser.add_argument("--batch-size", type=int, default=1000, help="carts compared per query")
+    args = parser.parse_args()
+
+    if not asyncio.run(check_cart_totals(args.fix, args.batch_size)):
+        sys.exit(1)
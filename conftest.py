@@ -0,0 +1,106 @@
+import os
+import sys
+from decimal import Decimal
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+
+async def make_database(products: int = 1, price: Decimal = Decimal("2.00"), payments: int = 0):
+    """Fresh in-memory database with `products` products of 10 in stock at
+    `price` plus 10% tax, and `payments` pending payments, each on its own
+    in-progress transaction. Returns the engine and a session factory."""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.db.base import Base
+    from app.models.db_models import (
+        Inventory,
+        Payment,
+        PaymentMethod,
+        PaymentStatus,
+        Product,
+        ProductCategory,
+        Transaction,
+        TransactionStatus
+    )
+
+    reset_caches()
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+    async with session_factory() as db:
+        for number in range(1, products + 1):
+            product = Product(
+                barcode=f"{number:012d}",
+                sku=f"SKU-{number}",
+                name=f"Product {number}",
+                category=ProductCategory.GROCERY,
+                current_price=price,
+                tax_rate=Decimal("0.1")
+            )
+            db.add(product)
+            await db.flush()
+            db.add(Inventory(product_id=product.id, quantity=10))
+        for payment_id in range(1, payments + 1):
+            db.add(Transaction(
+                id=payment_id,
+                status=TransactionStatus.IN_PROGRESS,
+                subtotal=10,
+                tax_amount=0,
+                total_amount=10,
+                payment_method=PaymentMethod.CREDIT_CARD,
+                payment_status=PaymentStatus.PENDING
+            ))
+            db.add(Payment(
+                id=payment_id,
+                transaction_id=payment_id,
+                amount=10,
+                method=PaymentMethod.CREDIT_CARD,
+                status=PaymentStatus.PENDING
+            ))
+        await db.commit()
+    return engine, session_factory
+
+
+def make_client(session_factory):
+    """HTTP client for the app with its database swapped for `session_factory`"""
+    import httpx
+    from app.main import app
+    from app.api.v1 import dependencies
+
+    async def get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[dependencies.get_db] = get_db
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+        base_url="http://test"
+    )
+
+
+def reset_caches():
+    """Forget everything the process-global caches picked up from earlier
+    test databases, whose ids and versions the next database reuses"""
+    from app.db.cache import product_cache
+    from app.services.catalog_service import CatalogService
+    from app.services.idempotency import idempotency_store
+    from app.utils.http_cache import response_cache
+
+    product_cache.clear()
+    response_cache.clear()
+    idempotency_store._cache.clear()
+    CatalogService._snapshots.clear()
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    reset_caches()
+    yield
+    reset_caches()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import sys
+import os
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+async def import_products(path: str, fmt: str, batch_size: int) -> bool:
+    """
+    Stream a CSV or NDJSON product feed into the catalog
+    """
+    try:
+        from app.db.session import session_manager
+        from app.core.config import settings
+        from app.services.import_service import ProductImportService
+
+        print(f"Importing {path} as {fmt} (batch size {batch_size})")
+
+        session_manager.init(settings.DATABASE_URL)
+
+        async for session in session_manager.get_db():
+            service = ProductImportService(db_session=session)
+            with open(path, encoding="utf-8-sig", newline="") as stream:
+                report = await service.import_stream(stream, fmt=fmt, batch_size=batch_size)
+            break
+
+        await session_manager.close()
+
+        print(f"Processed: {report.processed}")
+        print(f"Written:   {report.upserted}")
+        print(f"Unchanged: {report.unchanged}")
+        print(f"Failed:    {report.failed}")
+        print(f"Duration:  {report.duration_seconds}s")
+        for error in report.errors:
+            print(f"  row {error.row} [{error.barcode or '-'}]: {error.error}")
+        if report.errors_truncated:
+            print("  ... more errors omitted")
+        return report.failed == 0
+
+    except Exception as e:
+        print(f" Import failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import products and inventory")
+    parser.add_argument("path", help="CSV or NDJSON product feed")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=None, help="rows per INSERT ... ON CONFLICT batch")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+
+    from app.core.config import settings
+    success = asyncio.run(
+        import_products(args.path, fmt, args.batch_size or settings.IMPORT_BATCH_SIZE)
+    )
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import sys
+import os
+from datetime import timedelta
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+async def reap_carts(ttl_minutes: int, batch_size: int) -> bool:
+    """
+    Deactivate carts idle longer than the TTL and delete their items
+    """
+    try:
+        from app.db.session import session_manager
+        from app.core.config import settings
+        from app.services.cart_reaper import CartReaper
+
+        print(f"Reaping carts idle for more than {ttl_minutes} minutes (batch size {batch_size})")
+
+        session_manager.init(settings.DATABASE_URL)
+        reaper = CartReaper(
+            idle_ttl=timedelta(minutes=ttl_minutes),
+            batch_size=batch_size,
+            interval=settings.CART_REAPER_INTERVAL_SECONDS,
+            event_retention=timedelta(days=settings.PAYMENT_WEBHOOK_RETENTION_DAYS)
+        )
+
+        async for session in session_manager.get_db():
+            report = await reaper.reap(session)
+            break
+
+        await session_manager.close()
+
+        print(f"Carts deactivated: {report['carts_reaped']}")
+        print(f"Items deleted:     {report['items_deleted']}")
+        print(f"Batches:           {report['batches']}")
+        print(f"Duration:          {report['duration_seconds']}s ({report['carts_per_second']} carts/s)")
+        return True
+
+    except Exception as e:
+        print(f" Reaping failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Deactivate abandoned carts")
+    parser.add_argument("--ttl-minutes", type=int, default=settings.CART_IDLE_TTL_MINUTES, help="idle time before a cart is reaped")
+    parser.add_argument("--batch-size", type=int, default=settings.CART_REAPER_BATCH_SIZE, help="carts per UPDATE batch")
+    args = parser.parse_args()
+
+    if not asyncio.run(reap_carts(args.ttl_minutes, args.batch_size)):
+        sys.exit(1)
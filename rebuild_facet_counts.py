@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+async def rebuild_facet_counts() -> bool:
+    """
+    Recompute product_facet_counts from the products table, repairing counts
+    that drifted from the triggers (e.g. after bulk loads with triggers disabled)
+    """
+    try:
+        from app.db.session import session_manager
+        from app.core.config import settings
+        from app.services.catalog_service import CatalogService
+
+        session_manager.init(settings.DATABASE_URL)
+
+        async for session in session_manager.get_db():
+            report = await CatalogService(session).rebuild_facets()
+            break
+
+        await session_manager.close()
+
+        facets = report["facets"]
+        print(f"Facet rows written: {report['rows']}")
+        print(f"Products:           {facets['total']}")
+        for facet in ("category", "status", "age_restriction"):
+            counts = ", ".join(f"{value}={count}" for value, count in facets[facet].items() if count)
+            print(f"  {facet}: {counts or '-'}")
+        return True
+
+    except Exception as e:
+        print(f" Rebuild failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    if not asyncio.run(rebuild_facet_counts()):
+        sys.exit(1)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import sys
+import os
+from datetime import timedelta
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+async def reconcile_payments(grace_minutes: int, batch_size: int, output: str) -> bool:
+    """
+    Compare payments with transactions and write every discrepancy as a JSON
+    line to the output file
+    """
+    try:
+        from app.db.session import session_manager
+        from app.core.config import settings
+        from app.services.reconciliation import PaymentReconciler
+
+        session_manager.init(settings.DATABASE_URL)
+        reconciler = PaymentReconciler(
+            grace=timedelta(minutes=grace_minutes),
+            interval=settings.RECONCILIATION_INTERVAL_SECONDS,
+            batch_size=batch_size,
+            sample_size=0
+        )
+
+        with open(output, "w") as report_file:
+            def write(discrepancy):
+                report_file.write(json.dumps(discrepancy) + "\n")
+
+            async for session in session_manager.get_db():
+                report = await reconciler.reconcile(session, sink=write)
+                break
+
+        await session_manager.close()
+
+        print(f"Checked rows created before {report['created_before']}")
+        print(f"Discrepancies: {report['discrepancies']}")
+        for kind, count in sorted(report["by_kind"].items()):
+            print(f"  {kind}: {count}")
+        print(f"Duration:      {report['duration_seconds']}s")
+        if report["discrepancies"]:
+            print(f" Report written to {output}")
+        return report["discrepancies"] == 0
+
+    except Exception as e:
+        print(f" Reconciliation failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Reconcile payments against transactions")
+    parser.add_argument("--grace-minutes", type=int, default=settings.RECONCILIATION_GRACE_MINUTES, help="skip rows younger than this, which may still be settling")
+    parser.add_argument("--batch-size", type=int, default=settings.RECONCILIATION_BATCH_SIZE, help="rows fetched per cursor round trip")
+    parser.add_argument("--output", default="reconciliation.jsonl", help="file to write discrepancies to, one JSON object per line")
+    args = parser.parse_args()
+
+    if not asyncio.run(reconcile_payments(args.grace_minutes, args.batch_size, args.output)):
+        sys.exit(1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+from decimal import Decimal
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_database
+
+
+def make_store():
+    from app.db.cart_store import CartStore, MemoryBackend
+    return CartStore(MemoryBackend(), ttl=60, flush_interval=60, flush_batch_size=10)
+
+
+async def holds(db):
+    from sqlalchemy import select
+    from app.models.db_models import InventoryReservation
+
+    result = await db.execute(
+        select(InventoryReservation.product_id, InventoryReservation.quantity)
+        .order_by(InventoryReservation.product_id)
+    )
+    return result.all()
+
+
+async def update_and_remove(store):
+    """Change one line, fail to overdraw it, then remove the other"""
+    from app.models.schemas import CartItemCreate, CartItemUpdate
+    from app.services.cart_service import CartService
+    from app.services.exceptions import InsufficientStockError
+
+    engine, session_factory = await make_database(products=2, price=Decimal("2.50"))
+    try:
+        async with session_factory() as db:
+            carts = CartService(db, store=store)
+            await carts.add_item(CartItemCreate(product_id=1, quantity=2), session_id="lines")
+            await carts.add_item(CartItemCreate(product_id=2, quantity=1), session_id="lines")
+            cart = await carts.get_or_create_cart(session_id="lines")
+            # Stored lines get their ids once flushed
+            await carts.flush_cart(cart.id)
+            cart = await carts.get_or_create_cart(session_id="lines")
+            item_ids = {item.product_id: item.id for item in cart.items}
+            assert await holds(db) == [(1, 2), (2, 1)]
+
+            cart = await carts.update_cart_item(cart.id, item_ids[1], CartItemUpdate(quantity=5))
+            assert await holds(db) == [(1, 5), (2, 1)]
+            assert (await carts.calculate_cart_totals(cart.id))["subtotal"] == Decimal("15.00")
+
+            with pytest.raises(InsufficientStockError):
+                await carts.update_cart_item(cart.id, item_ids[1], CartItemUpdate(quantity=11))
+
+            cart = await carts.remove_item_from_cart(cart.id, item_ids[2])
+            assert [item.product_id for item in cart.items] == [1]
+            assert await holds(db) == [(1, 5)]
+            totals = await carts.calculate_cart_totals(cart.id)
+            assert totals["subtotal"] == Decimal("12.50") and totals["item_count"] == 1
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_update_and_remove_move_holds():
+    await update_and_remove(store=None)
+    print("✓ updating or removing a line moves its stock hold")
+
+
+@pytest.mark.asyncio
+async def test_update_and_remove_through_cart_store():
+    await update_and_remove(store=make_store())
+    print("✓ lines kept in the cart store can be updated and removed")
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing cart line updates...")
+        await test_update_and_remove_move_holds()
+        await test_update_and_remove_through_cart_store()
+        print("\n Cart line updates work correctly!")
+        return True
+    except Exception as e:
+        print(f" Cart line test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_database
+
+
+def make_reaper():
+    from app.services.cart_reaper import CartReaper
+    return CartReaper(
+        idle_ttl=timedelta(minutes=30),
+        batch_size=2,
+        interval=60,
+        event_retention=timedelta(days=7)
+    )
+
+
+async def fill_carts(db, sessions):
+    from app.models.schemas import CartItemCreate
+    from app.services.cart_service import CartService
+
+    carts = CartService(db, store=None)
+    for session_id in sessions:
+        await carts.add_item(CartItemCreate(product_id=1, quantity=1), session_id=session_id)
+        await carts.add_item(CartItemCreate(product_id=2, quantity=2), session_id=session_id)
+
+
+@pytest.mark.asyncio
+async def test_idle_carts_are_reaped_in_batches():
+    """Idle carts are closed and emptied, their holds released; active ones
+    are left alone"""
+    from sqlalchemy import func, select, update
+    from app.db.repositories import reservation_repo
+    from app.models.db_models import Cart, CartItem, InventoryReservation
+
+    engine, session_factory = await make_database(products=2)
+    try:
+        async with session_factory() as db:
+            await fill_carts(db, ["idle-1", "idle-2", "idle-3", "active"])
+            await db.execute(
+                update(Cart)
+                .where(Cart.session_id.like("idle-%"))
+                .values(updated_at=datetime.utcnow() - timedelta(hours=1))
+            )
+            await db.commit()
+            assert await reservation_repo.get_available(db, 2) == 2
+
+            report = await make_reaper().reap(db)
+            assert report["batches"] == 2
+            assert report["carts_reaped"] == 3 and report["items_deleted"] == 6
+
+            active = (await db.execute(
+                select(Cart.session_id).where(Cart.is_active == True)
+            )).scalars().all()
+            assert active == ["active"]
+            assert (await db.execute(select(func.count(CartItem.id)))).scalar() == 2
+            assert (await db.execute(select(func.count(InventoryReservation.id)))).scalar() == 2
+            assert await reservation_repo.get_available(db, 2) == 8
+
+            # Reaped carts keep their totals as the archive
+            archived = (await db.execute(
+                select(Cart.subtotal).where(Cart.session_id == "idle-1")
+            )).scalar()
+            assert archived > 0
+
+            assert (await make_reaper().reap(db))["carts_reaped"] == 0
+        print("✓ idle carts are reaped and their stock released")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing the cart reaper...")
+        await test_idle_carts_are_reaped_in_batches()
+        print("\n Cart reaper works correctly!")
+        return True
+    except Exception as e:
+        print(f" Cart reaper test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
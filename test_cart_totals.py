@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_database
+
+
+async def fill_cart(db, session_id: str) -> int:
+    from app.models.schemas import CartItemCreate
+    from app.services.cart_service import CartService
+
+    carts = CartService(db, store=None)
+    # One line through the single-scan upsert, one through the batch
+    cart = await carts.add_item(CartItemCreate(product_id=1, quantity=2), session_id=session_id)
+    await carts.add_items([CartItemCreate(product_id=2, quantity=1)], session_id=session_id)
+    return cart.id
+
+
+@pytest.mark.asyncio
+async def test_reaped_carts_are_not_drifted():
+    """Reaped carts keep their totals but lose their lines; the totals
+    check must not report or "fix" them"""
+    from sqlalchemy import select, update
+    from app.models.db_models import Cart
+    from app.services.cart_reaper import cart_reaper
+    from app.services.cart_service import CartService
+
+    engine, session_factory = await make_database(products=2, price=Decimal("2.50"))
+    try:
+        async with session_factory() as db:
+            idle_id = await fill_cart(db, "idle")
+            active_id = await fill_cart(db, "active")
+            await db.execute(
+                update(Cart)
+                .where(Cart.id == idle_id)
+                .values(updated_at=datetime.utcnow() - timedelta(days=1))
+            )
+            await db.commit()
+
+            report = await cart_reaper.reap(db)
+            assert report["carts_reaped"] == 1
+
+            checked = await CartService(db, store=None).check_totals(fix=True)
+            assert checked["checked"] == 1
+            assert checked["drifted"] == 0
+
+            archived = (await db.execute(select(Cart.subtotal).where(Cart.id == idle_id))).scalar()
+            assert archived == Decimal("7.50")
+        print(f"✓ reaped cart {idle_id} is skipped, active cart {active_id} is consistent")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_tax_rate_change_is_not_drift():
+    """Lines keep the tax rate they were scanned at"""
+    from sqlalchemy import update
+    from app.models.db_models import Product
+    from app.services.cart_service import CartService
+
+    engine, session_factory = await make_database(products=2, price=Decimal("2.50"))
+    try:
+        async with session_factory() as db:
+            cart_id = await fill_cart(db, "rate-change")
+            await db.execute(update(Product).values(tax_rate=Decimal("0.2")))
+            await db.commit()
+
+            service = CartService(db, store=None)
+            assert (await service.check_totals())["drifted"] == 0
+            totals = await service.calculate_cart_totals(cart_id)
+            assert totals["tax"] == Decimal("0.75")
+        print("✓ a product's new tax rate leaves scanned lines unchanged")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_drifted_totals_are_found_and_fixed():
+    from sqlalchemy import update
+    from app.models.db_models import Cart
+    from app.services.cart_service import CartService
+
+    engine, session_factory = await make_database(products=2, price=Decimal("2.50"))
+    try:
+        async with session_factory() as db:
+            cart_id = await fill_cart(db, "drifted")
+            await db.execute(update(Cart).where(Cart.id == cart_id).values(subtotal=1, item_count=5))
+            await db.commit()
+
+            service = CartService(db, store=None)
+            report = await service.check_totals(fix=True, batch_size=1)
+            assert report["cart_ids"] == [cart_id]
+            assert (await service.check_totals())["drifted"] == 0
+            totals = await service.calculate_cart_totals(cart_id)
+            assert totals["subtotal"] == Decimal("7.50") and totals["item_count"] == 2
+        print("✓ drifted running totals are found and recomputed")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing cart running totals...")
+        await test_reaped_carts_are_not_drifted()
+        await test_tax_rate_change_is_not_drift()
+        await test_drifted_totals_are_found_and_fixed()
+        print("\n Cart totals check works correctly!")
+        return True
+    except Exception as e:
+        print(f" Cart totals test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
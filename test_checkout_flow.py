@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+from decimal import Decimal
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_database
+
+
+class FixedGateway:
+    """Gateway that approves or declines every charge"""
+
+    def __init__(self, approved: bool):
+        self.approved = approved
+
+    async def charge(self, request):
+        from app.services.payment_gateway import ChargeResult
+        return ChargeResult(self.approved, f"test-{request.reference}", None if self.approved else "Declined")
+
+
+class FailingGateway:
+    """Gateway whose charges never return an outcome"""
+
+    async def charge(self, request):
+        raise TimeoutError("gateway timed out")
+
+
+async def checkout(session_factory, session_id: str, gateway):
+    """Scan two units and check out inline through `gateway`"""
+    from app.models.db_models import PaymentMethod
+    from app.models.schemas import CartItemCreate
+    from app.services.cart_service import CartService
+    from app.services.checkout_service import CheckoutService
+
+    async with session_factory() as db:
+        carts = CartService(db, store=None)
+        await carts.add_item(CartItemCreate(product_id=1, quantity=2), session_id=session_id)
+
+        service = CheckoutService(db, store=None, queue=None)
+        service.payments.gateway = gateway
+        return await service.checkout(
+            payment_method=PaymentMethod.CREDIT_CARD,
+            payment_details={"last_four_digits": "4242"},
+            session_id=session_id
+        )
+
+
+async def stock_and_cart(session_factory, session_id: str):
+    from sqlalchemy import select
+    from app.db.repositories import cart_repo
+    from app.models.db_models import Inventory
+
+    async with session_factory() as db:
+        quantity = (await db.execute(select(Inventory.quantity).where(Inventory.product_id == 1))).scalar()
+        totals = await cart_repo.get_totals_by_owner(db, session_id=session_id)
+        return quantity, totals
+
+
+@pytest.mark.asyncio
+async def test_approved_checkout_completes_transaction():
+    """Checkout -> settle: an approved charge completes the transaction"""
+    from app.models.db_models import PaymentStatus, TransactionStatus
+
+    engine, session_factory = await make_database()
+    try:
+        result = await checkout(session_factory, "approved", FixedGateway(True))
+        transaction, payment = result["transaction"], result["payment"]
+        assert transaction.status == TransactionStatus.COMPLETED
+        assert transaction.payment_status == PaymentStatus.COMPLETED
+        assert transaction.completed_at is not None
+        assert payment.status == PaymentStatus.COMPLETED
+        assert payment.last_four_digits == "4242"
+        assert result["receipt_number"]
+        assert [item.tax_rate for item in transaction.items] == [Decimal("0.1")]
+
+        quantity, totals = await stock_and_cart(session_factory, "approved")
+        assert quantity == 8
+        assert totals is None  # the cart was closed
+        print("✓ approved checkout completes the transaction and takes stock")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_declined_checkout_unwinds():
+    """Checkout -> settle -> unwind: a declined charge cancels the
+    transaction, restocks it and reopens the cart with its holds"""
+    from sqlalchemy import select
+    from app.models.db_models import InventoryReservation, PaymentStatus, TransactionStatus
+
+    engine, session_factory = await make_database()
+    try:
+        result = await checkout(session_factory, "declined", FixedGateway(False))
+        transaction, payment = result["transaction"], result["payment"]
+        assert transaction.status == TransactionStatus.CANCELLED
+        assert transaction.payment_status == PaymentStatus.FAILED
+        assert transaction.completed_at is None
+        assert payment.status == PaymentStatus.FAILED
+        assert result["receipt_number"] is None
+
+        quantity, totals = await stock_and_cart(session_factory, "declined")
+        assert quantity == 10
+        assert totals["item_count"] == 1 and totals["subtotal"] == Decimal("4.00")
+        async with session_factory() as db:
+            held = (await db.execute(select(InventoryReservation.quantity))).scalars().all()
+        assert held == [2]
+        print("✓ declined checkout cancels, restocks and reopens the cart")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_gateway_error_leaves_payment_pending():
+    """A charge whose outcome is unknown is neither completed nor unwound"""
+    from app.models.db_models import PaymentStatus, TransactionStatus
+
+    engine, session_factory = await make_database()
+    try:
+        result = await checkout(session_factory, "timeout", FailingGateway())
+        assert result["transaction"].status == TransactionStatus.IN_PROGRESS
+        assert result["payment"].status == PaymentStatus.PENDING
+        quantity, _ = await stock_and_cart(session_factory, "timeout")
+        assert quantity == 8
+        print("✓ gateway error leaves the payment pending")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing checkout -> settle -> unwind...")
+        await test_approved_checkout_completes_transaction()
+        await test_declined_checkout_unwinds()
+        await test_gateway_error_leaves_payment_pending()
+        print("\n Checkout flow works correctly!")
+        return True
+    except Exception as e:
+        print(f" Checkout flow test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+from decimal import Decimal
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_client, make_database
+
+
+async def change_price(session_factory, product_id: int, price: str):
+    from sqlalchemy import select
+    from app.db.repositories import product_repo
+    from app.models.db_models import Product
+
+    async with session_factory() as db:
+        product = (await db.execute(select(Product).where(Product.id == product_id))).scalar_one()
+        await product_repo.update(db, db_obj=product, obj_in={"current_price": Decimal(price)})
+
+
+@pytest.mark.asyncio
+async def test_product_is_revalidated_with_etag():
+    """A matching If-None-Match gets a 304 from the response cache until the
+    product changes"""
+    engine, session_factory = await make_database(products=1)
+    try:
+        async with make_client(session_factory) as client:
+            first = await client.get("/api/v1/products/1")
+            assert first.status_code == 200 and first.headers["x-cache"] == "MISS"
+            etag = first.headers["etag"]
+
+            again = await client.get("/api/v1/products/1", headers={"If-None-Match": etag})
+            assert again.status_code == 304 and again.content == b""
+            assert again.headers["etag"] == etag and again.headers["x-cache"] == "HIT"
+
+            await change_price(session_factory, 1, "3.00")
+            changed = await client.get("/api/v1/products/1", headers={"If-None-Match": etag})
+            assert changed.status_code == 200 and changed.headers["x-cache"] == "MISS"
+            assert changed.headers["etag"] != etag
+            assert Decimal(changed.json()["current_price"]) == Decimal("3.00")
+
+            missing = await client.get("/api/v1/products/99")
+            assert missing.status_code == 404
+        print("✓ product responses are revalidated by ETag")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_revalidated_by_catalog_version():
+    engine, session_factory = await make_database(products=2)
+    try:
+        async with make_client(session_factory) as client:
+            first = await client.get("/api/v1/products/snapshot")
+            assert first.status_code == 200
+            etag = first.headers["etag"]
+            assert etag == f'"catalog-{first.headers["x-catalog-version"]}"'
+
+            again = await client.get("/api/v1/products/snapshot", headers={"If-None-Match": etag})
+            assert again.status_code == 304
+
+            await change_price(session_factory, 2, "1.00")
+            changed = await client.get("/api/v1/products/snapshot", headers={"If-None-Match": etag})
+            assert changed.status_code == 200 and changed.headers["etag"] != etag
+        print("✓ catalog snapshots are revalidated by catalog version")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing conditional requests...")
+        await test_product_is_revalidated_with_etag()
+        await test_snapshot_is_revalidated_by_catalog_version()
+        print("\n Conditional requests work correctly!")
+        return True
+    except Exception as e:
+        print(f" Conditional request test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
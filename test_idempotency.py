@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_client, make_database
+
+PAYMENT = {"method": "credit_card", "amount": "4.40", "last_four_digits": "4242"}
+
+
+async def count_transactions(session_factory) -> int:
+    from sqlalchemy import func, select
+    from app.models.db_models import Transaction
+
+    async with session_factory() as db:
+        return (await db.execute(select(func.count(Transaction.id)))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_checkout_is_replayed():
+    """A checkout retried with the same Idempotency-Key returns the recorded
+    response and does not run again"""
+    engine, session_factory = await make_database()
+    try:
+        async with make_client(session_factory) as client:
+            headers = {"X-Session-ID": "replay", "Idempotency-Key": "checkout-1"}
+            await client.post("/api/v1/cart/items", json={"product_id": 1, "quantity": 2}, headers=headers)
+
+            first = await client.post("/api/v1/payment/checkout", json=PAYMENT, headers=headers)
+            assert first.status_code == 200
+            assert "idempotent-replayed" not in first.headers
+
+            retries = await asyncio.gather(*[
+                client.post("/api/v1/payment/checkout", json=PAYMENT, headers=headers) for _ in range(3)
+            ])
+            for retry in retries:
+                assert retry.status_code == 200
+                assert retry.headers["idempotent-replayed"] == "true"
+                assert retry.json() == first.json()
+
+            changed = await client.post(
+                "/api/v1/payment/checkout", json={**PAYMENT, "amount": "1.00"}, headers=headers
+            )
+            assert changed.status_code == 409
+
+        assert await count_transactions(session_factory) == 1
+        print("✓ retried checkout is replayed, a reused key with another body is refused")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_key_kept_when_failing_after_commit():
+    """A checkout that fails after its work committed keeps its key, so the
+    retry replays the committed checkout instead of running again"""
+    from app.services import checkout_service
+
+    engine, session_factory = await make_database()
+    publish = checkout_service.cart_events.publish
+
+    async def failing_publish(*args, **kwargs):
+        raise RuntimeError("event bus unavailable")
+
+    try:
+        async with make_client(session_factory) as client:
+            headers = {"X-Session-ID": "after-commit", "Idempotency-Key": "checkout-2"}
+            await client.post("/api/v1/cart/items", json={"product_id": 1, "quantity": 2}, headers=headers)
+
+            checkout_service.cart_events.publish = failing_publish
+            try:
+                failed = await client.post("/api/v1/payment/checkout", json=PAYMENT, headers=headers)
+            finally:
+                checkout_service.cart_events.publish = publish
+            assert failed.status_code == 500
+
+            from app.services.idempotency import idempotency_store
+            idempotency_store._cache.clear()
+            retry = await client.post("/api/v1/payment/checkout", json=PAYMENT, headers=headers)
+            assert retry.status_code == 200
+            assert retry.headers["idempotent-replayed"] == "true"
+            assert retry.json()["transaction"]["status"] == "completed"
+
+        assert await count_transactions(session_factory) == 1
+        print("✓ a key whose work committed is kept and replayed")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_key_released_when_nothing_committed():
+    """A refused checkout is recorded, a failed one releases its key"""
+    from app.services import checkout_service
+
+    engine, session_factory = await make_database()
+    close_for_checkout = checkout_service.cart_repo.close_for_checkout
+
+    async def failing_close(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    try:
+        async with make_client(session_factory) as client:
+            headers = {"X-Session-ID": "released", "Idempotency-Key": "checkout-3"}
+            empty = await client.post("/api/v1/payment/checkout", json=PAYMENT, headers=headers)
+            assert empty.status_code == 400
+            replay = await client.post("/api/v1/payment/checkout", json=PAYMENT, headers=headers)
+            assert replay.headers["idempotent-replayed"] == "true"
+
+            headers["Idempotency-Key"] = "checkout-4"
+            await client.post("/api/v1/cart/items", json={"product_id": 1, "quantity": 2}, headers=headers)
+            checkout_service.cart_repo.close_for_checkout = failing_close
+            try:
+                failed = await client.post("/api/v1/payment/checkout", json=PAYMENT, headers=headers)
+            finally:
+                checkout_service.cart_repo.close_for_checkout = close_for_checkout
+            assert failed.status_code == 500
+
+            retry = await client.post("/api/v1/payment/checkout", json=PAYMENT, headers=headers)
+            assert retry.status_code == 200
+            assert "idempotent-replayed" not in retry.headers
+
+        assert await count_transactions(session_factory) == 1
+        print("✓ a key without committed work is released for the retry")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing idempotent checkout...")
+        await test_checkout_is_replayed()
+        await test_key_kept_when_failing_after_commit()
+        await test_key_released_when_nothing_committed()
+        print("\n Idempotency-Key handling works correctly!")
+        return True
+    except Exception as e:
+        print(f" Idempotency test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
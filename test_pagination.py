@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_client, make_database
+
+
+async def list_pages(client, **params):
+    """Follow X-Next-Cursor to the end; the ids of each page"""
+    pages = []
+    cursor = None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/v1/products/", params=query)
+        assert response.status_code == 200
+        pages.append([product["id"] for product in response.json()])
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return pages
+
+
+@pytest.mark.asyncio
+async def test_cursor_walks_the_whole_listing():
+    engine, session_factory = await make_database(products=5)
+    try:
+        async with make_client(session_factory) as client:
+            assert await list_pages(client, limit=2) == [[1, 2], [3, 4], [5]]
+            assert await list_pages(client, limit=5) == [[1, 2, 3, 4, 5], []]
+            assert await list_pages(client, limit=3, category="GROCERY") == [[1, 2, 3], [4, 5]]
+        print("✓ cursors walk every product exactly once")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_cursor_is_stable_under_deletes():
+    """Deleting a product already listed does not shift the next page the
+    way an offset would"""
+    from app.db.repositories import product_repo
+
+    engine, session_factory = await make_database(products=5)
+    try:
+        async with make_client(session_factory) as client:
+            first = await client.get("/api/v1/products/", params={"limit": 2})
+            async with session_factory() as db:
+                await product_repo.delete(db, id=1)
+            second = await client.get(
+                "/api/v1/products/", params={"limit": 2, "cursor": first.headers["x-next-cursor"]}
+            )
+            assert [product["id"] for product in second.json()] == [3, 4]
+        print("✓ cursors are stable while products are deleted")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_bad_cursors_are_refused():
+    engine, session_factory = await make_database(products=1)
+    try:
+        async with make_client(session_factory) as client:
+            malformed = await client.get("/api/v1/products/", params={"cursor": "not-a-cursor"})
+            assert malformed.status_code == 400
+            with_search = await client.get(
+                "/api/v1/products/", params={"search": "Product", "cursor": "WzFd"}
+            )
+            assert with_search.status_code == 400
+        print("✓ malformed cursors and cursors on search are refused")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing product pagination...")
+        await test_cursor_walks_the_whole_listing()
+        await test_cursor_is_stable_under_deletes()
+        await test_bad_cursors_are_refused()
+        print("\n Product pagination works correctly!")
+        return True
+    except Exception as e:
+        print(f" Pagination test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+import asyncio
+import hashlib
+import hmac
+import json
+import sys
+import os
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_database
+
+SECRET = "sk_test_webhooks"
+
+
+async def make_webhook_database(payments: int):
+    """Database with `payments` pending payments, and a session opener for
+    the buffer"""
+    engine, session_factory = await make_database(products=0, payments=payments)
+
+    async def open_session():
+        return session_factory()
+
+    return engine, session_factory, open_session
+
+
+def make_buffer():
+    from app.services.payment_webhooks import PaymentWebhookBuffer
+    return PaymentWebhookBuffer(
+        secret=SECRET,
+        max_size=100,
+        batch_size=50,
+        flush_interval=0.01,
+        dedup_size=100,
+        dedup_ttl=60,
+        max_attempts=2,
+        retry_delay=0.01
+    )
+
+
+def signed(payment_id: int, status: str = "success"):
+    """Body and signature of a Paystack charge webhook for a payment"""
+    body = json.dumps({
+        "event": "charge.success" if status == "success" else "charge.failed",
+        "data": {"reference": f"pay-{payment_id}", "status": status, "gateway_response": status}
+    }).encode()
+    return body, hmac.new(SECRET.encode(), body, hashlib.sha512).hexdigest()
+
+
+async def stored_events(session_factory):
+    from sqlalchemy import select
+    from app.models.db_models import PaymentWebhookEvent
+
+    async with session_factory() as db:
+        result = await db.execute(
+            select(PaymentWebhookEvent.reference, PaymentWebhookEvent.status)
+            .order_by(PaymentWebhookEvent.reference)
+        )
+        return {row[0]: row[1].value for row in result.all()}
+
+
+async def statuses(session_factory):
+    from sqlalchemy import select
+    from app.models.db_models import Payment, Transaction
+
+    async with session_factory() as db:
+        result = await db.execute(
+            select(Payment.id, Payment.status, Transaction.status)
+            .join(Transaction, Transaction.id == Payment.transaction_id)
+            .order_by(Payment.id)
+        )
+        return {row[0]: (row[1].value, row[2].value) for row in result.all()}
+
+
+@pytest.mark.asyncio
+async def test_webhook_signature_is_checked():
+    from app.services.exceptions import WebhookSignatureError
+
+    body, _ = signed(1)
+    buffer = make_buffer()
+    with pytest.raises(WebhookSignatureError):
+        await buffer.receive(body, "0" * 128)
+    with pytest.raises(WebhookSignatureError):
+        await buffer.receive(body, None)
+    print("✓ unsigned or mis-signed webhooks are refused")
+
+
+@pytest.mark.asyncio
+async def test_redeliveries_are_applied_once():
+    """Duplicates are dropped while buffered, after being applied, and by
+    the stored events once the in-memory record is gone"""
+    engine, session_factory, open_session = await make_webhook_database(payments=1)
+    try:
+        buffer = make_buffer()
+        buffer._session_factory = open_session
+        assert await buffer.receive(*signed(1)) is True
+        assert await buffer.receive(*signed(1)) is False  # still buffered
+        assert await stored_events(session_factory) == {"pay-1": "received"}
+
+        assert await buffer.flush() == 1
+        assert buffer.stats()["applied"] == 1
+        assert await statuses(session_factory) == {1: ("completed", "completed")}
+        assert await stored_events(session_factory) == {"pay-1": "applied"}
+
+        assert await buffer.receive(*signed(1)) is False  # applied moments ago
+        assert buffer.stats()["duplicates"] == 2
+
+        # Another worker, or this one after a restart, has not seen it
+        fresh = make_buffer()
+        fresh._session_factory = open_session
+        assert await fresh.receive(*signed(1, status="failed")) is False
+        assert fresh.stats()["duplicates"] == 1
+        assert await statuses(session_factory) == {1: ("completed", "completed")}
+        print("✓ redelivered webhooks are applied exactly once")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_acknowledged_events_survive_a_restart():
+    """Events stored but never flushed are applied by the next buffer"""
+    engine, session_factory, open_session = await make_webhook_database(payments=2)
+    try:
+        lost = make_buffer()
+        lost._session_factory = open_session
+        assert await lost.receive(*signed(1)) is True
+        assert await lost.receive(*signed(2, status="failed")) is True
+
+        restarted = make_buffer()
+        restarted._session_factory = open_session
+        assert await restarted.recover() == 2
+        assert await restarted.flush() == 2
+        assert await statuses(session_factory) == {
+            1: ("completed", "completed"),
+            2: ("failed", "cancelled")
+        }
+        assert await stored_events(session_factory) == {"pay-1": "applied", "pay-2": "applied"}
+        assert await restarted.recover() == 0
+        print("✓ acknowledged webhooks are applied after a restart")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failing_event_does_not_block_batch():
+    """A batch that fails is applied event by event; the event that keeps
+    failing is dead-lettered and its payment left pending"""
+    from app.services import payment_webhooks
+
+    engine, session_factory, open_session = await make_webhook_database(payments=3)
+    settle_many = payment_webhooks.PaymentService.settle_many
+
+    async def settle_failing_on_2(self, outcomes, before_commit=None):
+        if any(payment_id == 2 for payment_id, _ in outcomes):
+            raise RuntimeError("cannot settle payment 2")
+        return await settle_many(self, outcomes, before_commit=before_commit)
+
+    payment_webhooks.PaymentService.settle_many = settle_failing_on_2
+    try:
+        buffer = make_buffer()
+        buffer._session_factory = open_session
+        for payment_id in (1, 2, 3):
+            await buffer.receive(*signed(payment_id))
+        buffer.start(open_session)
+        for _ in range(100):
+            if buffer.stats()["dead_lettered"]:
+                break
+            await asyncio.sleep(0.01)
+        await buffer.stop()
+
+        assert await stored_events(session_factory) == {
+            "pay-1": "applied", "pay-2": "dead_letter", "pay-3": "applied"
+        }
+        assert buffer.stats()["applied"] == 2
+        assert await statuses(session_factory) == {
+            1: ("completed", "completed"),
+            2: ("pending", "in_progress"),
+            3: ("completed", "completed")
+        }
+        print("✓ a failing webhook is retried, then dead-lettered without blocking others")
+    finally:
+        payment_webhooks.PaymentService.settle_many = settle_many
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_processed_webhook_events_are_purged():
+    from datetime import datetime, timedelta
+    from sqlalchemy import select
+    from app.db.repositories import webhook_event_repo
+    from app.services.cart_reaper import CartReaper
+    from app.models.db_models import PaymentWebhookEvent, WebhookEventStatus
+
+    engine, session_factory = await make_database(products=0)
+    try:
+        async with session_factory() as db:
+            for reference in ("old", "recent", "dead", "waiting"):
+                await webhook_event_repo.record(db, reference=reference, approved=True, message=None)
+            await db.commit()
+            ids = dict((await db.execute(
+                select(PaymentWebhookEvent.reference, PaymentWebhookEvent.id)
+            )).all())
+            await webhook_event_repo.mark(db, [ids["old"], ids["recent"]], WebhookEventStatus.APPLIED)
+            await webhook_event_repo.dead_letter(db, id=ids["dead"], attempts=5, error="boom")
+            await db.commit()
+            for reference in ("old", "dead"):
+                event = await db.get(PaymentWebhookEvent, ids[reference])
+                event.processed_at = datetime.utcnow() - timedelta(days=8)
+            await db.commit()
+
+            reaper = CartReaper(
+                idle_ttl=timedelta(minutes=30), batch_size=2, interval=60, event_retention=timedelta(days=7)
+            )
+            report = await reaper.reap(db)
+            assert report["events_purged"] == 1
+            left = (await db.execute(
+                select(PaymentWebhookEvent.reference).order_by(PaymentWebhookEvent.reference)
+            )).scalars().all()
+            assert left == ["dead", "recent", "waiting"]
+        print("✓ applied webhook events are purged after their retention")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing payment webhooks...")
+        await test_webhook_signature_is_checked()
+        await test_redeliveries_are_applied_once()
+        await test_acknowledged_events_survive_a_restart()
+        await test_failing_event_does_not_block_batch()
+        await test_processed_webhook_events_are_purged()
+        print("\n Payment webhooks work correctly!")
+        return True
+    except Exception as e:
+        print(f" Payment webhook test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+
+def make_client(handler, threshold: int = 2, reset_timeout: float = 0.05, max_retries: int = 0):
+    """Paystack client answering through `handler` instead of the network"""
+    import httpx
+    from app.services.paystack import PaystackClient
+    from app.utils.circuit_breaker import CircuitBreaker
+
+    return PaystackClient(
+        "sk_test",
+        "https://paystack.test",
+        timeout=httpx.Timeout(5),
+        limits=httpx.Limits(),
+        max_retries=max_retries,
+        retry_backoff=0,
+        breaker=CircuitBreaker(failure_threshold=threshold, reset_timeout=reset_timeout),
+        transport=httpx.MockTransport(handler)
+    )
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_recovers():
+    """Failures open the circuit, calls then fail fast, and one successful
+    trial after the timeout closes it"""
+    import httpx
+    from app.services.paystack import PaystackError
+    from app.utils.circuit_breaker import CircuitOpenError
+
+    up = False
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, json={"status": True}) if up else httpx.Response(503)
+
+    client = make_client(handler)
+    try:
+        for _ in range(2):
+            with pytest.raises(PaystackError):
+                await client.request("GET", "/ping")
+        assert client.breaker.state == "open"
+
+        with pytest.raises(CircuitOpenError):
+            await client.request("GET", "/ping")
+        assert calls == 2 and client.breaker.rejected == 1
+
+        await asyncio.sleep(0.06)
+        assert client.breaker.state == "half_open"
+        up = True
+        assert await client.request("GET", "/ping") == {"status": True}
+        assert client.breaker.state == "closed" and client.breaker.trips == 1
+        print("✓ the circuit opens on failures and closes after a good trial")
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_does_not_wedge_the_breaker():
+    import httpx
+    from app.utils.circuit_breaker import CircuitOpenError
+
+    answer = asyncio.Event()
+
+    async def handler(request):
+        await answer.wait()
+        return httpx.Response(200, json={"status": True})
+
+    client = make_client(handler, threshold=1, reset_timeout=0)
+    client.breaker.record_failure()
+    try:
+        trial = asyncio.create_task(client.request("GET", "/ping"))
+        await asyncio.sleep(0.01)
+        # Only the one trial goes through while half open
+        with pytest.raises(CircuitOpenError):
+            await client.request("GET", "/ping")
+
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        answer.set()
+        assert await client.request("GET", "/ping") == {"status": True}
+        assert client.breaker.state == "closed"
+        print("✓ a cancelled trial lets the next call try again")
+    finally:
+        await client.close()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing the Paystack client...")
+        await test_breaker_opens_and_recovers()
+        await test_cancelled_trial_does_not_wedge_the_breaker()
+        print("\n Paystack client works correctly!")
+        return True
+    except Exception as e:
+        print(f" Paystack client test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
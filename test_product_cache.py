@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+from decimal import Decimal
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_database
+
+
+@pytest.mark.asyncio
+async def test_writes_invalidate_cached_products():
+    """Lookups after an update or a barcode change see the database, and a
+    cached product never joins the session that read it"""
+    from sqlalchemy import inspect, select
+    from app.db.cache import product_cache
+    from app.db.repositories import product_repo
+    from app.models.db_models import Product
+
+    engine, session_factory = await make_database(products=1)
+    try:
+        async with session_factory() as db:
+            assert (await product_repo.get(db, 1)).current_price == Decimal("2.00")
+            hits = product_cache.hits
+            cached = await product_repo.get_by_barcode(db, "000000000001")
+            assert product_cache.hits == hits + 1
+            assert inspect(cached).detached and cached not in db
+
+            product = (await db.execute(select(Product).where(Product.id == 1))).scalar_one()
+            await product_repo.update(db, db_obj=product, obj_in={"current_price": Decimal("3.00")})
+            assert (await product_repo.get(db, 1)).current_price == Decimal("3.00")
+
+            await product_repo.update(db, db_obj=product, obj_in={"barcode": "000000000099"})
+            assert await product_repo.get_by_barcode(db, "000000000001") is None
+            assert (await product_repo.get_by_barcode(db, "000000000099")).id == 1
+        print("✓ updates invalidate cached products")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_cached_products_expire():
+    from app.db.cache import ProductCache
+    from app.db.repositories import product_repo
+
+    engine, session_factory = await make_database(products=1)
+    try:
+        async with session_factory() as db:
+            product = await product_repo.get(db, 1)
+        cache = ProductCache(maxsize=10, ttl=0.05)
+        cache.put(product)
+        assert cache.get_by_id(1)["current_price"] == Decimal("2.00")
+        assert cache.get_by_barcode("000000000001") is not None
+
+        await asyncio.sleep(0.1)
+        assert cache.get_by_id(1) is None
+        assert cache.get_by_barcode("000000000001") is None
+        assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+        cache.enabled = False
+        cache.put(product)
+        assert cache.get_by_id(1) is None and cache.stats()["size"] == 0
+        print("✓ cached products expire after their TTL")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing the product cache...")
+        await test_writes_invalidate_cached_products()
+        await test_cached_products_expire()
+        print("\n Product cache works correctly!")
+        return True
+    except Exception as e:
+        print(f" Product cache test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import asyncio
+import io
+import json
+import sys
+import os
+from decimal import Decimal
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_database
+
+HEADER = "barcode,sku,name,category,current_price,quantity\n"
+
+
+def feed(prices: dict, quantity: int = 5) -> io.StringIO:
+    """CSV feed of one product per barcode suffix at the given price"""
+    lines = [
+        f"{number:012d},IMP-{number},Imported {number},grocery,{price},{quantity}\n"
+        for number, price in prices.items()
+    ]
+    return io.StringIO(HEADER + "".join(lines))
+
+
+async def catalog(db):
+    """barcode -> (price, catalog_version, stock)"""
+    from sqlalchemy import select
+    from app.models.db_models import Inventory, Product
+
+    result = await db.execute(
+        select(Product.barcode, Product.current_price, Product.catalog_version, Inventory.quantity)
+        .join(Inventory, Inventory.product_id == Product.id)
+        .order_by(Product.barcode)
+    )
+    return {barcode: (price, version, stock) for barcode, price, version, stock in result.all()}
+
+
+@pytest.mark.asyncio
+async def test_reimport_writes_only_changed_rows():
+    """Unchanged rows are left alone and do not bump the catalog version;
+    changed rows are stamped with one new version"""
+    from app.db.repositories import product_repo
+    from app.services.import_service import ProductImportService
+
+    engine, session_factory = await make_database(products=0)
+    try:
+        async with session_factory() as db:
+            service = ProductImportService(db)
+            report = await service.import_stream(feed({1: "1.00", 2: "2.00", 3: "3.00"}), batch_size=2)
+            assert (report.processed, report.upserted, report.unchanged) == (3, 3, 0)
+            version = await product_repo.get_catalog_version(db)
+
+            report = await service.import_stream(feed({1: "1.00", 2: "2.00", 3: "3.00"}), batch_size=2)
+            assert (report.upserted, report.unchanged) == (0, 3)
+            assert await product_repo.get_catalog_version(db) == version
+
+            report = await service.import_stream(feed({1: "1.00", 2: "2.50", 3: "3.00"}, quantity=7))
+            assert (report.upserted, report.unchanged) == (1, 2)
+            rows = await catalog(db)
+            assert rows["000000000002"] == (Decimal("2.50"), version + 1, 7)
+            assert rows["000000000001"][1] <= version and rows["000000000001"][2] == 7
+        print("✓ re-importing a feed writes only the rows that changed")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_bad_rows_are_reported_and_skipped():
+    from app.services.import_service import ProductImportService
+
+    engine, session_factory = await make_database(products=0)
+    lines = [
+        json.dumps({"barcode": "000000000001", "sku": "IMP-1", "name": "First", "category": "grocery", "current_price": "1.00"}),
+        "{not json",
+        json.dumps({"barcode": "000000000002", "sku": "IMP-2", "name": "Free", "category": "grocery", "current_price": "0"}),
+        json.dumps({"barcode": "000000000001", "sku": "IMP-1", "name": "First", "category": "grocery", "current_price": "1.25", "quantity": 3})
+    ]
+    try:
+        async with session_factory() as db:
+            report = await ProductImportService(db).import_stream(io.StringIO("\n".join(lines)), fmt="ndjson")
+            assert report.processed == 4 and report.failed == 2
+            assert [error.row for error in report.errors] == [2, 3]
+            # The later row for a barcode wins within its batch
+            assert await catalog(db) == {"000000000001": (Decimal("1.25"), 1, 3)}
+        print("✓ bad rows are reported without stopping the import")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing product imports...")
+        await test_reimport_writes_only_changed_rows()
+        await test_bad_rows_are_reported_and_skipped()
+        print("\n Product imports work correctly!")
+        return True
+    except Exception as e:
+        print(f" Product import test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
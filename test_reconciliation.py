@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_database
+
+
+def make_reconciler(interval: float = 3600):
+    from app.services.reconciliation import PaymentReconciler
+    return PaymentReconciler(grace=timedelta(minutes=15), interval=interval, batch_size=2, sample_size=10)
+
+
+async def add_sales(db):
+    """One sale per kind of discrepancy, plus a clean one and a recent one"""
+    from app.models.db_models import Payment, PaymentMethod, PaymentStatus, Transaction, TransactionStatus
+
+    old = datetime.utcnow() - timedelta(hours=1)
+    sales = [
+        # (transaction id, transaction status, payments as (amount, status))
+        (1, TransactionStatus.COMPLETED, [(10, PaymentStatus.COMPLETED)]),
+        (2, TransactionStatus.COMPLETED, [(7, PaymentStatus.COMPLETED)]),
+        (3, TransactionStatus.COMPLETED, []),
+        (4, TransactionStatus.CANCELLED, [(10, PaymentStatus.COMPLETED)]),
+        (5, TransactionStatus.IN_PROGRESS, [(10, PaymentStatus.PROCESSING)]),
+        (6, TransactionStatus.COMPLETED, [(10, PaymentStatus.FAILED), (10, PaymentStatus.COMPLETED)])
+    ]
+    for transaction_id, status, payments in sales:
+        db.add(Transaction(
+            id=transaction_id,
+            status=status,
+            subtotal=10,
+            tax_amount=0,
+            total_amount=10,
+            payment_method=PaymentMethod.CREDIT_CARD,
+            created_at=old
+        ))
+        for amount, payment_status in payments:
+            db.add(Payment(
+                transaction_id=transaction_id,
+                amount=amount,
+                method=PaymentMethod.CREDIT_CARD,
+                status=payment_status,
+                created_at=old
+            ))
+    # A payment pointing at no sale, and a sale too recent to judge
+    db.add(Payment(transaction_id=99, amount=5, method=PaymentMethod.CASH, status=PaymentStatus.COMPLETED, created_at=old))
+    db.add(Transaction(
+        id=7,
+        status=TransactionStatus.IN_PROGRESS,
+        subtotal=10,
+        tax_amount=0,
+        total_amount=10,
+        payment_method=PaymentMethod.CREDIT_CARD
+    ))
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_discrepancies_are_found_by_kind():
+    engine, session_factory = await make_database(products=0)
+    try:
+        async with session_factory() as db:
+            await add_sales(db)
+            found = []
+            report = await make_reconciler().reconcile(db, sink=found.append)
+
+        assert report["by_kind"] == {
+            "amount_mismatch": 1,
+            "unpaid_transaction": 1,
+            "paid_cancelled_transaction": 1,
+            "unsettled_transaction": 1,
+            "orphaned_payment": 1,
+            "stuck_payment": 1
+        }
+        assert report["discrepancies"] == len(found) == len(report["sample"]) == 6
+        mismatch = next(row for row in found if row["kind"] == "amount_mismatch")
+        assert mismatch["transaction_id"] == 2
+        assert (mismatch["expected_amount"], mismatch["actual_amount"]) == ("10.00", "7.00")
+        assert {row["transaction_id"] for row in found}.isdisjoint({1, 6, 7})
+        print("✓ reconciliation reports each kind of discrepancy")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_each_slot_runs_once():
+    """Runs land on the wall-clock schedule, and only the first worker to
+    claim a slot runs it"""
+    from app.db.repositories import scheduled_run_repo
+    from app.services.reconciliation import RECONCILIATION_JOB
+
+    reconciler = make_reconciler(interval=6 * 3600)
+    assert reconciler.next_run_after(datetime(2026, 1, 1, 5, 59)) == datetime(2026, 1, 1, 6, 0)
+    assert reconciler.next_run_after(datetime(2026, 1, 1, 6, 0)) == datetime(2026, 1, 1, 12, 0)
+    assert reconciler.next_run_after(datetime(2026, 1, 1, 23, 0)) == datetime(2026, 1, 2, 0, 0)
+
+    engine, session_factory = await make_database(products=0)
+    slot = datetime(2026, 1, 1, 6, 0)
+    try:
+        claims = []
+        for _ in range(3):
+            async with session_factory() as db:
+                claims.append(await scheduled_run_repo.claim(db, job=RECONCILIATION_JOB, slot=slot))
+                await db.commit()
+        assert claims == [True, False, False]
+        async with session_factory() as db:
+            assert await scheduled_run_repo.claim(db, job=RECONCILIATION_JOB, slot=slot + timedelta(hours=6))
+        print("✓ each scheduled slot is claimed once")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing payment reconciliation...")
+        await test_discrepancies_are_found_by_kind()
+        await test_each_slot_runs_once()
+        print("\n Payment reconciliation works correctly!")
+        return True
+    except Exception as e:
+        print(f" Reconciliation test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
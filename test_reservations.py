@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_database
+
+
+@pytest.mark.asyncio
+async def test_holds_keep_other_carts_from_overselling():
+    """Stock held by one cart is unavailable to the others, but not to the
+    cart holding it"""
+    from app.db.repositories import reservation_repo
+    from app.models.schemas import CartItemCreate
+    from app.services.cart_service import CartService
+    from app.services.exceptions import InsufficientStockError
+
+    engine, session_factory = await make_database(products=1)
+    try:
+        async with session_factory() as db:
+            carts = CartService(db, store=None)
+            first = await carts.add_item(CartItemCreate(product_id=1, quantity=7), session_id="first")
+            assert await reservation_repo.get_available(db, 1) == 3
+            assert await reservation_repo.get_available(db, 1, exclude_cart_id=first.id) == 10
+
+            with pytest.raises(InsufficientStockError) as refused:
+                await carts.add_item(CartItemCreate(product_id=1, quantity=4), session_id="second")
+            assert refused.value.available == 3
+
+            await carts.add_item(CartItemCreate(product_id=1, quantity=3), session_id="second")
+            # The first cart may still grow into stock nobody else holds
+            with pytest.raises(InsufficientStockError):
+                await carts.add_item(CartItemCreate(product_id=1, quantity=1), session_id="first")
+            assert await reservation_repo.get_available(db, 1) == 0
+        print("✓ held stock cannot be sold to another cart")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_expired_holds_are_released():
+    from sqlalchemy import func, select, update
+    from app.db.repositories import reservation_repo
+    from app.models.db_models import InventoryReservation
+    from app.models.schemas import CartItemCreate
+    from app.services.cart_service import CartService
+
+    engine, session_factory = await make_database(products=1)
+    try:
+        async with session_factory() as db:
+            carts = CartService(db, store=None)
+            await carts.add_item(CartItemCreate(product_id=1, quantity=6), session_id="idle")
+            assert await reservation_repo.get_available(db, 1) == 4
+
+            await db.execute(
+                update(InventoryReservation).values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+            )
+            await db.commit()
+            assert await reservation_repo.get_available(db, 1) == 10
+
+            assert await reservation_repo.purge_expired(db) == 1
+            await db.commit()
+            assert (await db.execute(select(func.count(InventoryReservation.id)))).scalar() == 0
+        print("✓ expired holds stop counting and are purged")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing stock reservations...")
+        await test_holds_keep_other_carts_from_overselling()
+        await test_expired_holds_are_released()
+        print("\n Stock reservations work correctly!")
+        return True
+    except Exception as e:
+        print(f" Reservation test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)
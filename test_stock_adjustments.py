@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+from conftest import make_database
+
+
+async def stock(session_factory, product_id: int = 1) -> int:
+    from app.db.repositories import inventory_repo
+
+    async with session_factory() as db:
+        return await inventory_repo.get_quantity(db, product_id)
+
+
+@pytest.mark.asyncio
+async def test_adjustments_never_overdraw():
+    from app.services.exceptions import InsufficientStockError
+    from app.services.inventory_service import InventoryService
+
+    engine, session_factory = await make_database(products=1)
+    try:
+        async with session_factory() as db:
+            service = InventoryService(db)
+            assert (await service.adjust_inventory(1, -4)).quantity == 6
+            assert (await service.adjust_inventory(1, 2)).quantity == 8
+
+            with pytest.raises(InsufficientStockError) as refused:
+                await service.adjust_inventory(1, -9)
+            assert refused.value.available == 8
+            await db.rollback()
+
+            with pytest.raises(ValueError):
+                await service.adjust_inventory(99, -1)
+            with pytest.raises(ValueError):
+                await service.adjust_inventory(1, 0)
+            await db.rollback()
+        assert await stock(session_factory) == 8
+        print("✓ stock adjustments never take stock below zero")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_adjustments_apply_to_current_stock():
+    """An adjustment applies to the stock in the database, not to what the
+    caller read earlier, so concurrent adjustments are not lost"""
+    from sqlalchemy import select
+    from app.models.db_models import Inventory
+    from app.services.inventory_service import InventoryService
+
+    engine, session_factory = await make_database(products=1)
+    try:
+        async with session_factory() as first:
+            seen = (await first.execute(select(Inventory).where(Inventory.product_id == 1))).scalar_one()
+            assert seen.quantity == 10
+            await first.commit()
+
+            async with session_factory() as second:
+                await InventoryService(second).adjust_inventory(1, -3)
+
+            adjusted = await InventoryService(first).adjust_inventory(1, -5)
+            assert adjusted.quantity == 2 and seen.quantity == 2
+        assert await stock(session_factory) == 2
+        print("✓ concurrent adjustments are not lost")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_bulk_adjustments_are_all_or_nothing():
+    from app.services.exceptions import InsufficientStockError
+    from app.services.inventory_service import InventoryService
+
+    engine, session_factory = await make_database(products=2)
+    try:
+        async with session_factory() as db:
+            service = InventoryService(db)
+            with pytest.raises(InsufficientStockError):
+                await service.bulk_update_inventory([
+                    {"product_id": 1, "adjustment": -5},
+                    {"product_id": 2, "adjustment": -11}
+                ])
+        assert await stock(session_factory, 1) == 10 and await stock(session_factory, 2) == 10
+
+        async with session_factory() as db:
+            adjusted = await InventoryService(db).bulk_update_inventory([
+                {"product_id": 1, "adjustment": -5},
+                {"product_id": 2, "adjustment": -10}
+            ])
+            assert [inventory.quantity for inventory in adjusted] == [5, 0]
+        print("✓ bulk adjustments apply together or not at all")
+    finally:
+        await engine.dispose()
+
+
+async def run_all() -> bool:
+    try:
+        print("Testing stock adjustments...")
+        await test_adjustments_never_overdraw()
+        await test_adjustments_apply_to_current_stock()
+        await test_bulk_adjustments_are_all_or_nothing()
+        print("\n Stock adjustments work correctly!")
+        return True
+    except Exception as e:
+        print(f" Stock adjustment test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = asyncio.run(run_all())
+    if not success:
+        sys.exit(1)